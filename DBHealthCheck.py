@@ -2,6 +2,7 @@ import pandas as pd
 import os
 from pathlib import Path
 from tqdm import tqdm
+from imageDimensionIndex import ImageDimensionIndex, MISSING
 
 # --- CONFIGURATION ---
 # BASE_PATH = Path(r"D:/Main/3. Work - Teaching/Projects/Question extractor")
@@ -61,10 +62,22 @@ def check_db_health():
     valid_chapters = load_chapter_topic_map()
     
     report_data = []
+
+    # Asset existence for every row in one parallel pass over the (cached) image index
+    print("🔍 Indexing compressed images...")
+    folders = df['Folder'].astype(str).str.strip() if 'Folder' in df.columns else pd.Series('', index=df.index)
+    q_nums = df['Question No.'].astype(str).str.strip() if 'Question No.' in df.columns else pd.Series('', index=df.index)
+    comp_paths = []
+    for folder, q_num in zip(folders, q_nums):
+        comp_paths.extend([COMPRESSED_BASE_DIR / folder / f"Q_{q_num}.png", COMPRESSED_BASE_DIR / folder / f"Sol_{q_num}.png"])
+    index = ImageDimensionIndex(IMG_BASE_DIR)
+    comp_found = [status != MISSING for _, _, status in index.lookup(comp_paths)]
+    index.save()
+    print(f"   -> {index.summary()}")
     
     print(f"🚀 Validating {len(df)} records...")
 
-    for idx, row in tqdm(df.iterrows(), total=len(df), unit="q"):
+    for i, (idx, row) in enumerate(tqdm(df.iterrows(), total=len(df), unit="q")):
         uid = row.get('unique_id', f"Unknown_{idx}")
         folder = str(row.get('Folder', '')).strip()
         q_num = str(row.get('Question No.', '')).strip()
@@ -99,14 +112,8 @@ def check_db_health():
                  topic_issue = "Cannot Validate (Bad Chapter)"
 
         # --- B. ASSET VALIDATION (Compressed Only) ---
-        fname_q = f"Q_{q_num}.png"
-        fname_sol = f"Sol_{q_num}.png"
-        
-        path_comp_q = COMPRESSED_BASE_DIR / folder / fname_q
-        path_comp_sol = COMPRESSED_BASE_DIR / folder / fname_sol
-        
-        has_comp_q = path_comp_q.exists()
-        has_comp_sol = path_comp_sol.exists()
+        has_comp_q = comp_found[2 * i]
+        has_comp_sol = comp_found[2 * i + 1]
         
         # --- C. STATUS ---
         # Ready if: Tags Valid AND Compressed Question Exists
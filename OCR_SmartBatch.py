@@ -1,21 +1,218 @@
 import pandas as pd
-import easyocr
 import os
+import sys
 import json
+import time
 import warnings
 import numpy as np
+import cv2
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
+from imageDimensionIndex import ImageDimensionIndex
+from imageKernels import runs
+from ocrBackends import make_backend, BACKENDS
+from ocrCache import OCRCache, CACHE_NAME
+from ocrResultSink import OCRResultSink
 
 # Suppress warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
-def update_ocr_incremental():
+# --- OCR ENGINE CONFIGURATION (config.json keys override these) ---
+OCR_BACKEND = 'easyocr'    # 'easyocr', 'tesseract' or 'pdf_text' (see ocrBackends.BACKENDS)
+OCR_DEVICE = 'auto'        # 'auto' (GPU if torch sees one), 'gpu' or 'cpu'
+OCR_WORKERS = None         # CPU mode: engine processes. None = half the cores (an EasyOCR Reader holds ~1 GB)
+OCR_BATCH_SIZE = 8         # Images per worker task (EasyOCR: per readtext_batched call)
+TARGET_TEXT_HEIGHT = 32    # px: crops are downscaled so their text lines are about this tall
+MIN_SCALE = 0.4            # Never shrink below this factor
+INK_LEVEL = 128            # Gray <= this counts as ink when measuring line heights
+OCR_TEXT_BANDS = True      # EasyOCR: recognize only the text-line bands found by ocrTextBands (skips CRAFT on diagrams)
+PREP_VERSION = 1           # Bump after changing prepare_image(): cached OCR text is keyed on it
+
+_backend = None            # One loaded engine per process, set by _init_ocr_worker
+
+
+# --- 1. IMAGE PREPARATION ---
+
+def text_line_height(gray):
+    """Median height (px) of the ink bands of a grayscale crop, or None if it has no text lines."""
+    starts, ends = runs((gray <= INK_LEVEL).any(axis=1))
+    heights = ends - starts
+    heights = heights[heights >= 4]
+    return float(np.median(heights)) if len(heights) else None
+
+def prepare_image(img_path):
+    """Grayscale crop, downscaled so text lines are ~TARGET_TEXT_HEIGHT px (CRAFT cost grows with area)."""
+    gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None: raise ValueError("Unreadable image")
+    line_height = text_line_height(gray)
+    if line_height:
+        scale = max(MIN_SCALE, min(1.0, TARGET_TEXT_HEIGHT / line_height))
+        if scale < 1.0:
+            size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+# --- 2. OCR WORKERS ---
+
+def _init_ocr_worker(backend, gpu, threads=None):
+    """Pool initializer (or in-process setup): loads this process's engine once."""
+    global _backend
+    _backend = backend
+    _backend.load(gpu=gpu, threads=threads)
+
+def _ocr_batch(jobs):
+    """
+    Worker task: [(row_key, img_path)] -> prepared crops -> backend.read_batch().
+    One bad file only loses itself.
+    Returns {'pid', 'busy' (seconds), 'results': [(row_key, text or None, error or None)]}.
+    """
+    t0 = time.perf_counter()
+    results, images, keys = [], [], []
+    for key, path in jobs:
+        try:
+            images.append(prepare_image(path))
+            keys.append(key)
+        except Exception as e:
+            results.append((key, None, str(e)))
+    if images:
+        results.extend((key, text, error) for key, (text, error) in zip(keys, _backend.read_batch(images)))
+    return {'pid': os.getpid(), 'busy': time.perf_counter() - t0, 'results': results}
+
+def engine_version(backend):
+    """Cache version of the OCR output: backend version + preprocessing parameters."""
+    return f"{backend.version()}|prep{PREP_VERSION}|h{TARGET_TEXT_HEIGHT}|s{MIN_SCALE}|ink{INK_LEVEL}"
+
+def is_current(record, image_hash, img_path):
+    """
+    Is an existing output row still valid for this image? Rows with an image_hash must match it.
+    Older rows (no hash recorded) count as valid unless the image was re-saved after they were written.
+    """
+    recorded_hash, stamp = record
+    if recorded_hash: return recorded_hash == image_hash
+    try:
+        return os.path.getmtime(img_path) <= datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S").timestamp()
+    except (OSError, ValueError):
+        return True
+
+def resolve_device(device):
+    if device != 'auto': return device
+    try:
+        import torch
+        return 'gpu' if torch.cuda.is_available() else 'cpu'
+    except Exception:
+        return 'cpu'
+
+def make_batches(jobs, dims):
+    """Jobs sorted by image size (PNG headers) so each batch pads little, then cut into OCR_BATCH_SIZE batches."""
+    order = sorted(range(len(jobs)), key=lambda i: (dims[i][1] or 0, dims[i][0] or 0))
+    ordered = [jobs[i] for i in order]
+    return [ordered[i:i + OCR_BATCH_SIZE] for i in range(0, len(ordered), OCR_BATCH_SIZE)]
+
+def run_ocr(batches, backend, device, workers, on_result):
+    """
+    Runs every batch and calls on_result(row_key, text, error) in the main process (single writer).
+    gpu / workers == 1: one engine in this process. cpu: `workers` processes fed from the pool's
+    shared task queue, each loading its own engine. Returns per-worker stats {pid: [images, busy_s]}.
+    """
+    stats = defaultdict(lambda: [0, 0.0])
+    total = sum(len(b) for b in batches)
+
+    def collect(out, pbar):
+        for key, text, error in out['results']:
+            on_result(key, text, error)
+        if out['pid'] is not None:
+            stats[out['pid']][0] += len(out['results'])
+            stats[out['pid']][1] += out['busy']
+        pbar.update(len(out['results']))
+
+    desc = f"OCR ({backend.name}, {device}, {workers} worker{'s' if workers > 1 else ''})"
+    with tqdm(total=total, unit="img", desc=desc) as pbar:
+        if device == 'gpu' or workers == 1:
+            _init_ocr_worker(backend, gpu=device == 'gpu')
+            for batch in batches:
+                collect(_ocr_batch(batch), pbar)
+        else:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                     initargs=(backend, False, threads)) as pool:
+                futures = {pool.submit(_ocr_batch, batch): batch for batch in batches}
+                try:
+                    for future in as_completed(futures):
+                        try:
+                            out = future.result()
+                        except Exception as e:  # Worker process died (e.g. out of memory)
+                            out = {'pid': None, 'busy': 0.0,
+                                   'results': [(key, None, f"Worker failed: {e}") for key, _ in futures[future]]}
+                        collect(out, pbar)
+                except KeyboardInterrupt:
+                    # Drop the queued batches: leaving the with-block would otherwise wait for all of them
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    return stats
+
+def print_throughput(stats, wall_seconds):
+    """Images/sec overall and per worker, plus utilization (busy time / wall time) to size OCR_WORKERS."""
+    images = sum(n for n, _ in stats.values())
+    if images == 0 or wall_seconds <= 0: return
+    print(f"\n⏱️  OCR: {images} images in {wall_seconds:.1f}s -> {images / wall_seconds:.2f} img/s")
+    for pid, (n, busy) in sorted(stats.items()):
+        rate = n / busy if busy > 0 else 0
+        print(f"   - worker {pid}: {n} img, {rate:.2f} img/s busy, {min(1.0, busy / wall_seconds):.0%} utilized")
+    print(f"   - cores: {os.cpu_count()}. Low utilization = too many workers for the cores/RAM; "
+          f"all ~100% = room for more.")
+
+
+# --- 3. RESULT TABLES ---
+
+JOIN_COLUMNS = ['unique_id', 'OCR_Text', 'source', 'engine', 'last_updated']   # Taken from the result tables into the join
+
+def read_done(path, done):
+    """Adds uid -> (image_hash, last_updated) for every row of a result table with text (length > 20).
+    Works on the narrow table and on the wide legacy file. Later rows supersede earlier ones."""
+    df = pd.read_csv(path, dtype=str)
+    if 'OCR_Text' not in df.columns or 'unique_id' not in df.columns: return 0
+    valid_rows = df[df['OCR_Text'].fillna('').str.len() > 20]
+    hashes = valid_rows.get('image_hash', pd.Series('', index=valid_rows.index)).fillna('')
+    stamps = valid_rows.get('last_updated', pd.Series('', index=valid_rows.index)).fillna('')
+    for uid, h, stamp in zip(valid_rows['unique_id'].astype(str).str.strip(), hashes, stamps):
+        done[uid] = (h, stamp)
+    return len(valid_rows)
+
+def write_joined(df_master, result_paths, joined_path):
+    """
+    Master rows joined on unique_id with their latest OCR text (legacy file first, narrow table last),
+    i.e. the wide file AIsuggestedTags reads. Atomic; the previous version is kept as <name>.bak.
+    Returns the number of rows written.
+    """
+    frames = [pd.read_csv(p, dtype=str, usecols=lambda c: c in JOIN_COLUMNS) for p in result_paths if os.path.exists(p)]
+    if not frames: return 0
+    results = pd.concat(frames, ignore_index=True).reindex(columns=JOIN_COLUMNS)
+    results['unique_id'] = results['unique_id'].astype(str).str.strip()
+    results = results[results['OCR_Text'].fillna('').str.len() > 20].drop_duplicates('unique_id', keep='last')
+    master = df_master.drop(columns=[c for c in JOIN_COLUMNS[1:] if c in df_master.columns])
+    joined = master.merge(results, on='unique_id', how='inner')
+
+    tmp_path = joined_path + '.tmp'
+    joined.to_csv(tmp_path, index=False)
+    if os.path.exists(joined_path): os.replace(joined_path, joined_path + '.bak')
+    os.replace(tmp_path, joined_path)
+    return len(joined)
+
+
+def update_ocr_incremental(backend_name=None):
     # --- 1. CONFIGURATION ---
     CONFIG_PATH = 'config.json'
     config = {
         "BASE_PATH": "D:/Main/3. Work - Teaching/Projects/Question extractor",
-        "MODEL_DIR": "models"
+        "MODEL_DIR": "models",
+        "OCR_BACKEND": OCR_BACKEND,
+        "OCR_FILENAME": "DB Master_OCR.csv",   # Same key AIsuggestedTags reads its input from
+        "OCR_DEVICE": OCR_DEVICE,
+        "OCR_WORKERS": OCR_WORKERS,
+        "OCR_TEXT_BANDS": OCR_TEXT_BANDS,
     }
 
     if os.path.exists(CONFIG_PATH):
@@ -23,21 +220,32 @@ def update_ocr_incremental():
             config.update(json.load(f))
 
     BASE_PATH = os.path.normpath(config['BASE_PATH'])
-    
+
     if os.path.isabs(config['MODEL_DIR']):
         MODEL_STORAGE = os.path.normpath(config['MODEL_DIR'])
     else:
         MODEL_STORAGE = os.path.normpath(os.path.join(BASE_PATH, config['MODEL_DIR']))
 
     IMG_BASE_DIR = os.path.join(BASE_PATH, 'Processed_Database')
-    
+
     # FILES
-    MASTER_DB_PATH = os.path.join(BASE_PATH, 'OCR - Questions for processing.csv')       
-    OUTPUT_DB_PATH = os.path.join(BASE_PATH, 'OCR - Processed.csv')   
+    MASTER_DB_PATH = os.path.join(BASE_PATH, 'OCR - Questions for processing.csv')
+    LEGACY_DB_PATH = os.path.join(BASE_PATH, 'OCR - Processed.csv')   # Wide rows of older runs: read, never rewritten
+    OUTPUT_DB_PATH = os.path.join(BASE_PATH, 'OCR - Results.csv')     # Narrow results table (RESULT_COLUMNS)
+    JOINED_DB_PATH = os.path.join(BASE_PATH, config['OCR_FILENAME'])   # Master + latest OCR text, rebuilt every run
+
+    # Engine for this run: argument > config.json > OCR_BACKEND
+    backend = make_backend(backend_name or config['OCR_BACKEND'], model_dir=MODEL_STORAGE,
+                           text_bands=bool(config.get('OCR_TEXT_BANDS')), batch_size=OCR_BATCH_SIZE)
+    if not backend.available():
+        print(f"❌ OCR backend '{backend.name}' is not installed here.")
+        return
 
     print(f"🔧 CONFIGURATION:")
     print(f"   - Master DB (Read) : {MASTER_DB_PATH}")
     print(f"   - Output DB (Append): {OUTPUT_DB_PATH}")
+    print(f"   - Joined DB (Write): {JOINED_DB_PATH}")
+    print(f"   - OCR backend      : {backend.name}")
 
     # --- 2. LOAD MASTER ---
     if not os.path.exists(MASTER_DB_PATH):
@@ -50,124 +258,132 @@ def update_ocr_incremental():
     if 'unique_id' not in df_master.columns:
         print("❌ CRITICAL: 'unique_id' missing in Master.")
         return
-        
+
     # Standardize ID to string to avoid mismatch
     df_master['unique_id'] = df_master['unique_id'].astype(str).str.strip()
 
     # --- 3. DETERMINE WHAT IS ALREADY DONE ---
-    processed_ids = set()
-    
-    if os.path.exists(OUTPUT_DB_PATH):
+    # uid -> (image_hash, last_updated) of its latest valid row (later rows supersede earlier ones)
+    done = {}
+    sink = OCRResultSink(OUTPUT_DB_PATH)   # Finishes a flush a killed run left half-written
+    if sink.recovered: print(f"🩹 Recovered {sink.recovered} rows from an interrupted write.")
+
+    for path in (LEGACY_DB_PATH, OUTPUT_DB_PATH):
+        if not os.path.exists(path): continue
         try:
-            # We only read the IDs from the output file to know what to skip
-            df_existing = pd.read_csv(OUTPUT_DB_PATH)
-            
-            # Check for valid OCR text (length > 20)
-            if 'OCR_Text' in df_existing.columns and 'unique_id' in df_existing.columns:
-                df_existing['OCR_Text'] = df_existing['OCR_Text'].astype(str).replace('nan', '')
-                valid_rows = df_existing[df_existing['OCR_Text'].str.len() > 20]
-                processed_ids = set(valid_rows['unique_id'].astype(str).str.strip())
-                
-            print(f"🔄 Found Output DB. Skipping {len(processed_ids)} already completed rows.")
+            rows = read_done(path, done)
+            print(f"🔄 Found {os.path.basename(path)}: {rows} rows with text (re-cropped images will be redone).")
         except Exception as e:
-            print(f"⚠️  Could not read existing Output DB ({e}). Starting fresh.")
+            print(f"⚠️  Could not read {os.path.basename(path)} ({e}). Its rows will be redone.")
 
-    # --- 4. FILTER PENDING ---
-    # We only keep rows from Master that are NOT in processed_ids
-    df_pending = df_master[~df_master['unique_id'].isin(processed_ids)].copy()
-    
-    # Initialize necessary columns for the pending rows
-    if 'OCR_Text' not in df_pending.columns: df_pending['OCR_Text'] = ""
-    if 'last_updated' not in df_pending.columns: df_pending['last_updated'] = ""
+    def append_result(uid, final_text, source, image_hash="", engine=""):
+        """
+        STEP C: buffer one finished row. Only written if we actually got text (length > 20).
+        source: PDF_COPY / OCR_CACHE / OCR_GPU / OCR_CPU (as in older runs); engine: the OCR backend's name.
+        """
+        if len(final_text) <= 20: return
+        sink.add({'unique_id': uid, 'OCR_Text': final_text, 'source': source, 'engine': engine,
+                  'last_updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'image_hash': image_hash})
 
-    total_pending = len(df_pending)
-    print(f"   📊 Pending Work: {total_pending} rows.")
+    # --- 4. SMART COPY (PDF TEXT) / CACHE LOOKUP / OCR JOB LIST ---
+    cache = OCRCache(os.path.join(BASE_PATH, CACHE_NAME))
+    version = engine_version(backend)
+    waiting = defaultdict(list)   # content hash -> [unique_id]: identical images are OCR'd once
+    ocr_jobs = []                 # [(content hash, img path)]
+    copied = cached = current = missing = no_text = 0
 
-    if total_pending == 0:
-        print("\n🎉 All done! Database is up to date.")
+    for _, row in df_master.iterrows():
+        uid = row['unique_id']
+        folder = str(row.get('Folder', '')).strip()
+
+        # Q Number Logic
+        val = row.get('Question No.') if 'Question No.' in df_master.columns else row.get('Q')
+        q_num = str(val).split('.')[0] if pd.notna(val) and str(val).strip() != "" else None
+        if not q_num: continue
+
+        # STEP A: Smart copy if PDF text is available and valid
+        pdf_avail = str(row.get('PDF_Text_Available', '')).lower() == 'yes'
+        pdf_text = str(row.get('pdf_Text', '')).strip()
+        if pdf_avail and len(pdf_text) > 20:
+            if uid in done: current += 1
+            else:
+                append_result(uid, pdf_text, "PDF_COPY")
+                copied += 1
+            continue
+
+        # STEP B: OCR route, keyed by the image content
+        if not backend.needs_image:
+            no_text += 1   # pdf_text backend: nothing to trust for this row, left for an OCR run
+            continue
+        img_path = os.path.join(IMG_BASE_DIR, folder, f"Q_{q_num}.png")
+        image_hash = cache.hash_file(img_path)
+        if image_hash is None:
+            missing += 1
+            continue
+        if uid in done and is_current(done[uid], image_hash, img_path):
+            current += 1
+            continue
+        text = cache.get(image_hash, backend.name, version)
+        if text is not None:
+            append_result(uid, text, "OCR_CACHE", image_hash, backend.name)
+            cached += 1
+            continue
+        if not waiting[image_hash]: ocr_jobs.append((image_hash, img_path))
+        waiting[image_hash].append(uid)
+    cache.commit()
+
+    print(f"   📊 Up to date: {current} | PDF text copied: {copied} | From OCR cache: {cached} | "
+          f"Missing image: {missing} | To OCR: {len(ocr_jobs)} images ({sum(map(len, waiting.values()))} rows)"
+          + (f" | No PDF text (skipped): {no_text}" if no_text else ""))
+
+    if not ocr_jobs:
+        cache.close()
+        sink.close()
+        joined = write_joined(df_master, (LEGACY_DB_PATH, OUTPUT_DB_PATH), JOINED_DB_PATH)
+        print(f"\n🎉 All done! Database is up to date. {joined} rows in {JOINED_DB_PATH}")
         return
 
-    # --- 5. INITIALIZE ENGINE ---
-    print("\n🚀 Initializing EasyOCR (GPU)...")
+    # Image sizes from PNG headers group similar sizes into batches
+    dim_index = ImageDimensionIndex(IMG_BASE_DIR)
+    dims = dim_index.lookup([path for _, path in ocr_jobs])
+    dim_index.save()
+
+    # --- 5. INITIALIZE ENGINE + BATCHED OCR ---
+    device = resolve_device(str(config.get('OCR_DEVICE') or 'auto').lower()) if backend.supports_gpu else 'cpu'
+    workers = 1 if device == 'gpu' else int(config.get('OCR_WORKERS') or max(1, (os.cpu_count() or 2) // 2))
+    print(f"\n🚀 Initializing {backend.name} ({device.upper()}, {workers} worker{'s' if workers > 1 else ''}, "
+          f"batches of {OCR_BATCH_SIZE}, {backend.version()})...")
     if not os.path.exists(MODEL_STORAGE): os.makedirs(MODEL_STORAGE, exist_ok=True)
-    reader = easyocr.Reader(['en'], model_storage_directory=MODEL_STORAGE, gpu=True) 
-
-    # --- 6. ROW-BY-ROW PROCESSING ---
-    print(f"\n▶️  Processing {total_pending} images...")
-    
-    # Check if we need to write the header (only if file doesn't exist)
-    write_header = not os.path.exists(OUTPUT_DB_PATH)
-    
-    try:
-        with tqdm(total=total_pending, unit="img") as pbar:
-            for idx, row in df_pending.iterrows():
-                folder = str(row.get('Folder', '')).strip()
-                
-                # Q Number Logic
-                val = row.get('Question No.') if 'Question No.' in df_pending.columns else row.get('Q')
-                q_num = str(val).split('.')[0] if pd.notna(val) and str(val).strip() != "" else None
-                
-                if not q_num:
-                    pbar.update(1)
-                    continue
-
-                # --- STEP A: TRY SMART COPY (PDF TEXT) ---
-                # Check if PDF text is available and valid
-                pdf_avail = str(row.get('PDF_Text_Available', '')).lower() == 'yes'
-                pdf_text = str(row.get('pdf_Text', '')).strip()
-                
-                final_text = ""
-                source = ""
-                
-                if pdf_avail and len(pdf_text) > 20:
-                    final_text = pdf_text
-                    source = "PDF_COPY"
-                else:
-                    # --- STEP B: RUN OCR ---
-                    img_filename = f"Q_{q_num}.png"
-                    img_path = os.path.join(IMG_BASE_DIR, folder, img_filename)
-                    
-                    if os.path.exists(img_path):
-                        try:
-                            result = reader.readtext(img_path, detail=0)
-                            final_text = " ".join(result)
-                            source = "OCR_GPU"
-                        except Exception as e:
-                            pbar.write(f"❌ Error {img_filename}: {e}")
-                    else:
-                        # Skip if file missing
-                        pbar.update(1)
-                        continue
-
-                # --- STEP C: APPEND TO FILE ---
-                # Only write if we actually got text (length > 20)
-                if len(final_text) > 20:
-                    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Update the specific fields in the single-row dataframe
-                    df_pending.at[idx, 'OCR_Text'] = final_text
-                    df_pending.at[idx, 'last_updated'] = current_time
-                    
-                    # Extract just this row as a DataFrame
-                    single_row = df_pending.loc[[idx]]
-                    
-                    # Append to CSV
-                    # mode='a' appends. header=False prevents writing headers repeatedly.
-                    single_row.to_csv(OUTPUT_DB_PATH, mode='a', header=write_header, index=False)
-                    
-                    # Ensure header is only written once (for the very first row of a fresh file)
-                    write_header = False
-                
-                pbar.update(1)
 
+    paths = dict(ocr_jobs)
+    source = f"OCR_{device.upper()}"
+    def on_result(image_hash, text, error):
+        if error:
+            tqdm.write(f"❌ Error {os.path.basename(paths[image_hash])}: {error}")
+            return
+        cache.put(image_hash, backend.name, version, text)
+        for uid in waiting[image_hash]:
+            append_result(uid, text, source, image_hash, backend.name)
+
+    t0 = time.perf_counter()
+    stats = {}
+    try:
+        stats = run_ocr(make_batches(ocr_jobs, dims), backend, device, workers, on_result)
     except KeyboardInterrupt:
         print("\n🛑 Stopped by user.")
-    
-    print("\n✅ Script finished. Check DB Master_OCR.csv for results.")
+    finally:
+        sink.close()   # Flush whatever is buffered, also after Ctrl+C
+        cache.close()
+    print_throughput(stats, time.perf_counter() - t0)
+    print(f"💾 {cache.summary()} | {sink.written} result rows written")
+
+    joined = write_joined(df_master, (LEGACY_DB_PATH, OUTPUT_DB_PATH), JOINED_DB_PATH)
+    print(f"\n✅ Script finished. {joined} rows with OCR text in {JOINED_DB_PATH}")
 
 if __name__ == "__main__":
-    update_ocr_incremental()
+    # Optional argument: backend for this run, e.g. `python OCR_SmartBatch.py tesseract`
+    update_ocr_incremental(sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] in BACKENDS else None)
     # --- AUTO SHUTDOWN CODE ---
     print("💤 Script finished. Shutting down PC in 60 seconds...")
     # /s = shutdown, /t 60 = timer of 60 seconds (gives you a chance to cancel)
-    os.system("shutdown /s /t 60")
\ No newline at end of file
+    os.system("shutdown /s /t 60")
@@ -2,7 +2,7 @@ import pandas as pd
 from google.cloud import firestore as google_firestore
 import os
 import sys
-from PIL import Image
+from imageDimensionIndex import ImageDimensionIndex
 try:
     from tqdm import tqdm
 except ImportError:
@@ -38,17 +38,6 @@ def save_db(df):
     except Exception as e:
         print(f"❌ Save failed: {e}")
 
-def get_image_dims(folder, filename):
-    """Returns (width, height) or (None, None)"""
-    try:
-        path = os.path.join(IMG_DIR, str(folder).strip(), filename)
-        if os.path.exists(path) and os.path.getsize(path) > 0:
-            with Image.open(path) as img:
-                return img.width, img.height
-    except Exception:
-        pass
-    return None, None
-
 # --- FUNCTIONS ---
 
 def func_populate_dimensions():
@@ -63,11 +52,9 @@ def func_populate_dimensions():
             df[col] = None
             print(f"   ℹ️ Created new column: {col}")
 
-    # 2. Iterate
-    updates = 0
-    print(f"   🚀 Scanning {len(df)} questions...")
-    
-    for idx, row in tqdm(df.iterrows(), total=len(df), unit="row"):
+    # 2. Collect Q / Sol paths, then read every header in one parallel pass
+    rows, paths = [], []
+    for idx, row in df.iterrows():
         folder = row.get('Folder')
         if pd.isna(folder) or str(folder).strip() == "": continue
 
@@ -84,16 +71,25 @@ def func_populate_dimensions():
         except:
             q_num = str(q_val).strip()
 
-        # A. Get Question Dims
-        qw, qh = get_image_dims(folder, f"Q_{q_num}.png")
-        if qw: 
+        folder_dir = os.path.join(IMG_DIR, str(folder).strip())
+        rows.append(idx)
+        paths.extend([os.path.join(folder_dir, f"Q_{q_num}.png"), os.path.join(folder_dir, f"Sol_{q_num}.png")])
+
+    print(f"   🚀 Scanning {len(rows)} questions...")
+    index = ImageDimensionIndex(IMG_DIR)
+    dims = index.lookup(paths)
+    index.save()
+    print(f"   ℹ️ {index.summary()}")
+
+    # A. Question Dims / B. Solution Dims
+    updates = 0
+    for i, idx in enumerate(rows):
+        (qw, qh, q_status), (sw, sh, sol_status) = dims[2 * i], dims[2 * i + 1]
+        if q_status == "Found":
             df.at[idx, 'q_width'] = qw
             df.at[idx, 'q_height'] = qh
             updates += 1
-
-        # B. Get Solution Dims
-        sw, sh = get_image_dims(folder, f"Sol_{q_num}.png")
-        if sw:
+        if sol_status == "Found":
             df.at[idx, 'sol_width'] = sw
             df.at[idx, 'sol_height'] = sh
 
@@ -0,0 +1,130 @@
+import re
+import numpy as np
+
+# --- CONFIGURATION ---
+BOLD_MARKERS = ('bold', 'bd', 'black')
+
+# CollegeDoors style: "12." / "Q12" / "Sol. 12" as a single token, or "Q" "12" as two tokens
+# NOTE: tokens never contain whitespace, so ' ' stands in for '\s' (a pattern must never match '\n')
+STANDALONE_PATTERN = r'(?P<prefix>Q|Sol|Solution|S)?[. ]*(?P<num>[0-9]+)[. :)]*'
+PAIR_PREFIXES = ["q", "q.", "sol", "sol.", "solution", "solution:"]
+PAIR_NUMBER_PATTERN = r'(?P<num>[0-9]+)[. :)]*'
+STRONG_INDENT_RATIO = 0.20  # "Q 12" may sit further into the column
+WEAK_INDENT_RATIO = 0.05    # A bare "12." must hug the column margin
+
+
+# --- 1. VECTOR PRIMITIVES ---
+
+def match_tokens(tokens, pattern, flags=0):
+    """
+    Full-matches `pattern` against every token with ONE regex scan over the
+    newline-joined token stream, instead of one re.match() call per word.
+    Returns (idx, matches): token indices (int array) and their match objects.
+    """
+    n = len(tokens)
+    if n == 0: return np.zeros(0, dtype=np.int64), []
+
+    tokens = [str(t) for t in tokens]
+    lengths = np.fromiter((len(t) + 1 for t in tokens), dtype=np.int64, count=n)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    regex = re.compile(r'^(?:%s)$' % pattern, flags | re.MULTILINE)
+    matches = list(regex.finditer("\n".join(tokens)))
+    if not matches: return np.zeros(0, dtype=np.int64), []
+
+    match_starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    idx = np.searchsorted(starts, match_starts, side='right') - 1
+    return idx, matches
+
+def token_numbers(matches, group='num'):
+    """int() of the named group for each match (absurdly long digit runs map to a huge sentinel)."""
+    return np.fromiter((int(g) if len(g) < 10 else 10**9 for g in (m.group(group) for m in matches)),
+                       dtype=np.int64, count=len(matches))
+
+def scatter(n, idx, values, fill=0, dtype=np.int64):
+    """Places per-match values back onto a length-n per-token array."""
+    out = np.full(n, fill, dtype=dtype)
+    if len(idx): out[idx] = values
+    return out
+
+def token_in(tokens, choices):
+    """Case-insensitive membership test of every token in `choices`."""
+    if len(tokens) == 0: return np.zeros(0, dtype=bool)
+    return np.isin(np.char.lower(np.asarray(tokens).astype(str)), choices)
+
+def font_mask(fontnames, markers=BOLD_MARKERS):
+    """True where the font name contains any marker (e.g. bold / bd / black)."""
+    if len(fontnames) == 0: return np.zeros(0, dtype=bool)
+    lower = np.char.lower(np.asarray(fontnames).astype(str))
+    mask = np.zeros(len(lower), dtype=bool)
+    for marker in markers:
+        mask |= np.char.find(lower, marker) >= 0
+    return mask
+
+def column_index(x0, midpoint):
+    """0 for the left column, 1 for the right column."""
+    return (np.asarray(x0) >= midpoint).astype(np.int64)
+
+def relative_x(x0, cols, midpoint):
+    """Offset of each word from the left edge of its own column."""
+    return np.asarray(x0) - cols * midpoint
+
+def sequence_window_mask(nums, last_num, max_jump):
+    """Keeps '1' (restart) or numbers that move forward by less than max_jump."""
+    delta = nums - last_num
+    return (nums == 1) | ((delta > 0) & (delta < max_jump))
+
+def first_per_question(anchors):
+    """Keeps the first anchor of each q_num and sorts by q_num."""
+    unique = {}
+    for a in anchors:
+        if a['q_num'] not in unique: unique[a['q_num']] = a
+    return sorted(unique.values(), key=lambda x: x['q_num'])
+
+
+# --- 2. PROFILES ---
+
+def find_margin_anchors(doc, max_val=None):
+    """
+    CollegeDoors-style anchors ("12.", "Q12", "Sol. 12", "Q" + "12") hugging a column margin.
+    doc: ParsedPdf. Returns [{'q_num', 'page_idx', 'top', 'col'}] sorted by q_num.
+    """
+    anchors = []
+    for page_idx, page in enumerate(doc.pages):
+        n = len(page)
+        if n == 0: continue
+        midpoint = page.width / 2
+
+        # A. Single-token anchors
+        idx, matches = match_tokens(page.text, STANDALONE_PATTERN, re.IGNORECASE)
+        is_single = scatter(n, idx, True, fill=False, dtype=bool)
+        single_num = scatter(n, idx, token_numbers(matches))
+        single_strong = scatter(n, idx, [m.group('prefix') is not None for m in matches], fill=False, dtype=bool)
+
+        # B. Two-token anchors ("Q" followed by "12"); the number token is consumed
+        idx, matches = match_tokens(page.text, PAIR_NUMBER_PATTERN)
+        is_number = scatter(n, idx, True, fill=False, dtype=bool)
+        number_val = scatter(n, idx, token_numbers(matches))
+
+        is_pair = np.zeros(n, dtype=bool)
+        is_pair[:-1] = token_in(page.text[:-1], PAIR_PREFIXES) & is_number[1:]
+        consumed = np.zeros(n, dtype=bool)
+        consumed[1:] = is_pair[:-1]
+        pair_num = np.zeros(n, dtype=np.int64)
+        pair_num[:-1] = number_val[1:]
+
+        is_single &= ~consumed & ~is_pair
+        nums = np.where(is_pair, pair_num, single_num)
+        strong = is_pair | single_strong
+
+        # C. Range, column and indentation filters
+        keep = (is_single | is_pair) & (nums > 0)
+        if max_val: keep &= nums <= max_val
+        cols = column_index(page.x0, midpoint)
+        limit = np.where(strong, page.width * STRONG_INDENT_RATIO, page.width * WEAK_INDENT_RATIO)
+        keep &= relative_x(page.x0, cols, midpoint) <= limit
+
+        for i in np.flatnonzero(keep):
+            anchors.append({'q_num': int(nums[i]), 'page_idx': page_idx, 'top': page.top[i], 'col': int(cols[i])})
+
+    return first_per_question(anchors)
@@ -3,7 +3,7 @@ import numpy as np
 import shutil
 from pathlib import Path
 from datetime import datetime
-from PIL import Image
+from imageDimensionIndex import ImageDimensionIndex
 
 # --- CONFIGURATION ---
 # Use raw strings (r'...') or forward slashes for paths
@@ -34,37 +34,32 @@ def create_backup(file_path):
     except Exception as e:
         print(f"⚠️ Backup failed: {e}")
 
-def get_image_metadata(folder, q_num):
+def q_image_path(folder, q_num):
     """
-    Attempts to find the image and return dimensions.
+    Path of the question image, or None for invalid metadata.
     Handles '1' vs '1.0' discrepancy automatically.
-    Returns: (width, height, status_message)
     """
     if pd.isna(folder) or pd.isna(q_num):
-        return None, None, "Invalid Metadata"
+        return None
 
-    folder_path = IMG_DIR / str(folder).strip()
-    
     # Normalize q_num: "1.0" -> "1"
     try:
         q_clean = str(int(float(q_num)))
     except ValueError:
         q_clean = str(q_num)
 
-    file_name = f"Q_{q_clean}.png"
-    img_path = folder_path / file_name
-
-    if not img_path.exists():
-        return None, None, "Missing File"
-    
-    if img_path.stat().st_size == 0:
-        return None, None, "Corrupt (0 KB)"
+    return IMG_DIR / str(folder).strip() / f"Q_{q_clean}.png"
 
-    try:
-        with Image.open(img_path) as img:
-            return img.width, img.height, "Found"
-    except Exception:
-        return None, None, "Read Error"
+def get_image_metadata(df, index):
+    """
+    Dimensions of every row's question image from the header index (one bulk lookup).
+    Returns a DataFrame (q_width, q_height, img_status) aligned with df.
+    """
+    paths = [q_image_path(folder, q_num) for folder, q_num in zip(df['Folder'], df['Question No.'])]
+    dims = index.lookup(paths)
+    meta = pd.DataFrame(dims, columns=['q_width', 'q_height', 'img_status'], index=df.index)
+    meta.loc[[p is None for p in paths], 'img_status'] = "Invalid Metadata"
+    return meta
 
 def evaluate_row(row):
     """
@@ -156,14 +151,11 @@ def run_geometry_check():
     # We create a temporary DataFrame for calculation to avoid fragmentation
     temp_df = df.loc[active_idx].copy()
     
-    # Apply is cleaner than iterrows. 
-    # It returns a Series of tuples which we break into columns.
-    meta_results = temp_df.apply(
-        lambda x: get_image_metadata(x['Folder'], x['Question No.']), axis=1
-    )
-    
-    # Unpack results into the temp dataframe
-    temp_df[['q_width', 'q_height', 'img_status']] = pd.DataFrame(meta_results.tolist(), index=temp_df.index)
+    # Header-only index: unchanged files (same size + mtime) are not even opened
+    index = ImageDimensionIndex(IMG_DIR)
+    temp_df[['q_width', 'q_height', 'img_status']] = get_image_metadata(temp_df, index)
+    index.save()
+    print(f"   -> {index.summary()}")
 
     # --- EXECUTE: LOGIC PHASE (Check Rules) ---
     print("🧠 Phase 2: Applying geometry rules...")
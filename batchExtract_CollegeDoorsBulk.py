@@ -1,11 +1,16 @@
 import os
 import glob
 import pandas as pd
-import pdfplumber
+from pdfWordIndex import ParsedPdf
+from anchorDetection import find_margin_anchors
 import json
 import re
-import time
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from pdfSegmentRenderer import plan_question_segments, render_segments
+from extractionCache import ExtractionCache, CACHE_DIR_NAME
+from imageEncoderPool import EncoderPool
+from extractionManifest import FolderManifest
 from PIL import Image, ImageChops
 try:
     from tqdm import tqdm
@@ -20,13 +25,11 @@ config = {}
 if os.path.exists(CONFIG_PATH):
     with open(CONFIG_PATH, 'r') as f:
         config = json.load(f)
-    print(f"✅ Loaded config file.")
-else:
-    print(f"⚠️ Config not found. Using defaults.")
 
 BASE_PATH = config.get('BASE_PATH', DEFAULT_BASE_PATH)
 RAW_DATA_PATH = os.path.join(BASE_PATH, 'raw data') 
 OUTPUT_BASE = os.path.join(BASE_PATH, 'Processed_Database')
+CACHE_DIR = os.path.join(OUTPUT_BASE, CACHE_DIR_NAME)
 
 # PATHS FOR DB
 MASTER_XLSX_PATH = os.path.join(BASE_PATH, 'DB Master.xlsx') # Read-Only Source
@@ -36,11 +39,18 @@ METADATA_FILE_PATH = os.path.join(BASE_PATH, 'DB Metadata.xlsx')
 
 start_id = config.get('last_unique_id', config.get('latest_question_id', 0))
 
-print(f"🔧 CONFIGURATION CHECK:")
-print(f"   - Source Folder : {RAW_DATA_PATH}")
-print(f"   - Metadata File : {METADATA_FILE_PATH}")
-print(f"   - Master CSV    : {MASTER_CSV_PATH}")
-print(f"   - ID Counter    : Starts at {start_id}")
+# PARALLEL MODE: worker processes for folder extraction (0 or 1 = one folder at a time)
+PARALLEL_WORKERS = int(config.get('parallel_workers', 0))
+# PNG ENCODING: background threads per process (0 = auto)
+ENCODER_WORKERS = int(config.get('encoder_workers', 0))
+
+# LAYOUT (part of the extraction cache key: changing one only re-renders the questions it moves)
+RENDER_DPI = 300
+FOOTER_RATIO = 0.92             # Bottom 8% of the page is footer
+VERTICAL_PADDING_PX = 15        # At RENDER_DPI
+# Bump 'parser' / 'pipeline' after changing anchor/text parsing / image post-processing
+CACHE_PARSE_PARAMS = {'parser': 'margin-anchors-v1', 'footer_ratio': FOOTER_RATIO}
+CACHE_RENDER_PARAMS = {'dpi': RENDER_DPI, 'pipeline': 'trim-whitespace-v1'}
 
 os.makedirs(OUTPUT_BASE, exist_ok=True)
 
@@ -57,136 +67,90 @@ def trim_whitespace(im):
         return im
     except Exception: return im
 
-def find_anchors_robust(pdf_path, max_val=None, is_solution=False):
-    anchors = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_idx, page in enumerate(pdf.pages):
-            width = page.width
-            midpoint = width / 2
-            
-            words = page.extract_words(keep_blank_chars=False)
-            i = 0
-            while i < len(words):
-                curr_word = words[i]
-                text = curr_word['text'].strip()
-                x0 = curr_word['x0']
-                
-                col = 0 if x0 < midpoint else 1
-                relative_x = x0 if col == 0 else (x0 - midpoint)
-                
-                found_q_num = None
-                is_strong_anchor = False 
+def find_anchors_robust(doc, max_val=None, is_solution=False):
+    """doc: ParsedPdf (words are parsed once and shared with extract_text_content)."""
+    return find_margin_anchors(doc, max_val=max_val)
 
-                match = re.match(r'^(?:Q|Sol|Solution|S)?[\.\s]*(\d+)[\.\s:)]*$', text, re.IGNORECASE)
-                if match:
-                    found_q_num = int(match.group(1))
-                    if text[0].isalpha(): is_strong_anchor = True
-                
-                elif text.lower() in ["q", "q.", "sol", "sol.", "solution", "solution:"] and i + 1 < len(words):
-                    next_word = words[i+1]
-                    match_next = re.match(r'^(\d+)[\.\s:)]*$', next_word['text'])
-                    if match_next:
-                        found_q_num = int(match_next.group(1))
-                        is_strong_anchor = True 
-                        i += 1 
-
-                if found_q_num:
-                    if max_val and found_q_num > max_val: 
-                        found_q_num = None
-                    else:
-                        if is_strong_anchor:
-                            if relative_x > (width * 0.20): found_q_num = None 
-                        else:
-                            if relative_x > (width * 0.05): found_q_num = None
-
-                    if found_q_num:
-                        anchors.append({'q_num': found_q_num, 'page_idx': page_idx, 'top': curr_word['top'], 'col': col})
-                i += 1
-
-    unique_anchors = {}
-    for a in anchors:
-        if a['q_num'] not in unique_anchors: unique_anchors[a['q_num']] = a
-    return sorted(unique_anchors.values(), key=lambda x: x['q_num'])
-
-def extract_text_content(pdf_path, anchors, is_two_column=True):
+def extract_text_content(doc, anchors, is_two_column=True):
+    """doc: ParsedPdf. Column slices are cut from the cached word table, not page.crop()."""
     extracted_text = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        pages = pdf.pages
-        if not pages: return {}
+    if len(doc) == 0: return {}
+    
+    width = doc.page(0).width
+    height = doc.page(0).height
+    midpoint = width / 2
+    BOTTOM_LIMIT = height * FOOTER_RATIO
+
+    for i, start in enumerate(anchors):
+        q_num = start['q_num']
+        text_segments = []
+        
+        if i + 1 < len(anchors):
+            end = anchors[i+1]
+        else:
+            end = {'page_idx': start['page_idx'], 'top': BOTTOM_LIMIT, 'col': start['col']}
+
+        curr_pidx = start['page_idx']
+        curr_col = start['col']
+        curr_top = start['top']
         
-        width = pages[0].width
-        height = pages[0].height
-        midpoint = width / 2
-        BOTTOM_LIMIT = height * 0.92
-
-        for i, start in enumerate(anchors):
-            q_num = start['q_num']
-            text_segments = []
+        while True:
+            page = doc.page(curr_pidx)
+            if is_two_column:
+                x0 = 0 if curr_col == 0 else midpoint
+                x1 = midpoint if curr_col == 0 else width
+            else:
+                x0 = 0; x1 = width
             
-            if i + 1 < len(anchors):
-                end = anchors[i+1]
+            if curr_pidx == end['page_idx'] and curr_col == end['col']:
+                bottom = end['top']
+                done = True
             else:
-                end = {'page_idx': start['page_idx'], 'top': BOTTOM_LIMIT, 'col': start['col']}
-
-            curr_pidx = start['page_idx']
-            curr_col = start['col']
-            curr_top = start['top']
+                bottom = BOTTOM_LIMIT
+                done = False
             
-            while True:
-                page = pages[curr_pidx]
-                if is_two_column:
-                    x0 = 0 if curr_col == 0 else midpoint
-                    x1 = midpoint if curr_col == 0 else width
-                else:
-                    x0 = 0; x1 = width
-                
-                if curr_pidx == end['page_idx'] and curr_col == end['col']:
-                    bottom = end['top']
-                    done = True
-                else:
-                    bottom = BOTTOM_LIMIT
-                    done = False
-                
-                if bottom > curr_top:
-                    try:
-                        cropped_page = page.crop((x0, curr_top, x1, bottom))
-                        text = cropped_page.extract_text()
-                        if text: text_segments.append(text)
-                    except Exception: pass
-                
-                if done: break
-                
-                if is_two_column:
-                    if curr_col == 0:
-                        curr_col = 1; curr_top = 50 
-                    else:
-                        curr_col = 0; curr_pidx += 1; curr_top = 50
+            if bottom > curr_top:
+                text = page.text_in_bbox((x0, curr_top, x1, bottom))
+                if text: text_segments.append(text)
+            
+            if done: break
+            
+            if is_two_column:
+                if curr_col == 0:
+                    curr_col = 1; curr_top = 50 
                 else:
-                    curr_pidx += 1; curr_top = 50
-                
-                if curr_pidx >= len(pages): break
-
-            full_text = "\n".join(text_segments).strip()
-            extracted_text[q_num] = full_text
+                    curr_col = 0; curr_pidx += 1; curr_top = 50
+            else:
+                curr_pidx += 1; curr_top = 50
             
+            if curr_pidx >= len(doc): break
+
+        full_text = "\n".join(text_segments).strip()
+        extracted_text[q_num] = full_text
+        
     return extracted_text
 
-def crop_and_save_standard(pdf_path, anchors, output_folder, suffix_type, is_two_column=True):
+def crop_and_save_standard(pdf_path, anchors, output_folder, suffix_type, is_two_column=True, cache=None,
+                           manifest=None, q_ids=None):
+    # Only the question rectangles are rasterized (PyMuPDF clip), never full pages.
+    # Questions already checkpointed in the folder manifest (or the cache) with the same segments are skipped.
+    # Trim + PNG encoding run on the encoder pool while the next question is rendered.
+    # q_ids: {q_num: unique_id}, written to the manifest as each question completes.
     try: 
-        pdf_images = convert_from_path(pdf_path, dpi=300)
+        doc = fitz.open(pdf_path)
     except: 
         print(f"❌ Error converting PDF: {os.path.basename(pdf_path)}")
         return
 
-    if not pdf_images: return
-    page_width, page_height = pdf_images[0].size
-    scale = 300 / 72 
-    midpoint_px = (page_width / 2) 
-    FOOTER_CUTOFF_PX = page_height * 0.92
-    VERTICAL_PADDING = 15 
-    TOP_MARGIN = 50 * scale 
+    if len(doc) == 0: return
+    page_width = doc[0].rect.width
+    page_height = doc[0].rect.height
+    scale = RENDER_DPI / 72 
+    FOOTER_CUTOFF = page_height * FOOTER_RATIO
+    VERTICAL_PADDING = VERTICAL_PADDING_PX / scale
     
     pbar = tqdm(total=len(anchors), desc=f"   📷 Cropping {suffix_type}", leave=True)
+    encoder = EncoderPool(ENCODER_WORKERS or None)
     
     for i, start in enumerate(anchors):
         q_num = start['q_num']
@@ -194,198 +158,168 @@ def crop_and_save_standard(pdf_path, anchors, output_folder, suffix_type, is_two
         if i + 1 < len(anchors): 
             end = anchors[i+1]
         else: 
-            end = {'page_idx': start['page_idx'], 'top': FOOTER_CUTOFF_PX / scale, 'col': start['col']} 
-
-        start_top_px = max(0, (start['top'] * scale) - VERTICAL_PADDING)
-        end_top_px = (end['top'] * scale) - VERTICAL_PADDING
+            end = {'page_idx': start['page_idx'], 'top': FOOTER_CUTOFF, 'col': start['col']} 
 
         try:
-            images_to_stitch = []
-            if is_two_column:
-                start_left = 0 if start['col'] == 0 else midpoint_px
-                start_right = midpoint_px if start['col'] == 0 else page_width
-                end_left = 0 if end['col'] == 0 else midpoint_px
-                end_right = midpoint_px if end['col'] == 0 else page_width
-            else:
-                start_left = 0; start_right = page_width
-                end_left = 0; end_right = page_width
-
-            if start['page_idx'] == end['page_idx']:
-                if start['col'] == end['col']:
-                    bottom = min(end_top_px, FOOTER_CUTOFF_PX)
-                    if bottom <= start_top_px: bottom = start_top_px + 10 
-                    images_to_stitch.append(pdf_images[start['page_idx']].crop((start_left, start_top_px, start_right, bottom)))
-                else:
-                    if FOOTER_CUTOFF_PX > start_top_px:
-                        images_to_stitch.append(pdf_images[start['page_idx']].crop((start_left, start_top_px, start_right, FOOTER_CUTOFF_PX)))
-                    if end_top_px > TOP_MARGIN:
-                        images_to_stitch.append(pdf_images[start['page_idx']].crop((end_left, TOP_MARGIN, end_right, end_top_px)))
-            else:
-                if FOOTER_CUTOFF_PX > start_top_px:
-                    images_to_stitch.append(pdf_images[start['page_idx']].crop((start_left, start_top_px, start_right, FOOTER_CUTOFF_PX)))
-                for mid_idx in range(start['page_idx'] + 1, end['page_idx']):
-                    if FOOTER_CUTOFF_PX > TOP_MARGIN:
-                        images_to_stitch.append(pdf_images[mid_idx].crop((start_left, TOP_MARGIN, start_right, FOOTER_CUTOFF_PX)))
-                if end_top_px > TOP_MARGIN:
-                    images_to_stitch.append(pdf_images[end['page_idx']].crop((end_left, TOP_MARGIN, end_right, end_top_px)))
-
-            if images_to_stitch:
-                total_height = sum(img.height for img in images_to_stitch)
-                if total_height > 0:
-                    max_width = max(img.width for img in images_to_stitch)
-                    final_img = Image.new('RGB', (max_width, total_height), (255, 255, 255))
-                    y_offset = 0
-                    for img in images_to_stitch:
-                        final_img.paste(img, (0, y_offset))
-                        y_offset += img.height
-                    
-                    final_img = trim_whitespace(final_img)
-                    filename = f"{suffix_type}_{q_num}.png"
-                    final_img.save(os.path.join(output_folder, filename))
+            segments = plan_question_segments(start, end, page_width, page_height, is_two_column=is_two_column,
+                                              footer_pts=FOOTER_CUTOFF, padding_pts=VERTICAL_PADDING)
+            filename = f"{suffix_type}_{q_num}.png"
+            out_path = os.path.join(output_folder, filename)
+            uid = (q_ids or {}).get(q_num)
+
+            done = manifest is not None and manifest.is_done(filename, segments, out_path, CACHE_RENDER_PARAMS)
+            if not done and cache is not None and cache.lookup(filename, segments, out_path) is not None:
+                done = True
+                if manifest is not None:
+                    manifest.record(filename, segments, out_path, CACHE_RENDER_PARAMS, q_num=q_num, unique_id=uid)
+            if done:
+                pbar.update(1)
+                continue
+
+            final_img = render_segments(doc, segments, dpi=RENDER_DPI)
+
+            if final_img is not None:
+                def on_saved(size, name=filename, seg=segments, path=out_path, q_num=q_num, uid=uid):
+                    if cache is not None: cache.record(name, seg, path)
+                    if manifest is not None:
+                        manifest.record(name, seg, path, CACHE_RENDER_PARAMS, q_num=q_num, unique_id=uid)
+                encoder.save(final_img, out_path, process=trim_whitespace, on_saved=on_saved)
                 
         except Exception as e:
             print(f"❌ Error Saving {suffix_type}_{q_num}: {e}")
             
         pbar.update(1)
     pbar.close()
+    doc.close()
+
+    # Barrier: every PNG is on disk before the caller saves the cache / writes rows
+    for path, e in encoder.close():
+        print(f"❌ Error Saving {os.path.basename(path)}: {e}")
 
 # --- 3. TARGETING ---
-print(f"\n--- 🔍 SCANNING ---")
-processed_folders = set()
-final_master_df = pd.DataFrame()
 
-# 1. Load Processed List (Switching to CSV logic)
-if os.path.exists(MASTER_CSV_PATH):
-    try:
-        final_master_df = pd.read_csv(MASTER_CSV_PATH)
-        print(f"✅ Active CSV Loaded ({len(final_master_df)} rows).")
-    except Exception as e:
-        print(f"⚠️ Error reading Master CSV: {e}")
+def load_master_db():
+    """Loads DB Master.csv (or seeds it from DB Master.xlsx) and the set of processed folders."""
+    final_master_df = pd.DataFrame()
+    processed_folders = set()
 
-elif os.path.exists(MASTER_XLSX_PATH):
-    # Fallback: Initialize CSV from Read-Only Excel if CSV doesn't exist
-    try:
-        print(f"ℹ️ CSV not found. Initializing from DB Master.xlsx...")
-        final_master_df = pd.read_excel(MASTER_XLSX_PATH)
-        # Save immediately to establish the CSV
-        final_master_df.to_csv(MASTER_CSV_PATH, index=False)
-        print(f"✅ Created DB Master.csv from Excel source.")
-    except Exception as e:
-        print(f"⚠️ Error reading Master XLSX: {e}")
+    # 1. Load Processed List (Switching to CSV logic)
+    if os.path.exists(MASTER_CSV_PATH):
+        try:
+            final_master_df = pd.read_csv(MASTER_CSV_PATH)
+            print(f"✅ Active CSV Loaded ({len(final_master_df)} rows).")
+        except Exception as e:
+            print(f"⚠️ Error reading Master CSV: {e}")
 
-if 'Folder' in final_master_df.columns:
-    processed_folders = set(final_master_df['Folder'].dropna().astype(str).unique())
-    print(f"   Found {len(processed_folders)} processed folders in DB.")
+    elif os.path.exists(MASTER_XLSX_PATH):
+        # Fallback: Initialize CSV from Read-Only Excel if CSV doesn't exist
+        try:
+            print(f"ℹ️ CSV not found. Initializing from DB Master.xlsx...")
+            final_master_df = pd.read_excel(MASTER_XLSX_PATH)
+            # Save immediately to establish the CSV
+            final_master_df.to_csv(MASTER_CSV_PATH, index=False)
+            print(f"✅ Created DB Master.csv from Excel source.")
+        except Exception as e:
+            print(f"⚠️ Error reading Master XLSX: {e}")
 
-# 2. Load Central Metadata
-central_meta_df = pd.DataFrame()
-valid_folders_set = set()
+    if 'Folder' in final_master_df.columns:
+        processed_folders = set(final_master_df['Folder'].dropna().astype(str).unique())
+        print(f"   Found {len(processed_folders)} processed folders in DB.")
 
-if os.path.exists(METADATA_FILE_PATH):
-    try:
-        central_meta_df = pd.read_excel(METADATA_FILE_PATH, sheet_name='CD_Metadata')
-        central_meta_df.columns = central_meta_df.columns.str.strip()
-        
-        if 'Folder' in central_meta_df.columns:
-            central_meta_df['Folder'] = central_meta_df['Folder'].astype(str).str.strip()
-            valid_folders_set = set(central_meta_df['Folder'].unique())
-            
-        print(f"✅ Metadata Loaded. Found {len(central_meta_df)} rows. {len(valid_folders_set)} valid folders.")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not load 'CD_Metadata' from Excel. {e}")
-else:
-    print("⚠️ Warning: DB Metadata.xlsx not found.")
+    return final_master_df, processed_folders
 
-if not os.path.exists(RAW_DATA_PATH):
-    print(f"❌ CRITICAL: Folder not found: {RAW_DATA_PATH}")
-    exit()
+def load_central_metadata():
+    """Loads the CD_Metadata sheet and the set of folders it covers."""
+    central_meta_df = pd.DataFrame()
+    valid_folders_set = set()
 
-all_subfolders = [f.path for f in os.scandir(RAW_DATA_PATH) if f.is_dir()]
-target_folders = []
+    if os.path.exists(METADATA_FILE_PATH):
+        try:
+            central_meta_df = pd.read_excel(METADATA_FILE_PATH, sheet_name='CD_Metadata')
+            central_meta_df.columns = central_meta_df.columns.str.strip()
 
-print(f"📂 Looking in 'raw data'...")
+            if 'Folder' in central_meta_df.columns:
+                central_meta_df['Folder'] = central_meta_df['Folder'].astype(str).str.strip()
+                valid_folders_set = set(central_meta_df['Folder'].unique())
 
-for folder_path in all_subfolders:
-    folder_name = os.path.basename(folder_path)
-    clean_name = folder_name.strip()
-    
-    if not clean_name.startswith("CollegeDoors"): 
-        continue
-    
-    if clean_name not in valid_folders_set:
-        continue
+            print(f"✅ Metadata Loaded. Found {len(central_meta_df)} rows. {len(valid_folders_set)} valid folders.")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load 'CD_Metadata' from Excel. {e}")
+    else:
+        print("⚠️ Warning: DB Metadata.xlsx not found.")
+
+    return central_meta_df, valid_folders_set
+
+def find_target_folders(processed_folders, valid_folders_set):
+    all_subfolders = [f.path for f in os.scandir(RAW_DATA_PATH) if f.is_dir()]
+    target_folders = []
+
+    print(f"📂 Looking in 'raw data'...")
+
+    for folder_path in all_subfolders:
+        folder_name = os.path.basename(folder_path)
+        clean_name = folder_name.strip()
+
+        if not clean_name.startswith("CollegeDoors"):
+            continue
+
+        if clean_name not in valid_folders_set:
+            continue
 
-    if clean_name in processed_folders: 
-        continue
+        if clean_name in processed_folders:
+            continue
 
-    print(f"   ✅ FOUND NEW: {clean_name}")
-    target_folders.append(folder_path)
+        print(f"   ✅ FOUND NEW: {clean_name}")
+        target_folders.append(folder_path)
 
-if not target_folders:
-    print("\n🎉 All valid folders from Metadata are processed! Exiting.")
-    exit()
+    return target_folders
 
-# --- 4. PROCESSING LOOP ---
-start_time = time.time()
-current_global_id = start_id
-new_data_list = []
+# --- 4. PER-FOLDER WORK ---
 
-for folder in tqdm(target_folders, desc="Processing Batches"):
+def load_folder_job(folder, central_meta_df):
+    """
+    Reads the answer key + metadata of one folder (cheap, no PDF work).
+    Returns a job dict for extract_folder(), or None if the folder can't be processed.
+    """
     test_name = os.path.basename(folder).strip()
-    print(f"\n🔹 Processing: {test_name}")
-    
+
     q_papers = glob.glob(os.path.join(folder, "*question_paper.pdf"))
     sol_pdfs = glob.glob(os.path.join(folder, "*solution_pdf.pdf"))
     excel_keys = glob.glob(os.path.join(folder, "*excel_answer_key.xlsx")) + glob.glob(os.path.join(folder, "*excel_answer_key.csv"))
-    
+
     if not (q_papers and sol_pdfs and excel_keys):
-        print(f"   ⚠️ Missing required files. Skipping.")
-        continue
+        print(f"   ⚠️ {test_name}: Missing required files. Skipping.")
+        return None
 
     try:
         key_path = excel_keys[0]
         key_df = pd.read_csv(key_path) if key_path.endswith('.csv') else pd.read_excel(key_path)
         total_questions = key_df['Question No.'].max() if 'Question No.' in key_df.columns else len(key_df)
-        
+
         # --- METADATA LOGIC ---
         folder_specific_meta = pd.DataFrame()
         if not central_meta_df.empty:
             folder_specific_meta = central_meta_df[central_meta_df['Folder'] == test_name].copy()
-        
+
         if not folder_specific_meta.empty:
             meta_df = folder_specific_meta
             if 'Q' in meta_df.columns:
                 meta_df = meta_df.rename(columns={'Q': 'Question No.'})
-            print(f"   ℹ️ Loaded metadata from Central Sheet ({len(meta_df)} rows).")
+            print(f"   ℹ️ {test_name}: Loaded metadata from Central Sheet ({len(meta_df)} rows).")
         else:
-            print(f"   ⚠️ Metadata missing in Excel. Creating fallback.")
+            print(f"   ⚠️ {test_name}: Metadata missing in Excel. Creating fallback.")
             meta_df = pd.DataFrame({'Question No.': key_df['Question No.']})
             meta_df['Topic'] = "Unknown"
             meta_df['Sub-Topic'] = "Unknown"
             meta_df['Subject'] = "Unknown"
 
     except Exception as e:
-        print(f"   ❌ Data Load Error: {e}")
-        continue
-    
-    test_output_dir = os.path.join(OUTPUT_BASE, test_name)
-    os.makedirs(test_output_dir, exist_ok=True)
-    
-    # 1. Calculate Anchors
-    q_anchors = find_anchors_robust(q_papers[0], max_val=total_questions)
-    sol_anchors = find_anchors_robust(sol_pdfs[0], max_val=total_questions, is_solution=True)
-
-    # 2. Extract Images
-    crop_and_save_standard(q_papers[0], q_anchors, test_output_dir, "Q", is_two_column=True)
-    crop_and_save_standard(sol_pdfs[0], sol_anchors, test_output_dir, "Sol", is_two_column=True)
-
-    # 3. Extract Text
-    print("   📝 Extracting & Cleaning Text...")
-    extracted_text_map = extract_text_content(q_papers[0], q_anchors, is_two_column=True)
+        print(f"   ❌ {test_name}: Data Load Error: {e}")
+        return None
 
     # DataFrame Logic
     meta_df['Folder'] = test_name
-    
+
     # Merge Metadata with Answer Key
     if 'Question No.' in meta_df.columns and 'Question No.' in key_df.columns:
         combined_df = pd.merge(meta_df, key_df, on='Question No.', how='left', suffixes=('', '_key'))
@@ -401,31 +335,104 @@ for folder in tqdm(target_folders, desc="Processing Batches"):
         else:
             # Rename key col to main col
             combined_df['Correct Answer'] = combined_df['Correct Answer_key']
-        
+
         # Drop the extra key column
         combined_df.drop(columns=['Correct Answer_key'], inplace=True)
 
+    # One unique_id per answer-key row that has a question number
+    id_slots = int(combined_df['Question No.'].notna().sum()) if 'Question No.' in combined_df.columns else 0
+
+    # A folder interrupted in an earlier run resumes with the ID block recorded in its manifest
+    output_dir = os.path.join(OUTPUT_BASE, test_name)
+
+    return {
+        'folder': folder,
+        'output_dir': output_dir,
+        'manifest_block': FolderManifest(output_dir).id_block,
+        'test_name': test_name,
+        'q_paper': q_papers[0],
+        'sol_pdf': sol_pdfs[0],
+        'total_questions': total_questions,
+        'combined_df': combined_df,
+        'id_slots': id_slots,
+        'id_start': None,
+    }
+
+def extract_folder(job):
+    """
+    Renders + extracts one folder. Safe to run in a worker process.
+    unique_ids are taken from the block reserved for this folder: id_start+1 .. id_start+id_slots.
+    Returns (test_name, combined_df).
+    """
+    test_name = job['test_name']
+    combined_df = job['combined_df']
+    total_questions = job['total_questions']
+    print(f"\n🔹 Processing: {test_name}")
+
+    test_output_dir = job['output_dir']
+    os.makedirs(test_output_dir, exist_ok=True)
+    manifest = FolderManifest(test_output_dir)
+
+    # unique_id of each question, in answer-key order (same rule as the ID loop below)
+    q_ids = {}
+    if 'Question No.' in combined_df.columns:
+        for k, q_num in enumerate(combined_df['Question No.'].dropna()):
+            q_ids.setdefault(int(q_num), job['id_start'] + k + 1)
+
+    # 1. Calculate Anchors + Text (each PDF is parsed once, and not at all on a cache hit)
+    parse_params = dict(CACHE_PARSE_PARAMS, max_val=int(total_questions))
+    q_cache = ExtractionCache(CACHE_DIR, job['q_paper'], 'collegedoors_q', parse_params=parse_params,
+                              render_params=CACHE_RENDER_PARAMS)
+    sol_cache = ExtractionCache(CACHE_DIR, job['sol_pdf'], 'collegedoors_sol', parse_params=parse_params,
+                                render_params=CACHE_RENDER_PARAMS)
+
+    sol_anchors, _ = sol_cache.load_anchors()
+    if sol_anchors is None:
+        with ParsedPdf(job['sol_pdf']) as sol_doc:
+            sol_anchors = find_anchors_robust(sol_doc, max_val=total_questions, is_solution=True)
+        sol_cache.store_anchors(sol_anchors)
+
+    q_anchors, q_extras = q_cache.load_anchors()
+    if q_anchors is None:
+        print(f"   📝 {test_name}: Extracting & Cleaning Text...")
+        with ParsedPdf(job['q_paper']) as q_doc:
+            q_anchors = find_anchors_robust(q_doc, max_val=total_questions)
+            extracted_text_map = extract_text_content(q_doc, q_anchors, is_two_column=True)
+        q_cache.store_anchors(q_anchors, text=extracted_text_map)
+    else:
+        extracted_text_map = {int(k): v for k, v in q_extras.get('text', {}).items()}
+
+    # 2. Extract Images
+    crop_and_save_standard(job['q_paper'], q_anchors, test_output_dir, "Q", is_two_column=True, cache=q_cache,
+                           manifest=manifest, q_ids=q_ids)
+    crop_and_save_standard(job['sol_pdf'], sol_anchors, test_output_dir, "Sol", is_two_column=True, cache=sol_cache,
+                           manifest=manifest, q_ids=q_ids)
+    q_cache.save()
+    sol_cache.save()
+    print(f"   ♻️ {test_name}: Q {q_cache.summary()} | Sol {sol_cache.summary()}")
+
+    current_id = job['id_start']
     unique_ids_col = []
     pdf_text_col = []
     text_avail_col = []
-    
+
     for idx, row in combined_df.iterrows():
         q_num = row.get('Question No.')
-        if pd.isna(q_num): 
+        if pd.isna(q_num):
             unique_ids_col.append(None)
             pdf_text_col.append(None)
             text_avail_col.append("No")
             continue
-            
+
         q_num = int(q_num)
-        
-        current_global_id += 1
-        unique_ids_col.append(current_global_id)
-        
+
+        current_id += 1
+        unique_ids_col.append(current_id)
+
         raw_text = extracted_text_map.get(q_num, "")
         cleaned_text = re.sub(r'\b\S*_\S*\b', '', raw_text) # Remove ATPH_...
         cleaned_text = " ".join(cleaned_text.split())
-        
+
         if len(cleaned_text) < 30:
             pdf_text_col.append("")
             text_avail_col.append("No")
@@ -433,35 +440,136 @@ for folder in tqdm(target_folders, desc="Processing Batches"):
             pdf_text_col.append(cleaned_text)
             text_avail_col.append("Yes")
 
+    if current_id - job['id_start'] != job['id_slots']:
+        raise RuntimeError(f"{test_name}: used {current_id - job['id_start']} IDs but reserved {job['id_slots']}")
+
     combined_df['unique_id'] = unique_ids_col
     combined_df['pdf_Text'] = pdf_text_col
     combined_df['PDF_Text_Available'] = text_avail_col
-    
+
     # --- FIX: QC STATUS DEFAULT ---
     # Set to 'Pending QC' so we don't assume Pass
     combined_df['QC_Status'] = "Pending QC"
-    
+
     combined_df.fillna("Unknown", inplace=True)
     combined_df = combined_df[combined_df['unique_id'].notna()]
+    return test_name, combined_df
+
+def save_id_counter(last_id):
+    """Persists last_unique_id (never moves it backwards: resumed folders reuse older blocks)."""
+    config['last_unique_id'] = max(int(last_id), int(config.get('last_unique_id', 0)))
+    with open(CONFIG_PATH, 'w') as f:
+        json.dump(config, f, indent=4)
+
+def reserve_id_blocks(jobs, cursor):
+    """
+    Gives every job its contiguous unique_id block, in folder order.
+    A folder whose manifest already holds a block of the right size (interrupted run) keeps it;
+    new blocks start at cursor, are written to the folder manifest and persisted to config at once,
+    so a crash can never hand the same IDs out twice. Returns the new cursor.
+    """
+    for job in jobs:
+        block = job.get('manifest_block')
+        if block and block[1] == job['id_slots']:
+            job['id_start'] = block[0]
+            print(f"   ♻️ {job['test_name']}: Resuming with IDs {block[0] + 1}-{block[0] + block[1]} from manifest.")
+            continue
+        job['id_start'] = cursor
+        cursor += job['id_slots']
+        FolderManifest(job['output_dir']).set_id_block(job['id_start'], job['id_slots'])
+    save_id_counter(cursor)
+    return cursor
+
+def save_folder_result(final_master_df, combined_df, last_id):
+    """INCREMENTAL SAVE (DB MASTER CSV & CONFIG). Returns the updated master DataFrame."""
+    if combined_df.empty: return final_master_df
+    try:
+        # 1. Update Master DF in memory (a resumed folder reuses its manifest IDs: replace rows saved before a crash)
+        if 'unique_id' in final_master_df.columns and 'unique_id' in combined_df.columns:
+            ids = pd.to_numeric(final_master_df['unique_id'], errors='coerce')
+            final_master_df = final_master_df[~ids.isin(pd.to_numeric(combined_df['unique_id'], errors='coerce'))]
+        final_master_df = pd.concat([final_master_df, combined_df], ignore_index=True)
+
+        # 2. Write to CSV (Instead of Excel)
+        final_master_df.to_csv(MASTER_CSV_PATH, index=False)
+
+        # 3. Update Config Counter
+        save_id_counter(last_id)
 
-    # --- INCREMENTAL SAVE (DB MASTER CSV & CONFIG) ---
-    if not combined_df.empty:
+        print(f"   💾 SAVED: Added {len(combined_df)} questions to DB Master.csv. (Current ID: {last_id})")
+
+    except Exception as e:
+        print(f"   ❌ FATAL SAVE ERROR: {e}")
+    return final_master_df
+
+# --- 5. PROCESSING LOOP ---
+
+def run_sequential(target_folders, central_meta_df, final_master_df):
+    jobs = [job for job in (load_folder_job(folder, central_meta_df) for folder in target_folders) if job]
+    reserve_id_blocks(jobs, start_id)
+    for job in tqdm(jobs, desc="Processing Batches"):
         try:
-            # 1. Update Master DF in memory
-            final_master_df = pd.concat([final_master_df, combined_df], ignore_index=True)
-            
-            # 2. Write to CSV (Instead of Excel)
-            final_master_df.to_csv(MASTER_CSV_PATH, index=False)
-            
-            # 3. Update Config Counter
-            config['last_unique_id'] = current_global_id
-            with open(CONFIG_PATH, 'w') as f:
-                json.dump(config, f, indent=4)
-                
-            print(f"   💾 SAVED: Added {len(combined_df)} questions to DB Master.csv. (Current ID: {current_global_id})")
-            
+            _, combined_df = extract_folder(job)
         except Exception as e:
-            print(f"   ❌ FATAL SAVE ERROR: {e}")
+            # Block stays in the folder manifest: the next run resumes with the same IDs
+            print(f"   ❌ {job['test_name']}: Extraction Error: {e}")
+            continue
+
+        final_master_df = save_folder_result(final_master_df, combined_df, job['id_start'] + job['id_slots'])
+    return final_master_df
+
+def run_parallel(target_folders, central_meta_df, final_master_df, workers):
+    """
+    Fans folders out to a process pool. IDs are reserved up front, in folder order,
+    as one contiguous block per folder sized from its answer key, so workers never collide.
+    This process is the only writer: results are merged into DB Master.csv in folder order.
+    """
+    jobs = [job for job in (load_folder_job(folder, central_meta_df) for folder in target_folders) if job]
+    if not jobs: return final_master_df
+    cursor = reserve_id_blocks(jobs, start_id)
+
+    print(f"\n⚡ Parallel mode: {len(jobs)} folders on {workers} workers. Reserved IDs {start_id + 1}-{cursor}.")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_folder, job) for job in jobs]
+        for job, future in tqdm(zip(jobs, futures), total=len(jobs), desc="Processing Batches"):
+            try:
+                _, combined_df = future.result()
+            except Exception as e:
+                # Block stays reserved in the folder manifest: the next run resumes with the same IDs
+                print(f"   ❌ {job['test_name']}: Extraction Error: {e}")
+                continue
+            final_master_df = save_folder_result(final_master_df, combined_df, job['id_start'] + job['id_slots'])
+    return final_master_df
+
+def main():
+    print(f"🔧 CONFIGURATION CHECK:")
+    print(f"   - Source Folder : {RAW_DATA_PATH}")
+    print(f"   - Metadata File : {METADATA_FILE_PATH}")
+    print(f"   - Master CSV    : {MASTER_CSV_PATH}")
+    print(f"   - ID Counter    : Starts at {start_id}")
+    print(f"   - Workers       : {PARALLEL_WORKERS if PARALLEL_WORKERS > 1 else 'Sequential'}")
+
+    print(f"\n--- 🔍 SCANNING ---")
+    final_master_df, processed_folders = load_master_db()
+    central_meta_df, valid_folders_set = load_central_metadata()
+
+    if not os.path.exists(RAW_DATA_PATH):
+        print(f"❌ CRITICAL: Folder not found: {RAW_DATA_PATH}")
+        return
+
+    target_folders = find_target_folders(processed_folders, valid_folders_set)
+    if not target_folders:
+        print("\n🎉 All valid folders from Metadata are processed! Exiting.")
+        return
+
+    if PARALLEL_WORKERS > 1:
+        run_parallel(target_folders, central_meta_df, final_master_df, PARALLEL_WORKERS)
+    else:
+        run_sequential(target_folders, central_meta_df, final_master_df)
+
+    print("\n--- Finalizing ---")
+    print("✅ All folders processed and saved.")
 
-print("\n--- Finalizing ---")
-print("✅ All folders processed and saved.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import time
 import cv2
 import csv
 import numpy as np
-from pdf2image import convert_from_path
+from pdfPageCache import LazyPageImages
 from PIL import Image, ImageChops, ImageEnhance
 try:
     from tqdm import tqdm
@@ -263,11 +263,12 @@ def extract_text_content(pdf_path, anchors, is_two_column=True):
     return extracted_text
 
 def crop_and_save_standard(pdf_path, anchors, output_folder, suffix_type, is_two_column=True):
-    try: pdf_images = convert_from_path(pdf_path, dpi=300)
+    # Pages are rendered lazily (LRU cached), only when an anchor touches them
+    try: pdf_images = LazyPageImages(pdf_path, dpi=300)
     except: return
     if not pdf_images: return
     
-    page_width, page_height = pdf_images[0].size
+    page_width, page_height = pdf_images.size
     scale = 300 / 72 
     midpoint_px = (page_width / 2) 
     FOOTER_CUTOFF_PX = page_height * 0.92
@@ -339,6 +340,7 @@ def crop_and_save_standard(pdf_path, anchors, output_folder, suffix_type, is_two
         except Exception: pass
         pbar.update(1) 
     pbar.close()
+    pdf_images.close()
 
 # --- 4. EXECUTION ---
 processed_folders = set()
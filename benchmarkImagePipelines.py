@@ -0,0 +1,125 @@
+import os
+import sys
+import glob
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from imageKernels import number_block_cut
+from imageEncoderPool import map_crops
+import extractQuestionsMTGPYQs as mtg
+import extractQuestionsPYQsDishaJEEMains as disha
+import extractQuestionsAllenJEE as allen
+
+# Micro-benchmark: images/sec of the per-crop cleaning pipelines (watermark, footer, question number)
+# before and after the single-array rewrite, plus a check that both produce identical pixels.
+# Usage: python benchmarkImagePipelines.py [folder of RGB question crops]   (no folder = synthetic crops)
+
+# --- CONFIGURATION ---
+SYNTHETIC_COUNT = 40
+SYNTHETIC_SIZE = (1400, 600)   # (width, height), about a 300 DPI column crop
+REPEATS = 3                    # Best of N
+SEED = 7
+
+
+# --- LEGACY IMPLEMENTATIONS (row loops, as before the rewrite) ---
+
+def legacy_mtg(pil_img):
+    img_np = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+    mask = cv2.inRange(img_np, np.array([200] * 3, dtype=np.uint8), np.array([245] * 3, dtype=np.uint8))
+    img_np[mask > 0] = [255, 255, 255]
+    gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
+    height, width = binary.shape
+    crop_bottom = height
+    for y in range(height - 1, height - int(height * 0.25), -1):
+        if np.count_nonzero(binary[y, :]) / width > 0.05:
+            crop_bottom = y
+        elif crop_bottom != height:
+            is_safe_gap = True
+            for k in range(1, 6):
+                if (y - k) >= 0 and (np.count_nonzero(binary[y - k, :]) / width) > 0.05:
+                    is_safe_gap = False
+                    break
+            if is_safe_gap: break
+            crop_bottom = y
+    img_np, binary = img_np[:crop_bottom], binary[:crop_bottom]
+    cut_x = number_block_cut(binary, 0.30, 2, 15, 10)
+    if cut_x > 0: img_np = img_np[:, cut_x:]
+    return Image.fromarray(cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB))
+
+def legacy_disha(pil_img):
+    img_np = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+    height, width, _ = img_np.shape
+    mask = cv2.inRange(img_np, np.array([210] * 3, dtype=np.uint8), np.array([255] * 3, dtype=np.uint8))
+    img_np[mask > 0] = [255, 255, 255]
+    gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
+    crop_bottom = height
+    for y in range(height - 1, height - min(50, int(height * 0.1)), -1):
+        if np.count_nonzero(binary[y, :]) / width > 0.50: crop_bottom = y
+        else: break
+    img_np, binary = img_np[:crop_bottom], binary[:crop_bottom]
+    cut_x = number_block_cut(binary, 0.30, 2, 15, 10)
+    if cut_x > 0: img_np = img_np[:, cut_x:]
+    return Image.fromarray(cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB))
+
+def legacy_allen(img):
+    """The step-by-step functions clean_question_crop replaced, one PIL image per step."""
+    return allen.smart_footer_trim(allen.pixel_sensitive_crop(allen.remove_watermark_specific(img)))
+
+PIPELINES = [
+    ('MTG process_image_smart', legacy_mtg, mtg.process_image_smart),
+    ('Disha process_image_smart', legacy_disha, disha.process_image_smart),
+    ('Allen clean_question_crop', legacy_allen, allen.clean_question_crop),
+]
+
+
+# --- INPUTS ---
+
+def synthetic_crops(count=SYNTHETIC_COUNT):
+    """Question-like RGB crops: number block, text lines, light watermark, a footer bar on some."""
+    rng = np.random.default_rng(SEED)
+    width, height = SYNTHETIC_SIZE
+    crops = []
+    for i in range(count):
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        img[rng.random((height, width)) < 0.02] = rng.integers(200, 250)           # Watermark speckle
+        img[40:70, 20:60] = 0                                                       # Question number
+        for top in range(40, height - 120, 45):                                     # Text lines
+            img[top:top + 20, 120:rng.integers(600, width - 40)] = rng.integers(0, 60)
+        if i % 2: img[height - 25:height - 10, :] = 0                                # Footer bar
+        crops.append(Image.fromarray(img))
+    return crops
+
+def folder_crops(folder):
+    paths = sorted(glob.glob(os.path.join(folder, '*.png')))
+    return [Image.open(p).convert('RGB') for p in paths]
+
+
+# --- BENCHMARK ---
+
+def images_per_sec(fn, crops):
+    best = float('inf')
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        for img in crops: fn(img)
+        best = min(best, time.perf_counter() - t0)
+    return len(crops) / best
+
+def main(folder=None):
+    crops = folder_crops(folder) if folder else synthetic_crops()
+    print(f"🖼️  {len(crops)} crops ({folder or 'synthetic'}), best of {REPEATS}")
+    print(f"{'Pipeline':<28}{'old img/s':>11}{'new img/s':>11}{'speedup':>9}{'batch img/s':>13}  identical")
+    for name, old, new in PIPELINES:
+        identical = all(np.array_equal(np.asarray(old(img)), np.asarray(new(img))) for img in crops)
+        old_rate, new_rate = images_per_sec(old, crops), images_per_sec(new, crops)
+        t0 = time.perf_counter()
+        map_crops(new, crops)
+        batch_rate = len(crops) / (time.perf_counter() - t0)
+        print(f"{name:<28}{old_rate:>11.1f}{new_rate:>11.1f}{new_rate / old_rate:>8.1f}x{batch_rate:>13.1f}  "
+              f"{'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
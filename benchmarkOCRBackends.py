@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import random
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import OCR_SmartBatch as ocr
+from ocrBackends import BACKENDS, make_backend
+from benchmarkTextBands import edit_distance, normalize
+
+try:
+    import resource   # Peak RSS on Linux / macOS
+except ImportError:
+    resource = None
+
+try:
+    import psutil     # Peak working set on Windows
+except ImportError:
+    psutil = None
+
+# Throughput / accuracy harness for the OCR backends (ocrBackends.BACKENDS): every backend that
+# reads pixels runs over the same fixed labeled sample, each in a fresh process, and reports
+# images/sec, engine load time, peak memory and character error rate against the labels.
+# The sample (LABELED_SAMPLE) is built once from master rows whose pdf_Text is valid, so the
+# labels are the PDF's own text; hand-correct the CSV if it should be a stricter reference.
+# Usage: python benchmarkOCRBackends.py [backend ...]   (default: every installed backend)
+
+# --- CONFIGURATION ---
+CONFIG_PATH = 'config.json'
+DEFAULT_BASE_PATH = 'D:/Main/3. Work - Teaching/Projects/Question extractor'
+
+config = {}
+if os.path.exists(CONFIG_PATH):
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+
+BASE_PATH = config.get('BASE_PATH', DEFAULT_BASE_PATH)
+MASTER_DB_PATH = os.path.join(BASE_PATH, 'OCR - Questions for processing.csv')
+IMG_BASE_DIR = os.path.join(BASE_PATH, 'Processed_Database')
+MODEL_DIR = os.path.join(BASE_PATH, config.get('MODEL_DIR', 'models'))
+LABELED_SAMPLE = 'ocr_labeled_sample.csv'   # image_path, text. Reused as-is once it exists
+SAMPLE_SIZE = 200
+SEED = 7
+MAX_CER = 0.10                              # Backends above this error rate are not recommended
+REPORT_PATH = 'ocr_backend_benchmark.csv'
+
+
+# --- LABELED SAMPLE ---
+
+def build_labeled_sample():
+    """Seeded sample of master rows with valid PDF text and an existing Q_ image."""
+    df = pd.read_csv(MASTER_DB_PATH, dtype=str).fillna('')
+    rows = []
+    for _, row in df.iterrows():
+        text = normalize(row.get('pdf_Text', ''))
+        if row.get('PDF_Text_Available', '').lower() != 'yes' or len(text) <= 20: continue
+        val = row.get('Question No.') or row.get('Q', '')
+        q_num = val.split('.')[0].strip()
+        if not q_num: continue
+        path = os.path.join(IMG_BASE_DIR, row.get('Folder', '').strip(), f"Q_{q_num}.png")
+        if os.path.exists(path): rows.append({'image_path': path, 'text': text})
+    random.Random(SEED).shuffle(rows)
+    sample = pd.DataFrame(rows[:SAMPLE_SIZE], columns=['image_path', 'text'])
+    sample.to_csv(LABELED_SAMPLE, index=False)
+    return sample
+
+def load_labeled_sample():
+    if os.path.exists(LABELED_SAMPLE):
+        return pd.read_csv(LABELED_SAMPLE, dtype=str).fillna('')
+    print(f"🏷️  Building {LABELED_SAMPLE} from {MASTER_DB_PATH}...")
+    return build_labeled_sample()
+
+
+# --- ONE BACKEND, ONE FRESH PROCESS ---
+
+def peak_memory_mb():
+    """Peak memory of this process plus its finished children (tesseract runs as a child), or None."""
+    if resource is not None:
+        scale = 1 if sys.platform == 'darwin' else 1024   # ru_maxrss: bytes on macOS, KiB on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return round(peak * scale / 2**20, 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 2**20, 1)
+    return None
+
+def run_backend(name, paths, device):
+    """Loads the backend, OCRs every path in OCR_BATCH_SIZE batches. Runs in its own process."""
+    backend = make_backend(name, model_dir=MODEL_DIR, text_bands=ocr.OCR_TEXT_BANDS, batch_size=ocr.OCR_BATCH_SIZE)
+    t0 = time.perf_counter()
+    backend.load(gpu=device == 'gpu')
+    load_s = time.perf_counter() - t0
+
+    images = [ocr.prepare_image(path) for path in paths]   # Not timed: same for every backend
+    texts = []
+    t0 = time.perf_counter()
+    for i in range(0, len(images), ocr.OCR_BATCH_SIZE):
+        texts.extend(text or "" for text, _ in backend.read_batch(images[i:i + ocr.OCR_BATCH_SIZE]))
+    ocr_s = time.perf_counter() - t0
+    return {'texts': texts, 'load_s': load_s, 'ocr_s': ocr_s, 'peak_mb': peak_memory_mb(),
+            'version': backend.version()}
+
+
+def main(names=None):
+    sample = load_labeled_sample()
+    if sample.empty:
+        print("❌ No labeled images (need master rows with pdf_Text and a Q_ image).")
+        return
+    labels = [normalize(t) for t in sample['text']]
+    label_chars = max(1, sum(map(len, labels)))
+
+    names = names or [n for n, cls in BACKENDS.items() if cls.needs_image]
+    print(f"🖼️  {len(sample)} labeled images | backends: {', '.join(names)}")
+
+    rows = []
+    for name in names:
+        backend = make_backend(name)
+        if not backend.needs_image:
+            print(f"   ⏭️  {name}: reads no pixels (its text is the label itself)")
+            continue
+        if not backend.available():
+            print(f"   ⏭️  {name}: not installed")
+            continue
+        device = ocr.resolve_device(str(config.get('OCR_DEVICE') or 'auto').lower()) if backend.supports_gpu else 'cpu'
+        try:
+            with ProcessPoolExecutor(max_workers=1) as pool:   # Fresh process: memory is this backend's alone
+                out = pool.submit(run_backend, name, list(sample['image_path']), device).result()
+        except Exception as e:
+            print(f"   ❌ {name}: {e}")
+            continue
+
+        errors = sum(edit_distance(normalize(text), label) for text, label in zip(out['texts'], labels))
+        rows.append({'backend': name, 'device': device, 'version': out['version'], 'images': len(labels),
+                     'images_per_sec': round(len(labels) / max(out['ocr_s'], 1e-9), 2),
+                     'load_s': round(out['load_s'], 2), 'peak_mb': out['peak_mb'],
+                     'cer': round(errors / label_chars, 4)})
+        r = rows[-1]
+        print(f"   {name} ({device}): {r['images_per_sec']} img/s | load {r['load_s']}s | "
+              f"peak {r['peak_mb']} MB | CER {r['cer']:.2%}")
+
+    if not rows: return
+    df = pd.DataFrame(rows)
+    df.to_csv(REPORT_PATH, index=False)
+    good = df[df['cer'] <= MAX_CER]
+
+    print("\n" + "="*60)
+    print("       OCR BACKEND BENCHMARK")
+    print("="*60)
+    print(df.to_string(index=False))
+    if good.empty:
+        print(f"\n⚠️  No backend is within CER {MAX_CER:.0%}.")
+    else:
+        best = good.sort_values('images_per_sec', ascending=False).iloc[0]
+        print(f"\n🏆 Fastest within CER {MAX_CER:.0%}: {best['backend']} ({best['images_per_sec']} img/s) "
+              f"-> set \"OCR_BACKEND\": \"{best['backend']}\" in {CONFIG_PATH}")
+    print(f"• CSV Report: {REPORT_PATH}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    unknown = [n for n in sys.argv[1:] if n not in BACKENDS]
+    if unknown:
+        print(f"Unknown backend(s): {', '.join(unknown)}. Choose from: {', '.join(BACKENDS)}")
+    else:
+        main(sys.argv[1:])
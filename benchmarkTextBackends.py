@@ -0,0 +1,147 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import pandas as pd
+from pdfWordIndex import ParsedPdf, TEXT_BACKENDS
+from anchorDetection import find_margin_anchors
+import extractQuestionsMTGPYQs as mtg
+import extractQuestionsDigvijay as digvijay
+import extractQuestionsAdvPYQBook as adv_pyq_book
+
+# --- CONFIGURATION ---
+CONFIG_PATH = 'config.json'
+DEFAULT_BASE_PATH = 'D:/Main/3. Work - Teaching/Projects/Question extractor'
+
+config = {}
+if os.path.exists(CONFIG_PATH):
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+
+BASE_PATH = config.get('BASE_PATH', DEFAULT_BASE_PATH)
+SAMPLE_DIR = os.path.join(BASE_PATH, 'raw data')
+SAMPLE_SIZE = 10            # PDFs picked at random from SAMPLE_DIR
+TOP_TOLERANCE_PTS = 2.0     # Anchor tops closer than this count as the same position
+REPORT_PATH = 'text_backend_benchmark.csv'
+
+
+# --- ANCHOR DETECTORS ---
+# Each returns [{'q_num', 'page_idx', 'top', 'col'}]; q_num may be prefixed so question and
+# solution anchors of one book never collide. PyMuPDF font names lose the "ABCDEF+" subset
+# prefix, so the bold-font detectors (MTG's '+b' marker in particular) are the ones to watch.
+
+def mtg_anchors(doc):
+    questions, solutions, _ = mtg.analyze_and_extract(doc)
+    return [{'q_num': f"{kind}{a['q_num']}", 'page_idx': a['page'], 'top': a['top'],
+             'col': int(a['x0'] >= doc.pages[a['page']].width / 2)}
+            for kind, anchors in (('Q', questions), ('S', solutions)) for a in anchors]
+
+def bold_column_anchors(module):
+    def detect(doc):
+        return [{'q_num': a['q_num'], 'page_idx': a['page'], 'top': a['top'], 'col': a['col_idx']}
+                for a in module.parse_pdf_structure(doc)]
+    return detect
+
+DETECTORS = {
+    'collegedoors': find_margin_anchors,
+    'mtg': mtg_anchors,
+    'digvijay': bold_column_anchors(digvijay),
+    'adv_pyq_book': bold_column_anchors(adv_pyq_book),
+}
+
+
+def run_backend(pdf_path, backend):
+    """Parses every page with one backend, then runs every detector. Returns ({detector: anchors}, pages, seconds)."""
+    t0 = time.perf_counter()
+    with ParsedPdf(pdf_path, backend=backend) as doc:
+        for _ in doc.pages: pass
+        parse_time = time.perf_counter() - t0
+        anchors = {}
+        for name, detect in DETECTORS.items():
+            try:
+                anchors[name] = detect(doc)
+            except Exception as e:
+                print(f"   ⚠️  {backend}/{name}: {e}")
+        pages = len(doc)
+    return anchors, pages, parse_time
+
+
+def compare_anchors(reference, candidate):
+    """Counts anchors missing / extra / moved (different page, column or top) vs the reference."""
+    ref = {a['q_num']: a for a in reference}
+    cand = {a['q_num']: a for a in candidate}
+    moved = 0
+    for q_num in ref.keys() & cand.keys():
+        a, b = ref[q_num], cand[q_num]
+        if a['page_idx'] != b['page_idx'] or a['col'] != b['col'] or abs(a['top'] - b['top']) > TOP_TOLERANCE_PTS:
+            moved += 1
+    return {'missing': len(ref.keys() - cand.keys()), 'extra': len(cand.keys() - ref.keys()), 'moved': moved}
+
+
+def main(pdf_paths):
+    reference, others = TEXT_BACKENDS[0], TEXT_BACKENDS[1:]
+    rows = []
+    for pdf_path in pdf_paths:
+        print(f"📄 {os.path.basename(pdf_path)}")
+        results = {}
+        for backend in TEXT_BACKENDS:
+            try:
+                results[backend] = run_backend(pdf_path, backend)
+            except Exception as e:
+                print(f"   ❌ {backend}: {e}")
+
+        if reference not in results: continue
+        ref_results, pages, ref_time = results[reference]
+        for backend in others:
+            if backend not in results: continue
+            backend_results, _, parse_time = results[backend]
+            print(f"   {reference}: {round(pages / ref_time, 2) if ref_time else None} pages/s | "
+                  f"{backend}: {round(pages / parse_time, 2) if parse_time else None} pages/s")
+            for detector in DETECTORS:
+                if detector not in ref_results or detector not in backend_results: continue
+                ref_anchors, anchors = ref_results[detector], backend_results[detector]
+                if not ref_anchors and not anchors: continue   # Not this book's layout
+                diff = compare_anchors(ref_anchors, anchors)
+                rows.append({
+                    'pdf': os.path.basename(pdf_path), 'pages': pages, 'backend': backend, 'detector': detector,
+                    f'{reference}_pages_per_sec': round(pages / ref_time, 2) if ref_time else None,
+                    'pages_per_sec': round(pages / parse_time, 2) if parse_time else None,
+                    'speedup': round(ref_time / parse_time, 2) if parse_time else None,
+                    f'{reference}_anchors': len(ref_anchors), 'anchors': len(anchors), **diff,
+                })
+                flag = "✅" if diff['missing'] == diff['extra'] == diff['moved'] == 0 else "❌"
+                print(f"      {flag} {detector}: anchors {len(ref_anchors)} vs {len(anchors)} "
+                      f"[missing {diff['missing']}, extra {diff['extra']}, moved {diff['moved']}]")
+
+    if not rows:
+        print("No results.")
+        return
+
+    df = pd.DataFrame(rows)
+    df.to_csv(REPORT_PATH, index=False)
+    df['identical'] = (df['missing'] == 0) & (df['extra'] == 0) & (df['moved'] == 0)
+    per_pdf = df.drop_duplicates(['pdf', 'backend'])
+    print("\n" + "="*40)
+    print(f"PDFs: {len(per_pdf)} | Total pages: {per_pdf['pages'].sum()}")
+    print(f"Median speedup: x{per_pdf['speedup'].median():.2f}")
+    for detector, group in df.groupby('detector', sort=False):
+        print(f"Identical anchor lists ({detector}): {group['identical'].sum()}/{len(group)}")
+    differing = df[~df['identical']]
+    if len(differing):
+        print(f"⚠️  Anchors differ in {len(differing)} PDF/detector pairs - check before switching text_backend:")
+        for _, r in differing.iterrows():
+            print(f"   - {r['pdf']} [{r['detector']}]: missing {r['missing']}, extra {r['extra']}, moved {r['moved']}")
+    print(f"Report saved to {REPORT_PATH}")
+    print("="*40)
+
+
+if __name__ == "__main__":
+    # Usage: python benchmarkTextBackends.py [file.pdf ...]   (default: random sample of SAMPLE_DIR)
+    paths = sys.argv[1:]
+    if not paths:
+        paths = glob.glob(os.path.join(SAMPLE_DIR, '**', '*.pdf'), recursive=True)
+        random.seed(0)
+        paths = random.sample(paths, min(SAMPLE_SIZE, len(paths)))
+    main(paths)
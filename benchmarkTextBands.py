@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import random
+import pandas as pd
+import OCR_SmartBatch as ocr
+from imageBatchRunner import discover_files
+from ocrTextBands import text_bands, band_coverage
+from ocrBackends import EasyOCRBackend
+
+# Benchmark of the text-band pre-pass: OCR time of full-image EasyOCR (CRAFT detection +
+# recognition) vs recognition on the detected text-line bands only, and how closely the
+# band text agrees with the full-image text, character by character.
+# Usage: python benchmarkTextBands.py <Processed_Database folder> [sample size]
+
+# --- CONFIGURATION ---
+SAMPLE_SIZE = 100
+SEED = 7
+MODEL_DIR = 'models'
+REPORT_PATH = 'text_band_benchmark.csv'
+
+
+def edit_distance(a, b):
+    """Levenshtein distance (insert / delete / substitute = 1)."""
+    if len(a) < len(b): a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def normalize(text):
+    return " ".join(str(text).split())
+
+
+def main(folder, sample_size=SAMPLE_SIZE):
+    paths = discover_files(folder, file_filter=lambda f: f.startswith('Q_'))
+    random.Random(SEED).shuffle(paths)
+    paths = paths[:sample_size]
+    device = ocr.resolve_device('auto')
+    print(f"🖼️  {len(paths)} Q_ images from {folder} | EasyOCR on {device.upper()}")
+    backend = EasyOCRBackend(model_dir=MODEL_DIR)
+    backend.load(gpu=device == 'gpu')
+
+    rows = []
+    for path in paths:
+        try:
+            img = ocr.prepare_image(path)
+        except Exception as e:
+            print(f"   ❌ {os.path.basename(path)}: {e}")
+            continue
+        t0 = time.perf_counter()
+        full = normalize(backend.read(img))
+        full_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bands = text_bands(img)
+        band_text = normalize(backend.read_bands(img, bands)) if bands else full   # No bands: pipeline falls back
+        band_s = time.perf_counter() - t0 if bands else full_s
+
+        rows.append({'path': path, 'bands': len(bands), 'coverage': round(band_coverage(img, bands), 3),
+                     'full_s': round(full_s, 3), 'band_s': round(band_s, 3), 'full_chars': len(full),
+                     'distance': edit_distance(full, band_text)})
+
+    if not rows: return
+    df = pd.DataFrame(rows)
+    df.to_csv(REPORT_PATH, index=False)
+    full_total, band_total = max(df['full_s'].sum(), 1e-9), max(df['band_s'].sum(), 1e-9)
+    agreement = 1 - df['distance'].sum() / max(1, df['full_chars'].sum())
+
+    print("\n" + "="*60)
+    print("       TEXT-BAND PRE-PASS BENCHMARK")
+    print("="*60)
+    print(f"• Images:              {len(df)} ({(df['bands'] == 0).sum()} without bands -> full OCR)")
+    print(f"• Full-image OCR:      {full_total:.1f}s ({len(df) / full_total:.2f} img/s)")
+    print(f"• Band OCR:            {band_total:.1f}s ({len(df) / band_total:.2f} img/s)")
+    print(f"• Time saved:          {1 - band_total / full_total:.1%}")
+    print(f"• Area recognized:     {df['coverage'].mean():.1%} of the crop on average")
+    print(f"• Char agreement:      {agreement:.2%} (1 - edit distance / full-image characters)")
+    print(f"• CSV Report:          {REPORT_PATH}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarkTextBands.py <Processed_Database folder> [sample size]")
+    else:
+        main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else SAMPLE_SIZE)
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import random
+import numpy as np
+from PIL import Image
+from imageBatchRunner import discover_files
+from imageThresholds import THRESHOLD_PROFILES, whiten_above, whiten_above_array, binarize
+
+# Benchmark of the grayscale noise cleaning: per-call lambda tables vs the shared lookup tables,
+# and np.where vs in-place arrays, over every threshold profile. Also checks identical output.
+# Usage: python benchmarkThresholds.py [Processed_Database folder]   (no folder = synthetic crops)
+
+# --- CONFIGURATION ---
+SAMPLE_SIZE = 3000             # Crops sampled from the folder
+BATCH_SIZE = 100               # Crops decoded at a time (only one batch is ever in memory)
+SYNTHETIC_COUNT = 300
+SYNTHETIC_SIZE = (1400, 600)   # (width, height)
+SEED = 7
+SKIP_FOLDERS = {'Compressed', 'Derivatives'}   # Generated copies at any depth (e.g. Derivatives/<variant>/<folder>/)
+
+
+# --- INPUTS (streamed in BATCH_SIZE batches) ---
+
+def sample_crops(folder):
+    paths = [p for p in discover_files(folder)
+             if not SKIP_FOLDERS.intersection(os.path.relpath(os.path.dirname(p), folder).split(os.sep))]
+    random.Random(SEED).shuffle(paths)
+    paths = paths[:SAMPLE_SIZE]
+    for i in range(0, len(paths), BATCH_SIZE):
+        batch = []
+        for path in paths[i:i + BATCH_SIZE]:
+            with Image.open(path) as img:
+                batch.append(img.convert('L'))
+        yield batch
+
+def synthetic_crops(count=SYNTHETIC_COUNT):
+    rng = np.random.default_rng(SEED)
+    width, height = SYNTHETIC_SIZE
+    for i in range(0, count, BATCH_SIZE):
+        batch = []
+        for _ in range(min(BATCH_SIZE, count - i)):
+            gray = np.full((height, width), 255, dtype=np.uint8)
+            noisy = rng.random((height, width)) < 0.25
+            gray[noisy] = rng.integers(0, 256, int(noisy.sum()))
+            batch.append(Image.fromarray(gray))
+        yield batch
+
+
+# --- BENCHMARK ---
+
+def cases(profile, t):
+    """(variant, old fn, new fn, input kind). In-place variants get their own copy of each array."""
+    return [
+        ('PIL whiten', lambda img: img.point(lambda p: 255 if p > t else p),
+         lambda img: whiten_above(img, profile), 'pil'),
+        ('PIL binarize', lambda img: img.point(lambda p: 0 if p < t else 255),
+         lambda img: binarize(img, profile), 'pil'),
+        ('array whiten', lambda a: np.where(a > t, 255, a).astype(np.uint8),
+         lambda a: whiten_above_array(a, profile), 'array'),
+    ]
+
+def main(folder=None):
+    batches = sample_crops(folder) if folder else synthetic_crops()
+    totals = {}   # (profile, variant) -> [old seconds, new seconds, items, identical]
+
+    for crops in batches:
+        arrays = [np.array(img) for img in crops]
+        for profile, t in THRESHOLD_PROFILES.items():
+            for variant, old, new, kind in cases(profile, t):
+                stats = totals.setdefault((profile, variant), [0.0, 0.0, 0, True])
+                for img, arr in zip(crops, arrays):
+                    old_in, new_in = (img, img) if kind == 'pil' else (arr, arr.copy())
+                    t0 = time.perf_counter()
+                    old_out = old(old_in)
+                    t1 = time.perf_counter()
+                    new_out = new(new_in)
+                    stats[1] += time.perf_counter() - t1
+                    stats[0] += t1 - t0
+                    stats[2] += 1
+                    stats[3] = stats[3] and np.array_equal(np.asarray(old_out), np.asarray(new_out))
+
+    if not totals: return
+    print(f"🖼️  {next(iter(totals.values()))[2]} crops ({folder or 'synthetic'}), {BATCH_SIZE} at a time")
+    print(f"{'Profile':<11}{'T':>4}{'Variant':>24}{'old img/s':>11}{'new img/s':>11}{'speedup':>9}  identical")
+    for (profile, variant), (old_s, new_s, n, identical) in totals.items():
+        t = THRESHOLD_PROFILES[profile]
+        print(f"{profile:<11}{t:>4}{variant:>24}{n / old_s:>11.0f}{n / new_s:>11.0f}"
+              f"{old_s / new_s:>8.1f}x  {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
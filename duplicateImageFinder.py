@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from PIL import Image
+from imageBatchRunner import run_batch
+from imageThresholds import threshold_for, whiten_above_array
+
+# --- CONFIGURATION ---
+BASE_PATH = r'D:\Main\3. Work - Teaching\Projects\Question extractor'
+DB_PATH = os.path.join(BASE_PATH, 'DB Master.csv')
+IMG_DIR = os.path.join(BASE_PATH, 'Processed_Database')
+HASH_STORE = os.path.join(IMG_DIR, '_image_hashes.json')     # {rel_path: [size, mtime_ns, phash, dhash]}
+OUTPUT_CSV = os.path.join(BASE_PATH, 'Duplicate Image Clusters.csv')
+INCREMENTAL_CSV = os.path.join(BASE_PATH, 'Duplicate Image Clusters - New Folders.csv')
+
+NOISE_THRESHOLD = threshold_for('default')  # Same cleaning as imageCompression: lighter pixels -> white
+PHASH_RADIUS = 8       # BK-tree search radius on the 64-bit pHash
+DHASH_MAX = 12         # Candidate must also be this close on dHash (cheap second opinion)
+HASH_VERSION = 1       # Bump after changing the preprocessing / hash functions
+WORKERS = None         # None = all cores but one; 1 = single process
+
+
+# --- 1. HASHING ---
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix (pHash without scipy)."""
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+DCT_32 = _dct_matrix(32)
+
+def _bits_to_int(bits):
+    return int(''.join('1' if b else '0' for b in bits.ravel()), 2)
+
+def normalize_question(img):
+    """Grayscale, noise -> white, cropped to the ink bbox (so margins / padding don't change the hash)."""
+    gray = whiten_above_array(np.array(img.convert('L')), NOISE_THRESHOLD)
+    ink = gray < 255
+    rows, cols = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+    if len(rows) == 0: return None
+    return Image.fromarray(gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+
+def phash(img):
+    """64-bit DCT hash: 8x8 low frequencies of a 32x32 thumbnail vs their median."""
+    pixels = np.asarray(img.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (DCT_32 @ pixels @ DCT_32.T)[:8, :8]
+    return _bits_to_int(low > np.median(low))
+
+def dhash(img):
+    """64-bit gradient hash: is each pixel of a 9x8 thumbnail brighter than its right neighbour."""
+    pixels = np.asarray(img.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, :-1] > pixels[:, 1:])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def hash_image(img_path, dry_run=False):
+    """Batch worker: (pHash, dHash) of one Q_ image plus the stat it was computed from."""
+    st = os.stat(img_path)
+    with Image.open(img_path) as img:
+        normalized = normalize_question(img)
+    if normalized is None: return {'status': 'Blank'}
+    return {'status': 'Hashed', 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'phash': phash(normalized), 'dhash': dhash(normalized)}
+
+
+# --- 2. BK-TREE ---
+
+class BKTree:
+    """
+    Metric tree over 64-bit hashes (Hamming distance). search() only descends into children
+    whose edge distance is within [d - radius, d + radius], so lookups touch a small fraction
+    of the library instead of comparing against every question.
+    """
+
+    def __init__(self):
+        self.root = None   # [hash, [items], {edge_distance: child}]
+        self.size = 0
+
+    def add(self, key, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(key, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """[(distance, item)] for every stored hash within `radius` of key."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(key, node[0])
+            if d <= radius: found.extend((d, item) for item in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius: stack.append(child)
+        return found
+
+
+# --- 3. HASH STORE (incremental) ---
+
+def load_hash_store():
+    try:
+        with open(HASH_STORE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('files', {}) if data.get('version') == HASH_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_hash_store(entries):
+    tmp_path = HASH_STORE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': HASH_VERSION, 'files': entries}, f)
+    os.replace(tmp_path, HASH_STORE)
+
+def q_image_rel(folder, q_num):
+    try: q_clean = str(int(float(q_num)))
+    except (TypeError, ValueError): q_clean = str(q_num).strip()
+    return f"{str(folder).strip()}/Q_{q_clean}.png"
+
+def hash_questions(df):
+    """
+    Adds 'phash' / 'dhash' columns to df (rows without a readable image are dropped).
+    Only images that are new or changed since the last run (size / mtime) are decoded.
+    """
+    store = load_hash_store()
+    rels = [q_image_rel(f, q) for f, q in zip(df['Folder'], df['Question No.'])]
+    stale = []
+    for rel in set(rels):
+        path = os.path.join(IMG_DIR, *rel.split('/'))
+        try: st = os.stat(path)
+        except OSError:
+            store.pop(rel, None)
+            continue
+        entry = store.get(rel)
+        if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns: stale.append(path)
+
+    print(f"🔑 {len(set(rels)) - len(stale)} hashes reused, {len(stale)} to compute")
+    report = run_batch(sorted(stale), hash_image, workers=WORKERS, desc="Hashing")
+    for path, result in report.results:
+        rel = os.path.relpath(path, IMG_DIR).replace(os.sep, '/')
+        if result['status'] == 'Hashed':
+            store[rel] = [result['size'], result['mtime_ns'], f"{result['phash']:016x}", f"{result['dhash']:016x}"]
+        else:
+            store.pop(rel, None)
+    for path, message in report.errors:
+        print(f"❌ {path}: {message}")
+    save_hash_store(store)
+
+    df = df.assign(_rel=rels)
+    df = df[df['_rel'].isin(store)].copy()
+    df['phash'] = [int(store[r][2], 16) for r in df['_rel']]
+    df['dhash'] = [int(store[r][3], 16) for r in df['_rel']]
+    return df.drop(columns=['_rel'])
+
+
+# --- 4. CLUSTERING ---
+
+def find_duplicates(library, incoming):
+    """
+    library rows are indexed without being queried; each incoming row is queried against
+    everything indexed so far, then inserted. Full run = (empty, all); new folder = (rest, folder).
+    Returns [(uid_a, uid_b, phash_distance, dhash_distance)].
+    """
+    tree = BKTree()
+    dhashes = {}
+    for uid, ph, dh in zip(library['unique_id'], library['phash'], library['dhash']):
+        tree.add(ph, uid)
+        dhashes[uid] = dh
+
+    pairs = []
+    for uid, ph, dh in zip(incoming['unique_id'], incoming['phash'], incoming['dhash']):
+        for p_dist, other in tree.search(ph, PHASH_RADIUS):
+            d_dist = hamming(dh, dhashes[other])
+            if d_dist <= DHASH_MAX: pairs.append((other, uid, p_dist, d_dist))
+        tree.add(ph, uid)
+        dhashes[uid] = dh
+    return pairs
+
+def cluster_pairs(pairs):
+    """Union-find over matched pairs -> {unique_id: cluster_root}."""
+    parent = {}
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for a, b, _, _ in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[max(ra, rb)] = min(ra, rb)
+    return {x: find(x) for x in parent}
+
+def build_cluster_report(df, pairs):
+    clusters = cluster_pairs(pairs)
+    best = {}
+    for a, b, p_dist, _ in pairs:
+        for uid in (a, b): best[uid] = min(best.get(uid, 64), p_dist)
+    rows = df[df['unique_id'].isin(clusters)][['unique_id', 'Folder', 'Question No.']].copy()
+    rows['cluster_id'] = rows['unique_id'].map(clusters)
+    rows['closest_phash_distance'] = rows['unique_id'].map(best)
+    rows['cluster_size'] = rows.groupby('cluster_id')['unique_id'].transform('count')
+    return rows.sort_values(['cluster_size', 'cluster_id', 'Folder'], ascending=[False, True, True])
+
+
+# --- MAIN ---
+
+def run_duplicate_finder(new_folders=None):
+    print("="*60)
+    print("      🧬 DUPLICATE QUESTION FINDER (perceptual hash)")
+    print("="*60)
+    df = pd.read_csv(DB_PATH, dtype={'unique_id': str})
+    df['unique_id'] = df['unique_id'].astype(str).str.strip()
+    df = df[df['Folder'].notna() & df['Question No.'].notna()]
+    df = hash_questions(df)
+
+    if new_folders:
+        is_new = df['Folder'].astype(str).str.strip().isin(new_folders)
+        library, incoming, output = df[~is_new], df[is_new], INCREMENTAL_CSV
+        print(f"📥 Checking {len(incoming)} questions from {len(new_folders)} folder(s) against {len(library)} indexed")
+    else:
+        library, incoming, output = df.iloc[0:0], df, OUTPUT_CSV
+        print(f"📚 Full library pass over {len(incoming)} questions")
+
+    pairs = find_duplicates(library, incoming)
+    report = build_cluster_report(df, pairs)
+    report.to_csv(output, index=False)
+
+    print(f"\n🔗 {len(pairs)} duplicate pairs -> {report['cluster_id'].nunique() if len(report) else 0} clusters "
+          f"({len(report)} questions)")
+    print(f"💾 Saved: {output}")
+
+
+if __name__ == "__main__":
+    # No arguments: whole library. Folder names as arguments: check only those folders (new ingestion).
+    run_duplicate_finder(sys.argv[1:] or None)
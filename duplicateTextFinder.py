@@ -0,0 +1,242 @@
+import os
+import re
+import sys
+import shutil
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from tqdm import tqdm
+
+# --- CONFIGURATION ---
+BASE_PATH = r'D:\Main\3. Work - Teaching\Projects\Question extractor'
+DB_PATH = os.path.join(BASE_PATH, 'DB Master.csv')
+BACKUP_DIR = os.path.join(BASE_PATH, 'Backups')
+INDEX_PATH = os.path.join(BASE_PATH, 'text_minhash_index.npz')
+PAIRS_CSV = os.path.join(BASE_PATH, 'Duplicate Text Pairs.csv')
+
+TEXT_COLUMNS = ['OCR_Text', 'pdf_Text']   # First one with real content wins
+MIN_TEXT_LENGTH = 20                      # Same validity rule as OCR_SmartBatch
+MIN_WORDS = 4                             # Non-'#' tokens after normalization: formula-only text is not indexed
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 32                                # 32 bands x 4 rows: candidates from Jaccard ~0.4 up
+JACCARD_THRESHOLD = 0.7                   # Estimated Jaccard to accept a candidate pair
+CHUNK_ROWS = 2000                         # Streaming pass: rows read per chunk
+SEED = 42
+GROUP_COLUMN = 'duplicate_group'
+
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(SEED)
+PERM_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+
+# --- 1. TEXT -> SIGNATURE ---
+
+def normalize_text(text):
+    """Lowercase, every number -> '#', punctuation dropped: questions that differ only in values collide."""
+    text = str(text).lower()
+    text = re.sub(r'\d+(\.\d+)?', ' # ', text)
+    text = re.sub(r'[^a-z#]+', ' ', text)
+    return text.split()
+
+def shingles(words):
+    """Set of word k-grams, hashed to 32 bits. Option reordering only changes the shingles at the seams."""
+    if len(words) < SHINGLE_WORDS: grams = [' '.join(words)]
+    else: grams = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter({zlib.crc32(g.encode('utf-8')) for g in grams}, dtype=np.uint64)
+
+def minhash(shingle_hashes):
+    """NUM_PERM-value MinHash signature: min over (a*x + b) mod p for each permutation."""
+    values = (PERM_A[:, None] * shingle_hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME
+    return values.min(axis=1)
+
+def informative(words):
+    """Enough real words to compare? Numbers / symbols only normalize to all-'#' tokens, and any two
+    such texts share the shingle '# # #' (Jaccard 1.0), which would merge them into one big group."""
+    return sum(w != '#' for w in words) >= MIN_WORDS
+
+def question_text(row):
+    for col in TEXT_COLUMNS:
+        text = row.get(col)
+        if isinstance(text, str) and len(text.strip()) > MIN_TEXT_LENGTH and text.strip().lower() != 'nan' \
+                and informative(normalize_text(text)):
+            return text
+    return None
+
+def text_key(text):
+    """Cheap change detector for the stored signatures."""
+    return zlib.crc32(' '.join(normalize_text(text)).encode('utf-8'))
+
+
+# --- 2. LSH INDEX ---
+
+class TextLSHIndex:
+    """
+    MinHash signatures + LSH band buckets. add() returns the near-duplicates already in the
+    index (candidates that share a band, confirmed by estimated Jaccard), then inserts.
+    Signatures persist in INDEX_PATH, so re-runs only hash rows whose text changed and
+    new questions can be inserted incrementally.
+    """
+
+    def __init__(self):
+        self.signatures = {}   # uid -> signature
+        self.keys = {}         # uid -> text_key
+        self.buckets = defaultdict(list)
+
+    def _bands(self, signature):
+        for b in range(BANDS):
+            yield b, signature[b * ROWS_PER_BAND:(b + 1) * ROWS_PER_BAND].tobytes()
+
+    def query(self, signature, exclude=None):
+        candidates = set()
+        for band in self._bands(signature):
+            candidates.update(self.buckets.get(band, ()))
+        candidates.discard(exclude)
+        matches = []
+        for other in candidates:
+            jaccard = float(np.mean(self.signatures[other] == signature))
+            if jaccard >= JACCARD_THRESHOLD: matches.append((other, jaccard))
+        return matches
+
+    def insert(self, uid, signature, key=None):
+        if uid in self.signatures: self.remove(uid)
+        self.signatures[uid] = signature
+        self.keys[uid] = key
+        for band in self._bands(signature):
+            self.buckets[band].append(uid)
+
+    def remove(self, uid):
+        signature = self.signatures.pop(uid)
+        self.keys.pop(uid, None)
+        for band in self._bands(signature):
+            self.buckets[band].remove(uid)
+
+    def add(self, uid, text):
+        """Incremental insert of one question. Returns [(other_uid, jaccard_estimate)]; uninformative text is not indexed."""
+        words = normalize_text(text)
+        if not informative(words): return []
+        signature = minhash(shingles(words))
+        matches = self.query(signature, exclude=uid)
+        self.insert(uid, signature, text_key(text))
+        return matches
+
+    def save(self, path=None):
+        path = path or INDEX_PATH
+        uids = list(self.signatures)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, uids=np.array(uids, dtype=str),
+                            keys=np.array([self.keys[u] or 0 for u in uids], dtype=np.int64),
+                            signatures=np.array([self.signatures[u] for u in uids], dtype=np.uint64).reshape(-1, NUM_PERM),
+                            params=np.array([SEED, NUM_PERM, BANDS, SHINGLE_WORDS], dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Stored signatures, or an empty index if missing / built with other parameters."""
+        path = path or INDEX_PATH
+        index = cls()
+        if not os.path.exists(path): return index
+        try:
+            data = np.load(path)
+            if list(data['params']) != [SEED, NUM_PERM, BANDS, SHINGLE_WORDS]: return index
+            for uid, key, signature in zip(data['uids'], data['keys'], data['signatures']):
+                index.insert(str(uid), signature, int(key))
+        except Exception:
+            return cls()  # Corrupt index: rebuild
+        return index
+
+
+# --- 3. GROUPING ---
+
+def group_pairs(pairs):
+    """Union-find -> {unique_id: group id} (group id = 'dup_' + smallest unique_id in the group)."""
+    parent = {}
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for a, b, _ in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[max(ra, rb)] = min(ra, rb)
+    return {x: f"dup_{find(x)}" for x in parent}
+
+def create_backup(file_path):
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    backup_path = os.path.join(BACKUP_DIR, f"DB_Master_TextDup_{timestamp}.csv")
+    try:
+        shutil.copy2(file_path, backup_path)
+        print(f"✅ Backup created: {os.path.basename(backup_path)}")
+    except Exception as e:
+        print(f"⚠️ Backup failed: {e}")
+
+
+# --- MAIN ---
+
+def run_text_duplicates(full_rebuild=False):
+    print("="*60)
+    print("      📝 TEXT NEAR-DUPLICATE FINDER (MinHash / LSH)")
+    print("="*60)
+    if not os.path.exists(DB_PATH):
+        print(f"❌ Database not found at: {DB_PATH}")
+        return
+
+    stored = TextLSHIndex() if full_rebuild else TextLSHIndex.load()
+    print(f"📦 {len(stored.signatures)} stored signatures" + (" (full rebuild)" if full_rebuild else ""))
+
+    # --- Streaming pass: query each question against everything before it, then insert ---
+    index = TextLSHIndex()
+    pairs = []
+    seen = set()
+    hashed = reused = 0
+    usecols = lambda c: c in ('unique_id', *TEXT_COLUMNS)
+    reader = pd.read_csv(DB_PATH, usecols=usecols, dtype=str, chunksize=CHUNK_ROWS)
+    for chunk in tqdm(reader, desc="Streaming DB", unit="chunk"):
+        for row in chunk.to_dict('records'):
+            uid = str(row.get('unique_id', '')).strip()
+            text = question_text(row)
+            if not uid or uid == 'nan' or text is None or uid in seen: continue
+            seen.add(uid)
+
+            key = text_key(text)
+            if stored.keys.get(uid) == key:
+                signature = stored.signatures[uid]
+                reused += 1
+            else:
+                signature = minhash(shingles(normalize_text(text)))
+                hashed += 1
+            pairs.extend((other, uid, jaccard) for other, jaccard in index.query(signature))
+            index.insert(uid, signature, key)
+
+    index.save()
+    print(f"🔑 {hashed} signatures computed, {reused} reused")
+
+    # --- Groups -> DB Master ---
+    groups = group_pairs(pairs)
+    pd.DataFrame(pairs, columns=['unique_id_a', 'unique_id_b', 'jaccard_estimate']) \
+        .sort_values('jaccard_estimate', ascending=False).to_csv(PAIRS_CSV, index=False)
+
+    df = pd.read_csv(DB_PATH, dtype={'unique_id': str})
+    df[GROUP_COLUMN] = df['unique_id'].astype(str).str.strip().map(groups)
+    create_backup(DB_PATH)
+    try:
+        df.to_csv(DB_PATH, index=False)
+    except PermissionError:
+        print("❌ ERROR: Could not save. Is the CSV file open in Excel?")
+        return
+
+    n_groups = len(set(groups.values()))
+    print(f"\n🔗 {len(pairs)} near-duplicate pairs -> {n_groups} groups ({len(groups)} questions)")
+    print(f"💾 '{GROUP_COLUMN}' written to {DB_PATH}")
+    print(f"📄 Pairs: {PAIRS_CSV}")
+
+
+if __name__ == "__main__":
+    # --full ignores the stored signatures and re-hashes every question
+    run_text_duplicates(full_rebuild='--full' in sys.argv[1:])
@@ -1,10 +1,11 @@
 import os
 import re
 import json
-import numpy as np
 import pandas as pd
 from pypdf import PdfReader, PdfWriter
-import pdfplumber
+from pdfWordIndex import ParsedPdf
+from anchorDetection import match_tokens, font_mask
+from imageKernels import to_gray, ink_mask, footer_cut, blank_left_columns
 import fitz  # PyMuPDF: The new, superior renderer
 from PIL import Image, ImageChops, ImageOps, ImageEnhance
 from tqdm import tqdm
@@ -20,6 +21,8 @@ RAW_DATA_DIR = os.path.join(BASE_PATH, 'raw data')
 TRIMMED_DIR = os.path.join(RAW_DATA_DIR, 'Trimmed_PDFs')
 PROCESSED_BASE = os.path.join(BASE_PATH, 'Processed_Database')
 
+BOLD_FONT_MARKERS = ('bold', 'bd', 'black', 'medi')
+
 os.makedirs(TRIMMED_DIR, exist_ok=True)
 os.makedirs(PROCESSED_BASE, exist_ok=True)
 
@@ -53,26 +56,10 @@ def compress_and_clean(img):
 def smart_left_number_trim(img):
     """Scans Left-to-Right. Crops if Bottom Half is empty (< 5%)."""
     try:
-        gray = img.convert('L')
         # Binarize just for analysis (not for final output)
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        
-        height, width = data.shape
-        mid_h = height // 2
-        crop_x = 0
-        scan_limit = int(width * 0.25)
-        
-        for x in range(scan_limit):
-            col = data[:, x]
-            bottom_half = col[mid_h:]
-            ink = np.count_nonzero(bottom_half)
-            density = ink / bottom_half.size if bottom_half.size > 0 else 0
-            
-            if density < 0.05:
-                crop_x = x
-            else:
-                break
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        crop_x = blank_left_columns(ink, height // 2, None, max_density=0.05, limit=int(width * 0.25)) - 1
         
         if crop_x > 0:
             return img.crop((crop_x + 2, 0, width, height))
@@ -82,23 +69,9 @@ def smart_left_number_trim(img):
 def smart_bottom_trim(img):
     """Scans Bottom-Up. Crops if Right Half is empty (< 5%)."""
     try:
-        gray = img.convert('L')
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        
-        height, width = data.shape
-        midpoint = width // 2
-        crop_y = height
-        
-        for y in range(height - 1, -1, -1):
-            right_strip = data[y, midpoint:]
-            right_ink = np.count_nonzero(right_strip)
-            right_density = right_ink / right_strip.size if right_strip.size > 0 else 0
-            
-            if right_density < 0.05:
-                crop_y = y
-            else:
-                break
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        crop_y = footer_cut(ink, width // 2, None, min_density=0.05)
         
         if crop_y < height:
             return img.crop((0, 0, width, min(height, crop_y + 2)))
@@ -115,10 +88,6 @@ def trim_whitespace(im):
         return im.crop(bbox) if bbox else im
     except: return im
 
-def is_bold(word_dict):
-    font = word_dict.get('fontname', '').lower()
-    return 'bold' in font or 'bd' in font or 'black' in font or 'medi' in font
-
 # --- 3. STRUCTURE PARSING ---
 
 def get_answer_key(full_text):
@@ -142,27 +111,26 @@ def get_answer_key(full_text):
     return ans_map
 
 def extract_column_anchors(page, col_bbox):
+    """page: PageWords from ParsedPdf. Column, digit, bold and indent tests run as array masks."""
     anchors = []
     try:
-        col_crop = page.within_bbox(col_bbox)
-        words = col_crop.extract_words(extra_attrs=["fontname"])
-        for w in words:
-            text = w['text'].strip().replace('.', '')
-            if not text.isdigit(): continue
-            num = int(text)
+        idx, _ = match_tokens(page.text, r'[0-9.]*[0-9][0-9.]*')
+        in_col = page.bbox_mask(col_bbox, mode='within')
+        is_bold = font_mask(page.fontname, BOLD_FONT_MARKERS)
+        at_margin = (page.x0 - col_bbox[0]) < 100
+        idx = idx[in_col[idx] & is_bold[idx] & at_margin[idx]]
+
+        for i in idx:
+            num = int(page.text[i].replace('.', ''))
             if num > 2000: continue 
-            
-            rel_x = w['x0'] - col_bbox[0]
-            if is_bold(w):
-                if rel_x < 100: 
-                    anchors.append({
-                        'q_num': num,
-                        'top': w['top'],
-                        'bottom': w['bottom'],
-                        'col_x': col_bbox[0],
-                        'col_w': col_bbox[2] - col_bbox[0],
-                        'confidence': 'high'
-                    })
+            anchors.append({
+                'q_num': num,
+                'top': page.top[i],
+                'bottom': page.bottom[i],
+                'col_x': col_bbox[0],
+                'col_w': col_bbox[2] - col_bbox[0],
+                'confidence': 'high'
+            })
     except: pass 
     return anchors
 
@@ -182,33 +150,33 @@ def filter_sequential_anchors(raw_anchors):
             elif q == 1: clean_anchors.append(anchor); last_num = q; seen.add(q)
     return clean_anchors
 
-def parse_pdf_structure(pdf_path):
+def parse_pdf_structure(pdf):
+    """pdf: ParsedPdf (shared with the answer-key text scan)."""
     raw_structure = []
     topic_name = "Unknown"
-    with pdfplumber.open(pdf_path) as pdf:
-        for p_idx, page in enumerate(pdf.pages):
-            width = page.width
-            height = page.height
-            text = page.extract_text() or ""
-            topic_match = re.search(r'Topic\s+\d+\s+([A-Za-z\s]+)', text)
-            if topic_match: topic_name = topic_match.group(1).strip()
-            
-            page_bottom = height * 0.93
-            for marker in ["Answers", "Explanations", "Hints & Solutions"]:
-                hits = page.search(marker)
-                if hits: page_bottom = min(page_bottom, hits[0]['top'])
-            
-            if page_bottom < 50: continue 
-            mid = width / 2
-            cols = [(0, 0, mid, page_bottom), (mid, 0, width, page_bottom)]
-            for col_idx, bbox in enumerate(cols):
-                col_anchors = extract_column_anchors(page, bbox)
-                for a in col_anchors:
-                    a['page'] = p_idx
-                    a['col_idx'] = col_idx
-                    a['limit_bottom'] = bbox[3]
-                    a['topic'] = topic_name
-                    raw_structure.append(a)
+    for p_idx, page in enumerate(pdf.pages):
+        width = page.width
+        height = page.height
+        text = page.extract_text() or ""
+        topic_match = re.search(r'Topic\s+\d+\s+([A-Za-z\s]+)', text)
+        if topic_match: topic_name = topic_match.group(1).strip()
+        
+        page_bottom = height * 0.93
+        for marker in ["Answers", "Explanations", "Hints & Solutions"]:
+            hits = page.search(marker)
+            if hits: page_bottom = min(page_bottom, hits[0]['top'])
+        
+        if page_bottom < 50: continue 
+        mid = width / 2
+        cols = [(0, 0, mid, page_bottom), (mid, 0, width, page_bottom)]
+        for col_idx, bbox in enumerate(cols):
+            col_anchors = extract_column_anchors(page, bbox)
+            for a in col_anchors:
+                a['page'] = p_idx
+                a['col_idx'] = col_idx
+                a['limit_bottom'] = bbox[3]
+                a['topic'] = topic_name
+                raw_structure.append(a)
     return filter_sequential_anchors(raw_structure)
 
 # --- 4. BATCH PROCESSOR ---
@@ -233,10 +201,10 @@ def run_batch_extraction(row_data, source_pdf):
             with open(trimmed_path, "wb") as f: writer.write(f)
         else: return False
 
-    # 2. Extract Metadata
-    anchors = parse_pdf_structure(trimmed_path)
-    full_text = ""
-    with pdfplumber.open(trimmed_path) as pdf:
+    # 2. Extract Metadata (one parse shared by the anchor scan and the answer key)
+    with ParsedPdf(trimmed_path) as pdf:
+        anchors = parse_pdf_structure(pdf)
+        full_text = ""
         for p in pdf.pages: full_text += (p.extract_text() or "") + "\n"
     answer_key = get_answer_key(full_text)
     
@@ -1,13 +1,14 @@
 import os
 import re
 import json
-import numpy as np
 import pandas as pd
 import pdfplumber
 import fitz  # PyMuPDF: The new, superior renderer
 from pypdf import PdfReader, PdfWriter
-from PIL import Image, ImageChops, ImageOps, ImageEnhance
+from PIL import Image, ImageChops, ImageEnhance
 from tqdm import tqdm
+from imageKernels import to_gray, column_profile, gap_cut
+from imageThresholds import whiten_above
 
 # --- 1. CONFIGURATION ---
 BASE_PATH = 'D:/Main/3. Work - Teaching/Projects/Question extractor'
@@ -32,14 +33,11 @@ def compress_and_clean(img):
     4. Quantization: Reduces file size.
     """
     try:
-        # 1. Convert to Grayscale
-        img = img.convert('L')
-        
-        # 2. Watermark Removal (The Fix)
-        # Your watermark is ~231. We set cutoff at 190.
+        # 1-2. Grayscale + Watermark Removal (The Fix)
+        # Your watermark is ~231. We set cutoff at 190 ('allen' profile).
         # Anything lighter than 190 becomes Pure White (255).
         # Anything darker (Text) stays as is.
-        img = img.point(lambda p: 255 if p > 190 else p)
+        img = whiten_above(img, 'allen')
         
         # 3. Contrast Boost (Helps text pop after cleaning)
         enhancer = ImageEnhance.Contrast(img)
@@ -55,25 +53,10 @@ def compress_and_clean(img):
 def pixel_sensitive_crop(img):
     """Dynamic cropping using vertical pixel projection to strip question numbers."""
     try:
-        inverted_img = ImageOps.invert(img.convert('L'))
-        data = np.array(inverted_img)
-        horizontal_projection = np.sum(data, axis=0)
-        width = len(horizontal_projection)
-        
-        crop_x, whitespace_count, in_number_block = 0, 0, False
-        for x in range(5, width):
-            if horizontal_projection[x] > 500: # Threshold for 'ink'
-                in_number_block = True
-                whitespace_count = 0
-            elif in_number_block:
-                whitespace_count += 1
-                if whitespace_count >= 15: # Detected whitespace gap after question number
-                    crop_x = x - whitespace_count + 2
-                    break
-        
-        # Safety fallback
-        if crop_x == 0 or crop_x > (width * 0.30): 
-            crop_x = int(width * 0.05)
+        # Gap after the question number; safety fallback to 5% if nothing sensible (> 30%) is found
+        width = img.size[0]
+        crop_x = gap_cut(column_profile(to_gray(img)), ink_threshold=500, min_gap=15, start=5, offset=2,
+                         max_ratio=0.30, fallback_ratio=0.05)
         return img.crop((crop_x, 0, width, img.size[1]))
     except:
         return img
@@ -8,6 +8,7 @@ from pypdf import PdfReader, PdfWriter
 from PIL import Image, ImageChops, ImageOps
 from pdf2image import convert_from_path
 from tqdm import tqdm
+from imageThresholds import whiten_above
 
 # --- 1. CONFIGURATION ---
 BASE_PATH = 'D:/Main/3. Work - Teaching/Projects/Question extractor'
@@ -70,8 +71,7 @@ def trim_whitespace(im):
 
 def compress_and_clean(img, noise_threshold=170):
     """Grayscale + Thresholding for app optimization."""
-    gray = img.convert('L')
-    return gray.point(lambda p: 255 if p > noise_threshold else p)
+    return whiten_above(img, noise_threshold)
 
 # --- 4. PDF PROCESSING ---
 def trim_pdf_allen(input_filename, start_p, end_p, chapter):
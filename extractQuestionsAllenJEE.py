@@ -5,8 +5,11 @@ import numpy as np
 import pandas as pd
 import pdfplumber
 from pypdf import PdfReader, PdfWriter
-from PIL import Image, ImageChops, ImageOps
-from pdf2image import convert_from_path
+from PIL import Image, ImageChops
+import fitz  # PyMuPDF
+from pdfSegmentRenderer import column_bounds, render_clip
+from imageKernels import to_gray, ink_mask, column_profile, gap_cut, footer_cut, whiten_range
+from imageThresholds import whiten_above
 from tqdm import tqdm
 
 # --- 1. CONFIGURATION ---
@@ -52,32 +55,10 @@ def smart_footer_trim(img):
     4. Stop when we hit main text (ink on left).
     """
     try:
-        gray = img.convert('L')
-        # Binarize: Ink=1, White=0 (Threshold 150)
-        # We invert so Ink is 'True' (1)
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        
-        height, width = data.shape
-        midpoint = width // 2
-        
-        cutoff = height
-        
-        # Scan from bottom up
-        for y in range(height - 1, -1, -1):
-            # Extract Left Half of the row
-            left_half_row = data[y, :midpoint]
-            
-            # Calculate Ink Count in Left Half
-            ink_pixels = np.count_nonzero(left_half_row)
-            total_pixels = left_half_row.size
-            
-            # If Left Half is effectively empty (< 0.5% ink), crop it
-            if (ink_pixels / total_pixels) < 0.005:
-                cutoff = y
-            else:
-                # Hit main body. STOP.
-                break
+        # Binarize: Ink = True (Threshold 150)
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        cutoff = footer_cut(ink, 0, width // 2, min_density=0.005)
         
         # Apply crop (Add 5px buffer)
         if cutoff < height:
@@ -90,27 +71,33 @@ def smart_footer_trim(img):
 def pixel_sensitive_crop(img):
     """Left-side Question Number Trim."""
     try:
-        inverted_img = ImageOps.invert(img.convert('L'))
-        data = np.array(inverted_img)
-        horizontal_projection = np.sum(data, axis=0)
-        width = len(horizontal_projection)
-        
-        crop_x, whitespace_count, in_number_block = 0, 0, False
-        for x in range(5, width):
-            if horizontal_projection[x] > 500: 
-                in_number_block = True
-                whitespace_count = 0
-            elif in_number_block:
-                whitespace_count += 1
-                if whitespace_count >= 15: 
-                    crop_x = x - whitespace_count + 2
-                    break
-        
-        if crop_x == 0 or crop_x > (width * 0.30): 
-            crop_x = int(width * 0.05)
+        width = img.size[0]
+        crop_x = gap_cut(column_profile(to_gray(img)), ink_threshold=500, min_gap=15, start=5, offset=2,
+                         max_ratio=0.30, fallback_ratio=0.05)
         return img.crop((crop_x, 0, width, img.size[1]))
     except: return img
 
+def clean_question_crop(img):
+    """
+    Steps 2-4 of the pipeline (watermark -> question number -> footer) on one grayscale array:
+    decoded once, masked in place, cut by slicing, converted back to an image once.
+    Same output as remove_watermark_specific + pixel_sensitive_crop + smart_footer_trim.
+    """
+    try:
+        gray = np.array(img.convert('L'))
+        whiten_range(gray, 31, 129)
+
+        crop_x = gap_cut(column_profile(gray), ink_threshold=500, min_gap=15, start=5, offset=2,
+                         max_ratio=0.30, fallback_ratio=0.05)
+        gray = gray[:, crop_x:]
+
+        height, width = gray.shape
+        cutoff = footer_cut(ink_mask(gray, 150), 0, width // 2, min_density=0.005)
+        if cutoff < height: gray = gray[:min(height, cutoff + 5)]
+        return Image.fromarray(gray)
+    except:
+        return img
+
 def trim_whitespace(im):
     try:
         bg = Image.new(im.mode, im.size, im.getpixel((0,0)))
@@ -122,8 +109,7 @@ def trim_whitespace(im):
 
 def compress_and_clean(img):
     """Final Polish."""
-    gray = img.convert('L')
-    return gray.point(lambda p: 255 if p > 150 else p)
+    return whiten_above(img, 'allen_jee')
 
 # --- 3. PDF TEXT EXTRACTION ---
 def capture_text_from_area(pdf_path, start_anchor, end_anchor, footer_val):
@@ -203,41 +189,36 @@ def run_batch_extraction(row_data, source_pdf):
                                         'col': 0 if word['x0'] < mid else 1})
     
     anchors = sorted(anchors, key=lambda x: (x['page_idx'], x['col'], x['top']))
-    pdf_images = convert_from_path(trimmed_path, dpi=300)
-    scale = 300/72
+    # Question rectangles are rendered on demand (PyMuPDF clip), no full-page bitmaps
+    doc = fitz.open(trimmed_path)
+    page_width = doc[0].rect.width
+    pad = 15 * 72 / 300   # 15px at 300 DPI
     
     rows = []
     for i, start in tqdm(enumerate(anchors), total=len(anchors), desc=f"   ✂️ {chapter[:15]}"):
         try:
             nxt = anchors[i+1] if i+1 < len(anchors) else {'page_idx': start['page_idx'], 'top': footer_limit, 'col': start['col']}
             
-            y1_val = max(0, (start['top'] * scale) - 15)
+            y1_val = max(0, start['top'] - pad)
             if nxt['page_idx'] == start['page_idx'] and nxt['col'] == start['col'] and nxt['top'] <= start['top']:
-                y2_val = footer_limit * scale
+                y2_val = footer_limit
             else:
-                y2_val = (nxt['top'] * scale) - 15
+                y2_val = nxt['top'] - pad
 
-            mid_px = pdf_images[0].size[0]/2
-            l, r = (0, mid_px) if start['col'] == 0 else (mid_px, pdf_images[0].size[0])
+            l, r = column_bounds(start['col'], page_width)
             
             if start['page_idx'] == nxt['page_idx'] and start['col'] == nxt['col']:
-                safe_y2 = max(y1_val + 10, min(y2_val, footer_limit * scale))
-                stitched = pdf_images[start['page_idx']].crop((l, y1_val, r, safe_y2))
+                safe_y2 = max(y1_val + 10 * 72 / 300, min(y2_val, footer_limit))
+                stitched = render_clip(doc, start['page_idx'], (l, y1_val, r, safe_y2))
             else:
-                stitched = pdf_images[start['page_idx']].crop((l, y1_val, r, footer_limit*scale))
+                stitched = render_clip(doc, start['page_idx'], (l, y1_val, r, footer_limit))
 
             # --- APPLIED PIPELINE ---
             # 1. Trim base
             img_s1 = trim_whitespace(stitched)
             
-            # 2. Targeted Watermark Removal (Range 50-110)
-            img_s2 = remove_watermark_specific(img_s1)
-            
-            # 3. Crop Question Number (Left)
-            img_s3 = pixel_sensitive_crop(img_s2)
-            
-            # 4. Remove Footer (Left-Half Scan Logic)
-            img_s4 = smart_footer_trim(img_s3)
+            # 2-4. Watermark Removal (Range 30-130), Question Number (Left), Footer (Left-Half Scan)
+            img_s4 = clean_question_crop(img_s1)
             
             # 5. Final Polish
             final_img = compress_and_clean(trim_whitespace(img_s4))
@@ -260,6 +241,8 @@ def run_batch_extraction(row_data, source_pdf):
         except Exception as e:
             print(f"⚠️ Skipping Q {start.get('q_num')}: {e}")
 
+    doc.close()
+
     # Save
     df_new = pd.DataFrame(rows)
     if os.path.exists(ALLEN_CSV_PATH):
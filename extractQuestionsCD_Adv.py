@@ -5,10 +5,10 @@ import pdfplumber
 import json
 import re
 import time
-import numpy as np
 import fitz  # PyMuPDF
 from pypdf import PdfReader, PdfWriter
-from PIL import Image, ImageChops, ImageOps, ImageEnhance
+from PIL import Image, ImageChops, ImageEnhance
+from imageKernels import to_gray, ink_mask, column_profile, row_profile, gap_cut, footer_cut
 try:
     from tqdm import tqdm
 except ImportError:
@@ -67,75 +67,27 @@ def compress_and_clean(img):
 
 def pixel_sensitive_left_trim(img):
     try:
-        inverted_img = ImageOps.invert(img.convert('L'))
-        data = np.array(inverted_img)
-        horizontal_projection = np.sum(data, axis=0)
-        width = len(horizontal_projection)
-        
-        crop_x = 0
-        whitespace_count = 0
-        in_number_block = False
-        
-        for x in range(5, width):
-            if horizontal_projection[x] > 500: 
-                in_number_block = True
-                whitespace_count = 0
-            elif in_number_block:
-                whitespace_count += 1
-                if whitespace_count >= 15: 
-                    crop_x = x - whitespace_count + 4
-                    break
-        
-        if crop_x == 0 or crop_x > (width * 0.25): 
-            crop_x = int(width * 0.02)
-            
+        width = img.size[0]
+        crop_x = gap_cut(column_profile(to_gray(img)), ink_threshold=500, min_gap=15, start=5, offset=4,
+                         max_ratio=0.25, fallback_ratio=0.02)
         return img.crop((crop_x, 0, width, img.size[1]))
     except:
         return img
 
 def pixel_sensitive_top_trim(img):
     try:
-        inverted_img = ImageOps.invert(img.convert('L'))
-        data = np.array(inverted_img)
-        vertical_projection = np.sum(data, axis=1)
-        height = len(vertical_projection)
-        
-        crop_y = 0
-        whitespace_count = 0
-        in_header_block = False
-        
-        for y in range(5, height):
-            if vertical_projection[y] > 500: 
-                in_header_block = True
-                whitespace_count = 0
-            elif in_header_block:
-                whitespace_count += 1
-                if whitespace_count >= 10:
-                    crop_y = y - whitespace_count + 4
-                    break
-        
-        if crop_y == 0 or crop_y > (height * 0.30):
-            crop_y = 0
-            
+        height = img.size[1]
+        crop_y = gap_cut(row_profile(to_gray(img)), ink_threshold=500, min_gap=10, start=5, offset=4,
+                         max_ratio=0.30, fallback_ratio=0)
         return img.crop((0, crop_y, img.size[0], height))
     except:
         return img
 
 def smart_footer_trim(img):
     try:
-        gray = img.convert('L')
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        height, width = data.shape
-        cutoff = height
-        
-        for y in range(height - 1, -1, -1):
-            row = data[y]
-            left_half_ink = np.any(row[:int(width * 0.5)])
-            if left_half_ink:
-                break
-            else:
-                cutoff = y
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        cutoff = footer_cut(ink, 0, int(width * 0.5))
         
         if cutoff < height:
             return img.crop((0, 0, width, cutoff))
@@ -1,10 +1,13 @@
 import os
 import re
 import json
-import numpy as np
 import pandas as pd
 from pypdf import PdfReader, PdfWriter
-import pdfplumber
+from pdfWordIndex import ParsedPdf
+from anchorDetection import match_tokens, font_mask
+from imageKernels import to_gray, ink_mask, footer_cut, blank_left_columns
+from extractionCache import ExtractionCache, CACHE_DIR_NAME
+from imageEncoderPool import EncoderPool
 import fitz  # PyMuPDF: The new, superior renderer
 from PIL import Image, ImageChops, ImageOps, ImageEnhance
 from tqdm import tqdm
@@ -19,6 +22,15 @@ INPUT_CSV_PATH = os.path.join(BASE_PATH, 'Question Bank Digvijay - Inputs.csv')
 RAW_DATA_DIR = os.path.join(BASE_PATH, 'raw data')
 TRIMMED_DIR = os.path.join(RAW_DATA_DIR, 'Trimmed_PDFs')
 PROCESSED_BASE = os.path.join(BASE_PATH, 'Processed_Database')
+CACHE_DIR = os.path.join(PROCESSED_BASE, CACHE_DIR_NAME)
+
+BOLD_FONT_MARKERS = ('bold', 'bd', 'black', 'medi')
+FOOTER_RATIO = 0.93     # Bottom 7% of the page is footer
+RENDER_DPI = 300
+
+# Extraction cache keys: bump 'parser' / 'pipeline' after changing anchor parsing / image post-processing
+CACHE_PARSE_PARAMS = {'parser': 'bold-anchors-v1', 'footer_ratio': FOOTER_RATIO}
+CACHE_RENDER_PARAMS = {'dpi': RENDER_DPI, 'pipeline': 'trim-bottom-left-v1'}
 
 os.makedirs(TRIMMED_DIR, exist_ok=True)
 os.makedirs(PROCESSED_BASE, exist_ok=True)
@@ -53,26 +65,10 @@ def compress_and_clean(img):
 def smart_left_number_trim(img):
     """Scans Left-to-Right. Crops if Bottom Half is empty (< 5%)."""
     try:
-        gray = img.convert('L')
         # Binarize just for analysis (not for final output)
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        
-        height, width = data.shape
-        mid_h = height // 2
-        crop_x = 0
-        scan_limit = int(width * 0.25)
-        
-        for x in range(scan_limit):
-            col = data[:, x]
-            bottom_half = col[mid_h:]
-            ink = np.count_nonzero(bottom_half)
-            density = ink / bottom_half.size if bottom_half.size > 0 else 0
-            
-            if density < 0.05:
-                crop_x = x
-            else:
-                break
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        crop_x = blank_left_columns(ink, height // 2, None, max_density=0.05, limit=int(width * 0.25)) - 1
         
         if crop_x > 0:
             return img.crop((crop_x + 2, 0, width, height))
@@ -82,23 +78,9 @@ def smart_left_number_trim(img):
 def smart_bottom_trim(img):
     """Scans Bottom-Up. Crops if Right Half is empty (< 5%)."""
     try:
-        gray = img.convert('L')
-        bw = gray.point(lambda p: 0 if p > 150 else 1, mode='1')
-        data = np.array(bw)
-        
-        height, width = data.shape
-        midpoint = width // 2
-        crop_y = height
-        
-        for y in range(height - 1, -1, -1):
-            right_strip = data[y, midpoint:]
-            right_ink = np.count_nonzero(right_strip)
-            right_density = right_ink / right_strip.size if right_strip.size > 0 else 0
-            
-            if right_density < 0.05:
-                crop_y = y
-            else:
-                break
+        ink = ink_mask(to_gray(img), 150)
+        height, width = ink.shape
+        crop_y = footer_cut(ink, width // 2, None, min_density=0.05)
         
         if crop_y < height:
             return img.crop((0, 0, width, min(height, crop_y + 2)))
@@ -115,9 +97,16 @@ def trim_whitespace(im):
         return im.crop(bbox) if bbox else im
     except: return im
 
-def is_bold(word_dict):
-    font = word_dict.get('fontname', '').lower()
-    return 'bold' in font or 'bd' in font or 'black' in font or 'medi' in font
+def clean_crop(img):
+    """Full post-processing of one rendered crop (runs on the encoder pool)."""
+    # 1. Trim outer white
+    img = trim_whitespace(img)
+    # 2. Remove bottom noise (Years)
+    img = smart_bottom_trim(img)
+    # 3. Remove question number (Left)
+    img = smart_left_number_trim(img)
+    # 4. Final Compress (Non-Destructive)
+    return compress_and_clean(trim_whitespace(img))
 
 # --- 3. STRUCTURE PARSING ---
 
@@ -142,27 +131,26 @@ def get_answer_key(full_text):
     return ans_map
 
 def extract_column_anchors(page, col_bbox):
+    """page: PageWords from ParsedPdf. Column, digit, bold and indent tests run as array masks."""
     anchors = []
     try:
-        col_crop = page.within_bbox(col_bbox)
-        words = col_crop.extract_words(extra_attrs=["fontname"])
-        for w in words:
-            text = w['text'].strip().replace('.', '')
-            if not text.isdigit(): continue
-            num = int(text)
+        idx, _ = match_tokens(page.text, r'[0-9.]*[0-9][0-9.]*')
+        in_col = page.bbox_mask(col_bbox, mode='within')
+        is_bold = font_mask(page.fontname, BOLD_FONT_MARKERS)
+        at_margin = (page.x0 - col_bbox[0]) < 100
+        idx = idx[in_col[idx] & is_bold[idx] & at_margin[idx]]
+
+        for i in idx:
+            num = int(page.text[i].replace('.', ''))
             if num > 2000: continue 
-            
-            rel_x = w['x0'] - col_bbox[0]
-            if is_bold(w):
-                if rel_x < 100: 
-                    anchors.append({
-                        'q_num': num,
-                        'top': w['top'],
-                        'bottom': w['bottom'],
-                        'col_x': col_bbox[0],
-                        'col_w': col_bbox[2] - col_bbox[0],
-                        'confidence': 'high'
-                    })
+            anchors.append({
+                'q_num': num,
+                'top': page.top[i],
+                'bottom': page.bottom[i],
+                'col_x': col_bbox[0],
+                'col_w': col_bbox[2] - col_bbox[0],
+                'confidence': 'high'
+            })
     except: pass 
     return anchors
 
@@ -182,33 +170,33 @@ def filter_sequential_anchors(raw_anchors):
             elif q == 1: clean_anchors.append(anchor); last_num = q; seen.add(q)
     return clean_anchors
 
-def parse_pdf_structure(pdf_path):
+def parse_pdf_structure(pdf):
+    """pdf: ParsedPdf (shared with the answer-key text scan)."""
     raw_structure = []
     topic_name = "Unknown"
-    with pdfplumber.open(pdf_path) as pdf:
-        for p_idx, page in enumerate(pdf.pages):
-            width = page.width
-            height = page.height
-            text = page.extract_text() or ""
-            topic_match = re.search(r'Topic\s+\d+\s+([A-Za-z\s]+)', text)
-            if topic_match: topic_name = topic_match.group(1).strip()
-            
-            page_bottom = height * 0.93
-            for marker in ["Answers", "Explanations", "Hints & Solutions"]:
-                hits = page.search(marker)
-                if hits: page_bottom = min(page_bottom, hits[0]['top'])
-            
-            if page_bottom < 50: continue 
-            mid = width / 2
-            cols = [(0, 0, mid, page_bottom), (mid, 0, width, page_bottom)]
-            for col_idx, bbox in enumerate(cols):
-                col_anchors = extract_column_anchors(page, bbox)
-                for a in col_anchors:
-                    a['page'] = p_idx
-                    a['col_idx'] = col_idx
-                    a['limit_bottom'] = bbox[3]
-                    a['topic'] = topic_name
-                    raw_structure.append(a)
+    for p_idx, page in enumerate(pdf.pages):
+        width = page.width
+        height = page.height
+        text = page.extract_text() or ""
+        topic_match = re.search(r'Topic\s+\d+\s+([A-Za-z\s]+)', text)
+        if topic_match: topic_name = topic_match.group(1).strip()
+        
+        page_bottom = height * FOOTER_RATIO
+        for marker in ["Answers", "Explanations", "Hints & Solutions"]:
+            hits = page.search(marker)
+            if hits: page_bottom = min(page_bottom, hits[0]['top'])
+        
+        if page_bottom < 50: continue 
+        mid = width / 2
+        cols = [(0, 0, mid, page_bottom), (mid, 0, width, page_bottom)]
+        for col_idx, bbox in enumerate(cols):
+            col_anchors = extract_column_anchors(page, bbox)
+            for a in col_anchors:
+                a['page'] = p_idx
+                a['col_idx'] = col_idx
+                a['limit_bottom'] = bbox[3]
+                a['topic'] = topic_name
+                raw_structure.append(a)
     return filter_sequential_anchors(raw_structure)
 
 # --- 4. BATCH PROCESSOR ---
@@ -233,12 +221,19 @@ def run_batch_extraction(row_data, source_pdf):
             with open(trimmed_path, "wb") as f: writer.write(f)
         else: return False
 
-    # 2. Extract Metadata
-    anchors = parse_pdf_structure(trimmed_path)
-    full_text = ""
-    with pdfplumber.open(trimmed_path) as pdf:
-        for p in pdf.pages: full_text += (p.extract_text() or "") + "\n"
-    answer_key = get_answer_key(full_text)
+    # 2. Extract Metadata (one parse shared by the anchor scan and the answer key; skipped on a cache hit)
+    cache = ExtractionCache(CACHE_DIR, trimmed_path, 'digvijay', page_range=(start_p, end_p),
+                            parse_params=CACHE_PARSE_PARAMS, render_params=CACHE_RENDER_PARAMS)
+    anchors, extras = cache.load_anchors()
+    if anchors is None:
+        with ParsedPdf(trimmed_path) as pdf:
+            anchors = parse_pdf_structure(pdf)
+            full_text = ""
+            for p in pdf.pages: full_text += (p.extract_text() or "") + "\n"
+        answer_key = get_answer_key(full_text)
+        cache.store_anchors(anchors, answer_key=answer_key)
+    else:
+        answer_key = {int(k): v for k, v in extras.get('answer_key', {}).items()}
     
     print(f"   🔑 Found {len(answer_key)} answers.")
     print(f"   🔎 Found {len(anchors)} Valid Questions.")
@@ -251,12 +246,12 @@ def run_batch_extraction(row_data, source_pdf):
     # Open doc with Fitz
     doc = fitz.open(trimmed_path)
     # 300 DPI Scale (72 pts * 4.166 = 300 px)
-    ZOOM = 300 / 72 
+    ZOOM = RENDER_DPI / 72
     mat = fitz.Matrix(ZOOM, ZOOM)
     
-    rows = []
-    with open(CONFIG_PATH, 'r') as f: config = json.load(f)
-    curr_id = int(config.get("last_unique_id", 0))
+    # Cleaning + PNG encoding run in the background; rows are built after the barrier below
+    encoder = EncoderPool()
+    pending = []  # (anchor, filename, (w, h) or Future)
 
     for i, start in tqdm(enumerate(anchors), total=len(anchors)):
         try:
@@ -278,47 +273,65 @@ def run_batch_extraction(row_data, source_pdf):
             # Safety for last question in column
             if y2_pts <= y1_pts + 5: y2_pts = y1_pts + 100
             
-            # --- RENDER STRATEGY (FITZ) ---
-            # Define crop rectangle in PDF coordinates
-            page = doc[start['page']]
-            rect = fitz.Rect(x1_pts, y1_pts, x2_pts, y2_pts)
-            
-            # Render High-Res Pixmap
-            pix = page.get_pixmap(matrix=mat, clip=rect, alpha=False)
-            
-            # Convert to PIL
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            # --- POST PROCESSING ---
-            # 1. Trim outer white
-            img = trim_whitespace(img)
-            # 2. Remove bottom noise (Years)
-            img = smart_bottom_trim(img)
-            # 3. Remove question number (Left)
-            img = smart_left_number_trim(img)
-            # 4. Final Compress (Non-Destructive)
-            final_img = compress_and_clean(trim_whitespace(img))
-            
             filename = f"Q_{start['q_num']}.png"
-            final_img.save(os.path.join(output_dir, filename), optimize=True)
-            
-            curr_id += 1
-            rows.append({
-                'unique_id': curr_id,
-                'Question No.': start['q_num'],
-                'Folder': trimmed_name,
-                'Chapter': chapter_name, 
-                'Topic': topic_name,     
-                'Subject': row_data.get('Subject', 'Physics'),
-                'Correct Answer': answer_key.get(start['q_num'], ""),
-                'Question type': 'Single Correct', 
-                'PYQ': 'Yes',                       
-                'q_width': final_img.width,         
-                'q_height': final_img.height,       
-                'image_url': filename
-            })
+            out_path = os.path.join(output_dir, filename)
+            geometry = (start['page'], x1_pts, y1_pts, x2_pts, y2_pts)
+
+            # --- CACHE: unchanged crop -> reuse the saved image ---
+            cached = cache.lookup(filename, geometry, out_path)
+            if cached is not None:
+                pending.append((start, filename, (cached['width'], cached['height'])))
+            else:
+                # --- RENDER STRATEGY (FITZ) ---
+                # Define crop rectangle in PDF coordinates
+                page = doc[start['page']]
+                rect = fitz.Rect(x1_pts, y1_pts, x2_pts, y2_pts)
+                
+                # Render High-Res Pixmap
+                pix = page.get_pixmap(matrix=mat, clip=rect, alpha=False)
+                
+                # Convert to PIL
+                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                
+                # --- POST PROCESSING + SAVE (background) ---
+                on_saved = lambda size, name=filename, geometry=geometry, path=out_path: \
+                    cache.record(name, geometry, path, width=size[0], height=size[1])
+                future = encoder.save(img, out_path, process=clean_crop, on_saved=on_saved, optimize=True)
+                pending.append((start, filename, future))
         except Exception as e: pass
 
+    # Barrier: every PNG is on disk before rows / cache are written
+    encoder.close()
+    doc.close()
+    cache.save()
+    print(f"   ♻️ {cache.summary()}")
+
+    rows = []
+    with open(CONFIG_PATH, 'r') as f: config = json.load(f)
+    curr_id = int(config.get("last_unique_id", 0))
+
+    for start, filename, size in pending:
+        if not isinstance(size, tuple):
+            if size.exception() is not None or size.result() is None: continue
+            size = size.result()
+        img_w, img_h = size
+
+        curr_id += 1
+        rows.append({
+            'unique_id': curr_id,
+            'Question No.': start['q_num'],
+            'Folder': trimmed_name,
+            'Chapter': chapter_name, 
+            'Topic': topic_name,     
+            'Subject': row_data.get('Subject', 'Physics'),
+            'Correct Answer': answer_key.get(start['q_num'], ""),
+            'Question type': 'Single Correct', 
+            'PYQ': 'Yes',                       
+            'q_width': img_w,         
+            'q_height': img_h,       
+            'image_url': filename
+        })
+
     if rows:
         df_new = pd.DataFrame(rows)
         ordered_cols = ['unique_id', 'Question No.', 'Folder', 'Chapter', 'Topic', 'Subject', 
@@ -2,11 +2,15 @@ import os
 import re
 import json
 import pandas as pd
-import pdfplumber
+from anchorDetection import match_tokens, token_numbers, font_mask
+from extractionCache import ExtractionCache, CACHE_DIR_NAME
+from pdfPageRange import open_book, close_books
+from imageEncoderPool import EncoderPool, map_crops
+from extractionManifest import FolderManifest
+from imageKernels import number_block_cut, whiten_range, gap_confirmed_footer_cut
 import fitz  # PyMuPDF
 import cv2   # OpenCV
 import numpy as np
-from pypdf import PdfReader, PdfWriter
 from PIL import Image, ImageChops, ImageEnhance
 from tqdm import tqdm
 from collections import Counter
@@ -19,10 +23,15 @@ OUTPUT_CSV_PATH = os.path.join(BASE_PATH, 'Question Bank MTG Adv PYQs.csv')
 INPUT_CSV_PATH = os.path.join(BASE_PATH, 'Question Bank MTG Adv PYQs- Inputs.csv')
 
 RAW_DATA_DIR = os.path.join(BASE_PATH, 'raw data')
-TRIMMED_DIR = os.path.join(RAW_DATA_DIR, 'Trimmed_PDFs')
 PROCESSED_BASE = os.path.join(BASE_PATH, 'Processed_Database')
+CACHE_DIR = os.path.join(PROCESSED_BASE, CACHE_DIR_NAME)
+
+RENDER_DPI = 300
+FOOTER_RATIO = 0.95
+# Extraction cache keys: bump 'parser' / 'pipeline' after changing anchor parsing / image post-processing
+CACHE_PARSE_PARAMS = {'parser': 'bold-anchors-v1'}
+CACHE_RENDER_PARAMS = {'dpi': RENDER_DPI, 'pipeline': 'smart-clean-v1'}
 
-os.makedirs(TRIMMED_DIR, exist_ok=True)
 os.makedirs(PROCESSED_BASE, exist_ok=True)
 
 # --- 2. ADVANCED IMAGE PROCESSING ---
@@ -33,61 +42,22 @@ def process_image_smart(pil_img):
     1. Removes Watermarks (Light Grey pixels -> White).
     2. Aggressively crops black footers/artifacts from bottom.
     3. Trims Question Number from left.
+    One RGB array end to end: masks, row/column profiles and cut points are NumPy reductions.
     """
     try:
-        # Convert to BGR (OpenCV format)
-        img_np = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        
+        rgb = np.array(pil_img)
+        if rgb.ndim != 3 or rgb.shape[2] != 3: return pil_img
+        height = rgb.shape[0]
+
         # --- A. WATERMARK REMOVAL ---
         # Target: Light Grey (RGB ~230,230,230). Range: 200-245
-        # We define a mask for this range and force those pixels to pure white
-        lower_grey = np.array([200, 200, 200], dtype=np.uint8)
-        upper_grey = np.array([245, 245, 245], dtype=np.uint8)
-        mask = cv2.inRange(img_np, lower_grey, upper_grey)
-        img_np[mask > 0] = [255, 255, 255]
+        whiten_range(rgb, 200, 245)
 
         # --- B. AGGRESSIVE BOTTOM CROP ---
-        # Convert to binary for structure analysis
-        gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
-        height, width = binary.shape
-
-        # Scan from bottom up
-        # We look for the first row that is "mostly empty" (ink density < 1%)
-        # This skips over dense black bars, text lines, and noise at the bottom
-        crop_bottom = height
-        scan_limit = int(height * 0.25) # Only scan bottom 25%
-        
-        for y in range(height - 1, height - scan_limit, -1):
-            row = binary[y, :]
-            ink_density = np.count_nonzero(row) / width
-            
-            # If the row has significant ink (> 50%) OR is a solid line, we keep cutting
-            # We stop only when we find a "clean" white gap
-            if ink_density > 0.05: 
-                crop_bottom = y
-            else:
-                # We found a white gap. But is it the *real* content end?
-                # Check 5 rows above to be sure we aren't just in a text line gap
-                if crop_bottom != height: # If we have started cutting
-                    # Look ahead (upwards) - if mostly white for 5 rows, we stop here
-                    is_safe_gap = True
-                    for k in range(1, 6):
-                        if (y - k) >= 0:
-                            if (np.count_nonzero(binary[y-k, :]) / width) > 0.05:
-                                is_safe_gap = False
-                                break
-                    if is_safe_gap:
-                        break
-                    else:
-                        crop_bottom = y # Continue cutting
-
-        # Apply Bottom Crop
-        if crop_bottom < height:
-            img_np = img_np[:crop_bottom, :]
-            gray = gray[:crop_bottom, :]
-            binary = binary[:crop_bottom, :]
-            height = crop_bottom 
+        # Ink = gray <= 200 (THRESH_BINARY_INV at 200). In the bottom 25%, rows with > 5% ink are cut
+        # until a white gap that stays white for 5 more rows (not just a gap between text lines).
+        ink = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY) <= 200
+        crop_bottom = gap_confirmed_footer_cut(ink, int(height * 0.25), density=0.05, confirm_rows=5)
 
         # --- C. QUESTION NUMBER TRIM ---
         SCAN_WIDTH_RATIO = 0.30
@@ -95,56 +65,16 @@ def process_image_smart(pil_img):
         MERGE_GAP_TOLERANCE = 15
         CUT_PADDING = 10
 
-        scan_width = int(width * SCAN_WIDTH_RATIO)
-        projection = np.sum(binary[:, :scan_width], axis=0) / 255
-        has_ink = projection > INK_THRESHOLD
-
-        blocks = []
-        in_block = False
-        start_x = 0
-        
-        x = 0
-        while x < len(has_ink):
-            if has_ink[x]:
-                if not in_block:
-                    in_block = True
-                    start_x = x
-            else:
-                if in_block:
-                    is_real_gap = True
-                    look_ahead_range = min(x + MERGE_GAP_TOLERANCE, len(has_ink))
-                    for k in range(x + 1, look_ahead_range):
-                        if has_ink[k]:
-                            is_real_gap = False
-                            x = k - 1 
-                            break
-                    if is_real_gap:
-                        in_block = False
-                        end_x = x
-                        if (end_x - start_x) > 3:
-                            blocks.append({'start': start_x, 'end': end_x})
-            x += 1
-            
-        if in_block:
-            end_x = len(has_ink)
-            if (end_x - start_x) > 3:
-                blocks.append({'start': start_x, 'end': end_x})
-
-        cut_x = 0
-        if len(blocks) >= 2:
-            text_start = blocks[1]['start']
-            number_end = blocks[0]['end']
-            cut_x = max(text_start - CUT_PADDING, number_end + 1)
-        
-        if cut_x > 0:
-            img_np = img_np[:, cut_x:]
-
-        # Return as PIL (RGB)
-        return Image.fromarray(cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB))
+        cut_x = number_block_cut(ink[:crop_bottom], SCAN_WIDTH_RATIO, INK_THRESHOLD, MERGE_GAP_TOLERANCE, CUT_PADDING)
+        return Image.fromarray(rgb[:crop_bottom, cut_x:])
 
     except Exception:
         return pil_img 
 
+def process_images_smart(images, workers=None):
+    """Batch form of process_image_smart over a list of crops (order kept)."""
+    return map_crops(process_image_smart, images, workers) 
+
 # --- 3. UTILITIES ---
 
 def compress_and_clean(img):
@@ -167,9 +97,18 @@ def trim_whitespace(im):
         return im
     except: return im
 
+def clean_crop(img):
+    """Full post-processing of one rendered crop (runs on the encoder pool)."""
+    img = trim_whitespace(img)
+    # Smart Clean (Watermark + Bottom Strip + Number Trim)
+    img = process_image_smart(img)
+    return compress_and_clean(img)
+
+BOLD_FONT_MARKERS = ('bold', 'bd', 'black', 'medi', '+b')
+
 def is_bold_font(fontname):
     fn = fontname.lower()
-    return 'bold' in fn or 'bd' in fn or 'black' in fn or 'medi' in fn or '+b' in fn
+    return any(marker in fn for marker in BOLD_FONT_MARKERS)
 
 def sort_words_by_column(words, page_width):
     if not words: return []
@@ -238,73 +177,70 @@ def classify_and_clean_answer(raw_text):
 
 # --- 5. PARSERS ---
 
-def parse_answer_key_robust(pdf_path, start_page, start_y, end_page, end_y):
+def parse_answer_key_robust(pdf, start_page, start_y, end_page, end_y):
+    """pdf: ParsedPdf / chapter PageRange (the same parse used by analyze_and_extract)."""
     # print(f"      🔑 Parsing Answer Key Region...")
     raw_key_map = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        all_words_in_order = []
-        for p_idx in range(start_page, end_page + 1):
-            page = pdf.pages[p_idx]
-            width = page.width
-            height = page.height
-            p_top = start_y if p_idx == start_page else 0
-            p_bottom = end_y if p_idx == end_page else height
-            words = page.extract_words(keep_blank_chars=False, extra_attrs=["fontname"])
-            region_words = [w for w in words if w['top'] >= p_top and w['bottom'] <= p_bottom]
-            if not region_words: continue
-            sorted_page_words = sort_words_by_column(region_words, width)
-            all_words_in_order.extend(sorted_page_words)
-
-        current_q_num = None
-        current_text_buffer = []
-        for w in all_words_in_order:
-            text = w['text'].strip()
-            is_bold = is_bold_font(w['fontname'])
-            match_num = re.match(r'^(\d+)[\.:]?$', text)
-            is_new_anchor = False
-            if is_bold and match_num:
-                num = int(match_num.group(1))
-                if current_q_num is None:
-                    if num == 1: is_new_anchor = True
-                elif num == current_q_num + 1: is_new_anchor = True
-                elif 0 < (num - current_q_num) < 5: is_new_anchor = True
-            
-            if is_new_anchor:
-                if current_q_num is not None:
-                    full_ans = " ".join(current_text_buffer).strip()
-                    raw_key_map[current_q_num] = full_ans
-                current_q_num = int(match_num.group(1))
-                current_text_buffer = []
-            else:
-                if current_q_num is not None: current_text_buffer.append(text)
+    all_words_in_order = []
+    for p_idx in range(start_page, end_page + 1):
+        page = pdf.pages[p_idx]
+        width = page.width
+        height = page.height
+        p_top = start_y if p_idx == start_page else 0
+        p_bottom = end_y if p_idx == end_page else height
+        region_words = page.words((page.top >= p_top) & (page.bottom <= p_bottom))
+        if not region_words: continue
+        sorted_page_words = sort_words_by_column(region_words, width)
+        all_words_in_order.extend(sorted_page_words)
+
+    current_q_num = None
+    current_text_buffer = []
+    for w in all_words_in_order:
+        text = w['text'].strip()
+        is_bold = is_bold_font(w['fontname'])
+        match_num = re.match(r'^(\d+)[\.:]?$', text)
+        is_new_anchor = False
+        if is_bold and match_num:
+            num = int(match_num.group(1))
+            if current_q_num is None:
+                if num == 1: is_new_anchor = True
+            elif num == current_q_num + 1: is_new_anchor = True
+            elif 0 < (num - current_q_num) < 5: is_new_anchor = True
         
-        if current_q_num is not None and current_text_buffer:
-             full_ans = " ".join(current_text_buffer).strip()
-             raw_key_map[current_q_num] = full_ans
+        if is_new_anchor:
+            if current_q_num is not None:
+                full_ans = " ".join(current_text_buffer).strip()
+                raw_key_map[current_q_num] = full_ans
+            current_q_num = int(match_num.group(1))
+            current_text_buffer = []
+        else:
+            if current_q_num is not None: current_text_buffer.append(text)
+    
+    if current_q_num is not None and current_text_buffer:
+         full_ans = " ".join(current_text_buffer).strip()
+         raw_key_map[current_q_num] = full_ans
 
     return raw_key_map
 
-def analyze_and_extract(pdf_path):
+def analyze_and_extract(pdf):
+    """pdf: ParsedPdf, or a chapter PageRange over the book's ParsedPdf (page indices are chapter-relative)."""
     marker_page = -1
     marker_top = -1
     all_bold_anchors = []
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for p_idx, page in enumerate(pdf.pages):
-            if marker_page == -1:
-                res = page.search("ANSWER KEY")
-                if res:
-                    marker_page = p_idx
-                    marker_top = res[0]['top']
-                    
-            words = page.extract_words(keep_blank_chars=False, extra_attrs=["fontname"])
-            for w in words:
-                if is_bold_font(w['fontname']):
-                    text = w['text'].strip()
-                    if re.match(r'^(\d+)[\.:]?$', text):
-                        num = int(re.findall(r'\d+', text)[0])
-                        if 0 < num < 300:
-                            all_bold_anchors.append({'q_num': num, 'page': p_idx, 'top': w['top'], 'x0': w['x0'], 'x1': w['x1'], 'bottom': w['bottom']})
+    for p_idx, page in enumerate(pdf.pages):
+        if marker_page == -1:
+            res = page.search("ANSWER KEY")
+            if res:
+                marker_page = p_idx
+                marker_top = res[0]['top']
+
+        # Bold "12." / "12:" tokens, tested as array masks over the page's word table
+        idx, matches = match_tokens(page.text, r'(?P<num>[0-9]+)[.:]?')
+        nums = token_numbers(matches)
+        keep = font_mask(page.fontname, BOLD_FONT_MARKERS)[idx] & (nums > 0) & (nums < 300)
+        for i, num in zip(idx[keep], nums[keep]):
+            all_bold_anchors.append({'q_num': int(num), 'page': p_idx, 'top': page.top[i], 'x0': page.x0[i], 'x1': page.x1[i], 'bottom': page.bottom[i]})
 
     sol_start_page = -1
     sol_start_top = -1
@@ -337,13 +273,30 @@ def analyze_and_extract(pdf_path):
     solutions = clean(solutions)
     ans_map = {}
     if marker_page != -1 and sol_start_page != -1:
-        ans_map = parse_answer_key_robust(pdf_path, marker_page, marker_top, sol_start_page, sol_start_top)
+        ans_map = parse_answer_key_robust(pdf, marker_page, marker_top, sol_start_page, sol_start_top)
+
+    return questions, solutions, ans_map
+
+def analyze_cached(cache, pdf):
+    """analyze_and_extract(), skipped entirely when this PDF + page range was already parsed."""
+    anchors, extras = cache.load_anchors()
+    if anchors is not None:
+        ans_map = {int(k): v for k, v in extras.get('ans_map', {}).items()}
+        return anchors['questions'], anchors['solutions'], ans_map
 
+    questions, solutions, ans_map = analyze_and_extract(pdf)
+    cache.store_anchors({'questions': questions, 'solutions': solutions}, ans_map=ans_map)
     return questions, solutions, ans_map
 
 # --- 6. RENDERER ---
-def render_list(doc, anchors, output_dir, prefix):
+def render_list(doc, anchors, output_dir, prefix, cache=None, manifest=None):
+    """
+    Questions whose crop rectangle is unchanged since the last run (folder manifest or cache) are not re-rendered.
+    Each finished question is checkpointed in the manifest, so an interrupted chapter resumes mid-way.
+    Cleaning + PNG encoding run on the encoder pool; returns after every file is written.
+    """
     count = 0
+    encoder = EncoderPool()
     p0 = doc[0]
     page_h = p0.rect.height
     page_w = p0.rect.width
@@ -352,7 +305,7 @@ def render_list(doc, anchors, output_dir, prefix):
     # TQDM Progress Bar (Added leave=True)
     for i, start in tqdm(enumerate(anchors), total=len(anchors), desc=f"Rendering {prefix}", leave=True):
         try:
-            limit_bottom = page_h * 0.95
+            limit_bottom = page_h * FOOTER_RATIO
             for j in range(i + 1, len(anchors)):
                 nxt = anchors[j]
                 if nxt['page'] == start['page']:
@@ -365,19 +318,33 @@ def render_list(doc, anchors, output_dir, prefix):
             if start['x0'] < mid: x1, x2 = 0, mid
             else: x1, x2 = mid, page_w
 
+            name = f"{prefix}_{start['q_num']}.png"
+            out_path = os.path.join(output_dir, name)
+            geometry = (start['page'], x1, start['top']-2, x2, limit_bottom)
+            done = manifest is not None and manifest.is_done(name, geometry, out_path, CACHE_RENDER_PARAMS)
+            if not done and cache is not None and cache.lookup(name, geometry, out_path) is not None:
+                done = True
+                if manifest is not None:
+                    manifest.record(name, geometry, out_path, CACHE_RENDER_PARAMS, q_num=start['q_num'])
+            if done:
+                count += 1
+                continue
+
             rect = fitz.Rect(x1, start['top']-2, x2, limit_bottom)
             page = doc[start['page']]
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72), clip=rect, alpha=False)
+            zoom = RENDER_DPI / 72
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=rect, alpha=False)
             
             if pix.width > 10 and pix.height > 10:
                 img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                img = trim_whitespace(img)
-                # Smart Clean (Watermark + Bottom Strip + Number Trim)
-                img = process_image_smart(img)
-                img = compress_and_clean(img)
-                img.save(os.path.join(output_dir, f"{prefix}_{start['q_num']}.png"))
+                def on_saved(size, name=name, geometry=geometry, path=out_path, q_num=start['q_num']):
+                    if cache is not None: cache.record(name, geometry, path)
+                    if manifest is not None:
+                        manifest.record(name, geometry, path, CACHE_RENDER_PARAMS, q_num=q_num)
+                encoder.save(img, out_path, process=clean_crop, on_saved=on_saved)
                 count += 1
         except: pass
+    count -= len(encoder.close())
     return count
 
 # --- 7. BATCH RUNNER ---
@@ -389,30 +356,34 @@ def run_batch(row_data, source_pdf):
     
     safe_chap = re.sub(r'[^\w\-_\. ]', '_', chapter)
     trimmed_name = f"MTG_{safe_chap}_p{start_p}_p{end_p}"
-    trimmed_path = os.path.join(TRIMMED_DIR, f"{trimmed_name}.pdf")
     
-    if not os.path.exists(trimmed_path):
-        master = os.path.join(RAW_DATA_DIR, source_pdf)
-        if os.path.exists(master):
-            r = PdfReader(master); w = PdfWriter()
-            for i in range(max(0, start_p-1), min(len(r.pages), end_p)): w.add_page(r.pages[i])
-            with open(trimmed_path, "wb") as f: w.write(f)
-        else: return False
-
-    q_list, sol_list, ans_map = analyze_and_extract(trimmed_path)
+    # The book is opened once per run; chapters are page-range views (no trimmed PDF is written)
+    master = os.path.join(RAW_DATA_DIR, source_pdf)
+    if not os.path.exists(master): return False
+    book = open_book(master)
+
+    cache = ExtractionCache(CACHE_DIR, master, 'mtg', page_range=(start_p, end_p), pdf_hash=book.content_hash,
+                            parse_params=CACHE_PARSE_PARAMS, render_params=CACHE_RENDER_PARAMS)
+    with book.chapter(start_p, end_p, source='words') as pdf:
+        q_list, sol_list, ans_map = analyze_cached(cache, pdf)
     
     print(f"      📋 Questions: {len(q_list)} | Solutions: {len(sol_list)}")
 
     out_dir = os.path.join(PROCESSED_BASE, trimmed_name)
     os.makedirs(out_dir, exist_ok=True)
-    doc = fitz.open(trimmed_path)
+    doc = book.chapter(start_p, end_p)
+    manifest = FolderManifest(out_dir)
     
-    render_list(doc, q_list, out_dir, "Q")
-    render_list(doc, sol_list, out_dir, "Sol")
+    render_list(doc, q_list, out_dir, "Q", cache, manifest)
+    render_list(doc, sol_list, out_dir, "Sol", cache, manifest)
+    cache.save()
+    print(f"      ♻️ {cache.summary()}")
     
     rows = []
     with open(CONFIG_PATH, 'r') as f: conf = json.load(f)
-    uid = int(conf.get("last_unique_id", 0))
+    # IDs given out by an interrupted run are reused (from the manifest), never re-allocated
+    uid = max(int(conf.get("last_unique_id", 0)), manifest.max_id())
+    reused = 0
     
     for q in q_list:
         q_num = q['q_num']
@@ -420,13 +391,19 @@ def run_batch(row_data, source_pdf):
         sol = f"Sol_{q_num}.png"
         
         if os.path.exists(os.path.join(out_dir, img)):
-            uid += 1
+            q_uid = manifest.unique_id(img)
+            if q_uid is None:
+                uid += 1
+                q_uid = uid
+                manifest.assign_id(img, q_uid)
+            else:
+                reused += 1
             has_sol = os.path.exists(os.path.join(out_dir, sol))
             raw_ans = ans_map.get(q_num, "")
             clean_ans, q_type = classify_and_clean_answer(raw_ans)
             
             rows.append({
-                'unique_id': uid,
+                'unique_id': q_uid,
                 'Question No.': q_num,
                 'Folder': trimmed_name,
                 'Chapter': chapter,
@@ -450,14 +427,20 @@ def run_batch(row_data, source_pdf):
              if c not in df.columns: df[c] = ""
         df = df[cols]
         
+        # Counter first: the IDs are already checkpointed in the manifest, so a crash below can't reissue them
+        conf["last_unique_id"] = uid
+        with open(CONFIG_PATH, 'w') as f: json.dump(conf, f, indent=4)
+
         if os.path.exists(OUTPUT_CSV_PATH):
-            pd.concat([pd.read_csv(OUTPUT_CSV_PATH), df], ignore_index=True).to_csv(OUTPUT_CSV_PATH, index=False)
+            existing = pd.read_csv(OUTPUT_CSV_PATH)
+            # A resumed chapter reuses its manifest IDs: replace rows a crashed run already appended
+            if 'unique_id' in existing.columns:
+                existing = existing[~pd.to_numeric(existing['unique_id'], errors='coerce').isin(df['unique_id'])]
+            pd.concat([existing, df], ignore_index=True).to_csv(OUTPUT_CSV_PATH, index=False)
         else:
             df.to_csv(OUTPUT_CSV_PATH, index=False)
             
-        conf["last_unique_id"] = uid
-        with open(CONFIG_PATH, 'w') as f: json.dump(conf, f, indent=4)
-        print(f"      💾 Saved {len(rows)} entries.")
+        print(f"      💾 Saved {len(rows)} entries ({reused} IDs reused from manifest).")
         return True
     
     return False
@@ -475,4 +458,5 @@ if __name__ == "__main__":
             if run_batch(r, SOURCE_PDF):
                 indf.at[i, 'isProcessed'] = 'Yes'
                 indf.to_csv(INPUT_CSV_PATH, index=False)
+        close_books()
         print("\n🏁 DONE.")
\ No newline at end of file
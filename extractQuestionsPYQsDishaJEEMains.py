@@ -2,12 +2,13 @@ import os
 import re
 import json
 import pandas as pd
-import pdfplumber
 import fitz  # PyMuPDF
 import cv2   # OpenCV
 import numpy as np
 import logging
-from pypdf import PdfReader, PdfWriter
+from pdfPageRange import open_book, close_books
+from imageEncoderPool import EncoderPool, map_crops
+from imageKernels import number_block_cut, whiten_range, bar_footer_cut
 from PIL import Image, ImageChops, ImageEnhance
 from tqdm import tqdm
 from collections import Counter, defaultdict
@@ -23,10 +24,8 @@ OUTPUT_CSV_PATH = os.path.join(BASE_PATH, 'Question Bank Disha Mains PYQs.csv')
 INPUT_CSV_PATH = os.path.join(BASE_PATH, 'Question Bank Disha Mains PYQs- Inputs.csv')
 
 RAW_DATA_DIR = os.path.join(BASE_PATH, 'raw data')
-TRIMMED_DIR = os.path.join(RAW_DATA_DIR, 'Trimmed_PDFs')
 PROCESSED_BASE = os.path.join(BASE_PATH, 'Processed_Database')
 
-os.makedirs(TRIMMED_DIR, exist_ok=True)
 os.makedirs(PROCESSED_BASE, exist_ok=True)
 
 # --- 2. IMAGE PROCESSING (ULTRA-SAFE MODE) ---
@@ -37,46 +36,23 @@ def process_image_smart(pil_img):
     1. Watermark Removal (Light Grey).
     2. Left Trim (Question Number) - Using Vertical Projection.
     3. Bottom Trim - ULTRA SAFE (Only removes solid black bars).
+    One RGB array end to end: masks, row/column profiles and cut points are NumPy reductions.
     """
     try:
-        # Convert PIL to OpenCV (BGR)
-        img_np = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        height, width, _ = img_np.shape
-        
+        rgb = np.array(pil_img)
+        if rgb.ndim != 3 or rgb.shape[2] != 3: return pil_img
+        height = rgb.shape[0]
+
         # --- A. WATERMARK REMOVAL ---
         # Target light grey backgrounds (210-255)
-        lower_grey = np.array([210, 210, 210], dtype=np.uint8)
-        upper_grey = np.array([255, 255, 255], dtype=np.uint8)
-        mask = cv2.inRange(img_np, lower_grey, upper_grey)
-        img_np[mask > 0] = [255, 255, 255]
+        whiten_range(rgb, 210, 255)
 
         # --- B. SAFE BOTTOM STRIP REMOVAL (Fix for Over-Cropping) ---
         # We only check the BOTTOM 50 pixels.
         # We only cut if we see a SOLID BLACK BAR (>50% density).
         # We do NOT cut based on whitespace gaps anymore.
-        gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
-        
-        crop_bottom = height
-        scan_limit = min(50, int(height * 0.1)) # Only look at very bottom
-        
-        for y in range(height - 1, height - scan_limit, -1):
-            row = binary[y, :]
-            ink_density = np.count_nonzero(row) / width
-            
-            # STRICT: Only cut if it looks like a footer line (>50% ink)
-            if ink_density > 0.50: 
-                crop_bottom = y
-            else:
-                # Stop immediately if it's not a bar. Preserves text.
-                break
-
-        if crop_bottom < height:
-            img_np = img_np[:crop_bottom, :]
-            # Update binary for next step
-            gray = gray[:crop_bottom, :]
-            binary = binary[:crop_bottom, :]
-            height = crop_bottom
+        ink = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY) <= 200
+        crop_bottom = bar_footer_cut(ink, min(50, int(height * 0.1)), density=0.50)
 
         # --- C. QUESTION NUMBER TRIM (Vertical Projection) ---
         SCAN_WIDTH_RATIO = 0.30
@@ -84,63 +60,16 @@ def process_image_smart(pil_img):
         MERGE_GAP_TOLERANCE = 15
         CUT_PADDING = 10
 
-        scan_width = int(width * SCAN_WIDTH_RATIO)
-        
-        # Re-calc projection on the (possibly cropped) binary image
-        projection = np.sum(binary[:, :scan_width], axis=0) / 255
-        has_ink = projection > INK_THRESHOLD
-
-        blocks = []
-        in_block = False
-        start_x = 0
-        
-        x = 0
-        while x < len(has_ink):
-            if has_ink[x]:
-                if not in_block:
-                    in_block = True
-                    start_x = x
-            else:
-                if in_block:
-                    # Look-Ahead logic
-                    is_real_gap = True
-                    look_ahead_range = min(x + MERGE_GAP_TOLERANCE, len(has_ink))
-                    
-                    for k in range(x + 1, look_ahead_range):
-                        if has_ink[k]:
-                            is_real_gap = False
-                            x = k - 1 
-                            break
-                    
-                    if is_real_gap:
-                        in_block = False
-                        end_x = x
-                        if (end_x - start_x) > 3:
-                            blocks.append({'start': start_x, 'end': end_x})
-            x += 1
-            
-        if in_block:
-            end_x = len(has_ink)
-            if (end_x - start_x) > 3:
-                blocks.append({'start': start_x, 'end': end_x})
-
-        # Determine Cut
-        cut_x = 0
-        if len(blocks) >= 2:
-            text_start = blocks[1]['start']
-            number_end = blocks[0]['end']
-            cut_x = max(text_start - CUT_PADDING, number_end + 1)
-        
-        # Apply Left Crop
-        if cut_x > 0:
-            img_np = img_np[:, cut_x:]
-
-        # Return as PIL
-        return Image.fromarray(cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB))
+        cut_x = number_block_cut(ink[:crop_bottom], SCAN_WIDTH_RATIO, INK_THRESHOLD, MERGE_GAP_TOLERANCE, CUT_PADDING)
+        return Image.fromarray(rgb[:crop_bottom, cut_x:])
 
     except Exception:
         return pil_img 
 
+def process_images_smart(images, workers=None):
+    """Batch form of process_image_smart over a list of crops (order kept)."""
+    return map_crops(process_image_smart, images, workers) 
+
 def compress_and_clean(img):
     try:
         img = img.convert('L')
@@ -162,6 +91,12 @@ def trim_whitespace(im):
         return im
     except: return im
 
+def clean_crop(img):
+    """Full post-processing of one rendered crop (runs on the encoder pool)."""
+    img = trim_whitespace(img)
+    img = process_image_smart(img) # Safe Bottom + Left Trim
+    return compress_and_clean(img) # Quality
+
 def is_bold_font(fontname):
     fn = fontname.lower()
     return 'bold' in fn or 'bd' in fn or 'black' in fn or 'medi' in fn or '+b' in fn
@@ -178,79 +113,81 @@ def classify_and_clean_answer(raw_text):
     except: pass
     return raw_text, "Subjective"
 
-def extract_answers_from_solutions(pdf_path, solution_anchors):
+def extract_answers_from_solutions(pages, solution_anchors):
+    """pages: chapter PageRange over the book's pdfplumber pages."""
     print(f"      🔑 Extracting Answers from Solutions...")
     ans_map = {}
     if not solution_anchors: return ans_map
 
-    with pdfplumber.open(pdf_path) as pdf:
-        anchors_by_page = defaultdict(list)
-        for a in solution_anchors:
-            anchors_by_page[a['page']].append(a)
+    anchors_by_page = defaultdict(list)
+    for a in solution_anchors:
+        anchors_by_page[a['page']].append(a)
 
-        for p_idx, anchors in anchors_by_page.items():
-            page = pdf.pages[p_idx]
-            words = page.extract_words(keep_blank_chars=False)
+    for p_idx, anchors in anchors_by_page.items():
+        page = pages[p_idx]
+        words = page.extract_words(keep_blank_chars=False)
+        page.flush_cache()
+        
+        for anchor in anchors:
+            candidates = []
+            for w in words:
+                # Look right of anchor
+                if w['x0'] > anchor['x1'] and \
+                   abs(w['top'] - anchor['top']) < 5 and \
+                   w['x0'] < (anchor['x1'] + 100):
+                    candidates.append(w['text'])
             
-            for anchor in anchors:
-                candidates = []
-                for w in words:
-                    # Look right of anchor
-                    if w['x0'] > anchor['x1'] and \
-                       abs(w['top'] - anchor['top']) < 5 and \
-                       w['x0'] < (anchor['x1'] + 100):
-                        candidates.append(w['text'])
-                
-                if candidates:
-                    line_start = "".join(candidates[:2]) 
-                    match = re.search(r'\((?P<ans>[a-zA-Z0-9\.]+)\)', line_start)
-                    if match:
-                        ans_map[anchor['q_num']] = match.group('ans')
+            if candidates:
+                line_start = "".join(candidates[:2]) 
+                match = re.search(r'\((?P<ans>[a-zA-Z0-9\.]+)\)', line_start)
+                if match:
+                    ans_map[anchor['q_num']] = match.group('ans')
     return ans_map
 
 # --- 4. ROBUST STRUCTURE ANALYSIS (SEQUENTIAL SPLIT) ---
 
-def analyze_and_extract(pdf_path):
-    print(f"   🔍 Scanning Structure: {os.path.basename(pdf_path)}")
+def analyze_and_extract(pages, label):
+    """pages: chapter PageRange over the book's pdfplumber pages (page indices are chapter-relative)."""
+    print(f"   🔍 Scanning Structure: {label}")
     all_raw_anchors = []
     sol_header_page = -1
     
-    with pdfplumber.open(pdf_path) as pdf:
-        page_count = len(pdf.pages)
-        for p_idx, page in enumerate(pdf.pages):
-            height = page.height
-            text = page.extract_text() or ""
+    page_count = len(pages)
+    for p_idx, page in enumerate(pages):
+        height = page.height
+        text = page.extract_text() or ""
+        
+        # Header Check
+        if sol_header_page == -1:
+            if re.search(r'(HINTS|ANSWERS|SOLUTIONS|EXPLANATIONS)\s*(&|and)?\s*(SOLUTIONS|KEY)?', text, re.IGNORECASE):
+                if p_idx > (page_count * 0.2): 
+                    sol_header_page = p_idx
+                    print(f"      📍 'SOLUTIONS' Header found at Page {p_idx+1}")
+
+        # ANCHOR HARVESTING
+        words = page.extract_words(keep_blank_chars=False, extra_attrs=["fontname"])
+        page.flush_cache()  # The book stays open all run: don't keep every page's layout in memory
+        for w in words:
+            if w['top'] < 50 or w['bottom'] > (height - 50): continue
             
-            # Header Check
-            if sol_header_page == -1:
-                if re.search(r'(HINTS|ANSWERS|SOLUTIONS|EXPLANATIONS)\s*(&|and)?\s*(SOLUTIONS|KEY)?', text, re.IGNORECASE):
-                    if p_idx > (page_count * 0.2): 
-                        sol_header_page = p_idx
-                        print(f"      📍 'SOLUTIONS' Header found at Page {p_idx+1}")
-
-            # ANCHOR HARVESTING
-            words = page.extract_words(keep_blank_chars=False, extra_attrs=["fontname"])
-            for w in words:
-                if w['top'] < 50 or w['bottom'] > (height - 50): continue
+            if is_bold_font(w['fontname']):
+                text = w['text'].strip()
+                
+                # --- STRICT LENGTH CHECK ---
+                if len(text) >= 7: continue 
                 
-                if is_bold_font(w['fontname']):
-                    text = w['text'].strip()
-                    
-                    # --- STRICT LENGTH CHECK ---
-                    if len(text) >= 7: continue 
-                    
-                    # --- STRICT REGEX MATCH (1., 2.) ---
-                    if re.match(r'^(?:Q[\.\s]?)?(\d+)[\.:]?$', text, re.IGNORECASE):
-                        num = int(re.findall(r'\d+', text)[0])
-                        if 0 < num < 300:
-                            all_raw_anchors.append({
-                                'q_num': num, 
-                                'page': p_idx, 
-                                'top': w['top'], 
-                                'x0': w['x0'], 
-                                'x1': w['x1'], 
-                                'bottom': w['bottom']
-                            })
+                # --- STRICT REGEX MATCH (1., 2.) ---
+                if re.match(r'^(?:Q[\.\s]?)?(\d+)[\.:]?$', text, re.IGNORECASE):
+                    num = int(re.findall(r'\d+', text)[0])
+                    if 0 < num < 300:
+                        all_raw_anchors.append({
+                            'q_num': num, 
+                            'page': p_idx, 
+                            'top': w['top'], 
+                            'x0': w['x0'], 
+                            'x1': w['x1'], 
+                            'bottom': w['bottom']
+                        })
 
     # --- SEQUENTIAL SPLIT LOGIC ---
     # We find the *One True Split Point* in the master list.
@@ -289,14 +226,16 @@ def analyze_and_extract(pdf_path):
 
     ans_map = {}
     if solutions:
-        ans_map = extract_answers_from_solutions(pdf_path, solutions)
+        ans_map = extract_answers_from_solutions(pages, solutions)
 
     return questions, solutions, ans_map
 
 # --- 5. RENDERER (ANCHOR-LOCKED) ---
 
 def render_list(doc, anchors, output_dir, prefix):
+    """Cleaning + PNG encoding run on the encoder pool; returns after every file is written."""
     count = 0
+    encoder = EncoderPool()
     p0 = doc[0]
     page_h = p0.rect.height
     page_w = p0.rect.width
@@ -341,15 +280,10 @@ def render_list(doc, anchors, output_dir, prefix):
             
             if pix.width > 10 and pix.height > 10:
                 img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                
-                # PIPELINE
-                img = trim_whitespace(img)
-                img = process_image_smart(img) # Safe Bottom + Left Trim
-                img = compress_and_clean(img) # Quality
-                
-                img.save(os.path.join(output_dir, fname))
+                encoder.save(img, os.path.join(output_dir, fname), process=clean_crop)
                 count += 1
         except: pass
+    count -= len(encoder.close())
     return count
 
 # --- 6. BATCH RUNNER ---
@@ -362,24 +296,20 @@ def run_batch(row_data, source_pdf):
     
     safe_chap = re.sub(r'[^\w\-_\. ]', '_', chapter)
     trimmed_name = f"Disha_{safe_chap}_p{start_p}_p{end_p}"
-    trimmed_path = os.path.join(TRIMMED_DIR, f"{trimmed_name}.pdf")
     
-    if not os.path.exists(trimmed_path):
-        master = os.path.join(RAW_DATA_DIR, source_pdf)
-        if os.path.exists(master):
-            r = PdfReader(master); w = PdfWriter()
-            for i in range(max(0, start_p-1), min(len(r.pages), end_p)): w.add_page(r.pages[i])
-            with open(trimmed_path, "wb") as f: w.write(f)
-        else: return False
-
-    q_list, sol_list, ans_map = analyze_and_extract(trimmed_path)
+    # The book is opened once per run; chapters are page-range views (no trimmed PDF is written)
+    master = os.path.join(RAW_DATA_DIR, source_pdf)
+    if not os.path.exists(master): return False
+    book = open_book(master)
+
+    q_list, sol_list, ans_map = analyze_and_extract(book.chapter(start_p, end_p, source='plumber'), trimmed_name)
     
     print(f"      📋 Questions: {len(q_list)} | Solutions: {len(sol_list)}")
     print(f"      🔑 Answer Keys Found: {len(ans_map)}")
 
     out_dir = os.path.join(PROCESSED_BASE, trimmed_name)
     os.makedirs(out_dir, exist_ok=True)
-    doc = fitz.open(trimmed_path)
+    doc = book.chapter(start_p, end_p)
     
     render_list(doc, q_list, out_dir, "Q")
     render_list(doc, sol_list, out_dir, "Sol")
@@ -455,4 +385,5 @@ if __name__ == "__main__":
             if run_batch(r, SOURCE_PDF):
                 indf.at[i, 'isProcessed'] = 'Yes'
                 indf.to_csv(INPUT_CSV_PATH, index=False)
+        close_books()
         print("\n🏁 DONE.")
\ No newline at end of file
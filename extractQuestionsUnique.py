@@ -1,11 +1,14 @@
 import os
 import re
 import json
-import numpy as np
 import pandas as pd
-import pdfplumber
-from pdf2image import convert_from_path
-from PIL import Image, ImageChops, ImageOps
+from pdfWordIndex import ParsedPdf
+from anchorDetection import match_tokens, token_numbers, sequence_window_mask
+import fitz  # PyMuPDF
+from pdfSegmentRenderer import render_clip
+from imageKernels import to_gray, column_profile, gap_cut
+from imageThresholds import whiten_above
+from PIL import Image, ImageChops
 from tqdm import tqdm
 
 # --- 1. CONFIGURATION ---
@@ -27,28 +30,10 @@ def pixel_sensitive_crop(img):
     Applies ONLY to the top part of the question.
     """
     try:
-        inverted_img = ImageOps.invert(img.convert('L'))
-        data = np.array(inverted_img)
-        horizontal_projection = np.sum(data, axis=0)
-        width = len(horizontal_projection)
-        
-        crop_x, whitespace_count, in_number_block = 0, 0, False
-        
-        # Scan left-to-right to find the gap after "1." or "25."
-        for x in range(5, width):
-            if horizontal_projection[x] > 500: # Ink detected
-                in_number_block = True
-                whitespace_count = 0
-            elif in_number_block:
-                whitespace_count += 1
-                if whitespace_count >= 15: # Gap detected
-                    crop_x = x - whitespace_count + 2
-                    break
-        
-        # Safety: Don't crop if detection is too wide (>30%)
-        if crop_x == 0 or crop_x > (width * 0.30): 
-            crop_x = int(width * 0.05)
-            
+        # Gap of >= 15 blank columns after "1." or "25."; safety: don't crop past 30% (fallback 5%)
+        width = img.size[0]
+        crop_x = gap_cut(column_profile(to_gray(img)), ink_threshold=500, min_gap=15, start=5, offset=2,
+                         max_ratio=0.30, fallback_ratio=0.05)
         return img.crop((crop_x, 0, width, img.size[1]))
     except:
         return img
@@ -63,8 +48,7 @@ def trim_whitespace(im):
     except: return im
 
 def compress_and_clean(img):
-    gray = img.convert('L')
-    return gray.point(lambda p: 255 if p > 190 else p)
+    return whiten_above(img, 'unique')
 
 def stitch_images(img1, img2):
     """Vertically concatenates two images."""
@@ -81,36 +65,31 @@ def stitch_images(img1, img2):
 
 # --- 3. PARSING LOGIC ---
 
-def extract_answer_key(pdf_path):
+def extract_answer_key(doc):
+    """doc: ParsedPdf (shared with the anchor scan and text extraction)."""
     ans_map = {}
     print("🔍 Scanning for Answer Key...")
-    with pdfplumber.open(pdf_path) as pdf:
-        start_check = max(0, len(pdf.pages) - 3)
-        for i in range(start_check, len(pdf.pages)):
-            text = pdf.pages[i].extract_text() or ""
-            matches = re.findall(r'(\d+)\.\s*\(([^)]+)\)', text)
-            for q_num, ans_val in matches:
-                ans_map[int(q_num)] = ans_val.strip()
+    start_check = max(0, len(doc) - 3)
+    for i in range(start_check, len(doc)):
+        text = doc.page(i).extract_text() or ""
+        matches = re.findall(r'(\d+)\.\s*\(([^)]+)\)', text)
+        for q_num, ans_val in matches:
+            ans_map[int(q_num)] = ans_val.strip()
     return ans_map
 
 def find_anchors_on_page(page, p_idx, last_q_num):
+    """page: PageWords from ParsedPdf. Number, sequence and column tests run as array masks."""
     width = page.width
     mid_line = width / 2
-    words = page.extract_words()
-    candidates = []
-    
-    for w in words:
-        text = w['text'].strip()
-        if re.match(r'^\d+\.$', text):
-            try:
-                num = int(text.replace('.', ''))
-                # Strict Sequence: e.g., 1, 2... or jump < 50
-                if (num == 1) or (0 < (num - last_q_num) < 50):
-                    candidates.append({
-                        'q_num': num, 'top': w['top'], 'bottom': w['bottom'],
-                        'x0': w['x0'], 'page': p_idx
-                    })
-            except: pass
+
+    idx, matches = match_tokens(page.text, r'(?P<num>[0-9]+)\.')
+    nums = token_numbers(matches)
+    # Strict Sequence: e.g., 1, 2... or jump < 50
+    keep = sequence_window_mask(nums, last_q_num, 50)
+    candidates = [{
+        'q_num': int(nums[k]), 'top': page.top[i], 'bottom': page.bottom[i],
+        'x0': page.x0[i], 'page': p_idx
+    } for k, i in enumerate(idx) if keep[k]]
 
     # Assign Columns
     anchors = []
@@ -125,20 +104,19 @@ def find_anchors_on_page(page, p_idx, last_q_num):
     new_last = max([a['q_num'] for a in anchors]) if anchors else last_q_num
     return anchors, new_last
 
-def parse_document_structure(pdf_path):
+def parse_document_structure(doc):
     structure = []
     last_q_num = 0
     print("🔍 Global Document Scan...")
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for p_idx, page in enumerate(pdf.pages):
-            header = page.within_bbox((0, 0, page.width, page.height*0.2)).extract_text() or ""
-            if "ANSWER KEY" in header.upper():
-                print(f"   🛑 Answer Key found on Page {p_idx+1}. Stopping.")
-                break
-            
-            page_anchors, last_q_num = find_anchors_on_page(page, p_idx, last_q_num)
-            structure.extend(page_anchors)
+    for p_idx, page in enumerate(doc.pages):
+        header = page.text_in_bbox((0, 0, page.width, page.height*0.2), mode='within')
+        if "ANSWER KEY" in header.upper():
+            print(f"   🛑 Answer Key found on Page {p_idx+1}. Stopping.")
+            break
+        
+        page_anchors, last_q_num = find_anchors_on_page(page, p_idx, last_q_num)
+        structure.extend(page_anchors)
     return structure
 
 # --- 4. MAIN EXTRACTION ROUTINE ---
@@ -147,9 +125,10 @@ def run_extraction():
     if not os.path.exists(full_pdf_path):
         print(f"❌ File not found: {full_pdf_path}"); return
 
-    # 1. Parsing
-    ans_key = extract_answer_key(full_pdf_path)
-    anchors = parse_document_structure(full_pdf_path)
+    # 1. Parsing (the PDF's words are extracted once and reused below)
+    pdf = ParsedPdf(full_pdf_path)
+    ans_key = extract_answer_key(pdf)
+    anchors = parse_document_structure(pdf)
     print(f"   ✅ Identified {len(anchors)} Questions.")
 
     # 2. Setup
@@ -157,9 +136,8 @@ def run_extraction():
     output_dir = os.path.join(PROCESSED_BASE, folder_name)
     os.makedirs(output_dir, exist_ok=True)
     
-    print("🖼️ Converting PDF to Images (High Res)...")
-    pdf_images = convert_from_path(full_pdf_path, dpi=300)
-    scale = 300 / 72
+    # Question rectangles are rendered on demand (PyMuPDF clip), no full-page bitmaps
+    doc = fitz.open(full_pdf_path)
     
     curr_id = 0
     if os.path.exists(CONFIG_PATH):
@@ -169,7 +147,7 @@ def run_extraction():
     rows = []
     print("✂️ Cropping, Stitching & Extracting...")
 
-    with pdfplumber.open(full_pdf_path) as pdf:
+    with pdf:
         for i, start in tqdm(enumerate(anchors), total=len(anchors)):
             try:
                 # --- IDENTIFY NEXT ANCHOR & SPLIT ---
@@ -192,13 +170,13 @@ def run_extraction():
                 if p1_bottom <= start['top']: p1_bottom = start['top'] + 100 # Safety
 
                 # Text 1
-                t1 = p1_page.within_bbox((start['col_x'], start['top']-5, 
-                                          start['col_x']+start['col_w'], p1_bottom)).extract_text() or ""
+                t1 = p1_page.text_in_bbox((start['col_x'], start['top']-5, 
+                                           start['col_x']+start['col_w'], p1_bottom), mode='within')
                 
                 # Image 1
-                im1 = pdf_images[start['page']].crop((
-                    start['col_x'] * scale, (start['top']-5) * scale,
-                    (start['col_x'] + start['col_w']) * scale, p1_bottom * scale
+                im1 = render_clip(doc, start['page'], (
+                    start['col_x'], start['top']-5,
+                    start['col_x'] + start['col_w'], p1_bottom
                 ))
                 # Remove Number from Part 1
                 im1 = pixel_sensitive_crop(im1)
@@ -220,12 +198,12 @@ def run_extraction():
                         
                         if p2_bottom > p2_top + 10: # Only if there is content
                             # Text 2
-                            t2 = p2_page.within_bbox((p2_col_x, p2_top, 
-                                                      p2_col_x+p2_col_w, p2_bottom)).extract_text() or ""
+                            t2 = p2_page.text_in_bbox((p2_col_x, p2_top, 
+                                                       p2_col_x+p2_col_w, p2_bottom), mode='within')
                             # Image 2
-                            im2 = pdf_images[p2_page_idx].crop((
-                                p2_col_x * scale, p2_top * scale,
-                                (p2_col_x+p2_col_w) * scale, p2_bottom * scale
+                            im2 = render_clip(doc, p2_page_idx, (
+                                p2_col_x, p2_top,
+                                p2_col_x+p2_col_w, p2_bottom
                             ))
                             parts.append((t2, im2))
 
@@ -262,6 +240,7 @@ def run_extraction():
 
             except Exception as e:
                 print(f"⚠️ Error Q{start.get('q_num')}: {e}")
+    doc.close()
 
     # --- 5. POST-PROCESSING (Merged) ---
     if rows:
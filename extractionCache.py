@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+
+# --- CONFIGURATION ---
+CACHE_VERSION = 1       # Bump to invalidate every cache file (format change)
+CACHE_DIR_NAME = '.extraction_cache'
+GEOMETRY_DECIMALS = 2   # Crop rectangles are compared at 0.01 pt
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content (streamed, so large PDFs are fine)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(*parts):
+    """Stable SHA-256 key of any JSON-serializable parts."""
+    blob = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def round_geometry(geometry):
+    """Rounds nested rect / segment lists so float noise doesn't change the key."""
+    if isinstance(geometry, (list, tuple)):
+        return [round_geometry(g) for g in geometry]
+    if isinstance(geometry, float):
+        return round(geometry, GEOMETRY_DECIMALS)
+    return geometry
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache for one extraction (one PDF page range, one extractor profile).
+
+      doc key   = (PDF hash, page range, profile)            -> cache file
+      parse key = (parse params)                             -> anchor list + extras (answer key, text...)
+      item key  = (doc key, crop geometry, render params)    -> output file name + its hash
+
+    A re-run skips parsing if the parse key matches, and skips rendering every question whose
+    item key matches and whose output file is still on disk unchanged. Parse params never reach
+    the item keys: changing e.g. the footer cutoff re-parses the anchors, but only the questions
+    whose rectangles moved are rendered again.
+
+    NOTE: the cache is JSON, so dict keys in extras come back as strings.
+
+    Usage:
+        cache = ExtractionCache(cache_dir, pdf_path, 'mtg', page_range=(5, 20), render_params={'dpi': 300})
+        anchors, extras = cache.load_anchors()
+        if anchors is None:
+            anchors = ...; cache.store_anchors(anchors, ans_map=...)
+        for q in anchors:
+            if cache.lookup(name, rect, out_path) is None:
+                ...render + save...; cache.record(name, rect, out_path)
+        cache.save()
+    """
+
+    def __init__(self, cache_dir, pdf_path, profile, page_range=None, parse_params=None, render_params=None,
+                 pdf_hash=None):
+        # pdf_hash: pass a precomputed hash when many page ranges of one book share a run
+        self.profile = profile
+        self.pdf_hash = pdf_hash or file_hash(pdf_path)
+        self.doc_key = make_key(CACHE_VERSION, self.pdf_hash, page_range, profile)
+        self.parse_key = make_key(parse_params)
+        self.render_params = render_params or {}
+        self.path = os.path.join(cache_dir, f"{profile}_{self.doc_key[:24]}.json")
+        self.hits = 0
+        self.misses = 0
+        self._data = {'doc_key': self.doc_key, 'parse_key': None, 'anchors': None, 'extras': {}, 'items': {}}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if data.get('doc_key') == self.doc_key: self._data = data
+            except Exception:
+                pass  # Corrupt cache file: start fresh
+
+    # --- Anchors (document level) ---
+
+    def load_anchors(self):
+        """Returns (anchors, extras), or (None, None) if this document was never parsed with these parse params."""
+        if self._data['anchors'] is None or self._data.get('parse_key') != self.parse_key: return None, None
+        return self._data['anchors'], self._data['extras']
+
+    def store_anchors(self, anchors, **extras):
+        self._data['parse_key'] = self.parse_key
+        self._data['anchors'] = anchors
+        self._data['extras'] = extras
+
+    # --- Outputs (question level) ---
+
+    def item_key(self, geometry):
+        return make_key(self.doc_key, round_geometry(geometry), self.render_params)
+
+    def lookup(self, name, geometry, output_path):
+        """
+        Returns the recorded metadata dict if `name` was rendered from the same geometry and
+        render params and output_path still has the recorded hash. Otherwise None.
+        """
+        entry = self._data['items'].get(name)
+        fresh = (entry is not None and entry['key'] == self.item_key(geometry)
+                 and os.path.exists(output_path) and file_hash(output_path) == entry['hash'])
+        if fresh:
+            self.hits += 1
+            return entry.get('meta', {})
+        self.misses += 1
+        return None
+
+    def record(self, name, geometry, output_path, **meta):
+        self._data['items'][name] = {
+            'key': self.item_key(geometry),
+            'geometry': round_geometry(geometry),
+            'file': os.path.basename(output_path),
+            'hash': file_hash(output_path),
+            'meta': meta,
+        }
+
+    def forget(self, name):
+        self._data['items'].pop(name, None)
+
+    def save(self):
+        """Atomic write (temp file + rename) so an interrupted run never leaves a broken cache."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return f"cache: {self.hits} reused, {self.misses} rendered"
@@ -0,0 +1,86 @@
+import os
+import json
+import threading
+from extractionCache import file_hash, make_key, round_geometry
+
+# --- CONFIGURATION ---
+MANIFEST_NAME = '_manifest.jsonl'
+
+
+class FolderManifest:
+    """
+    Append-only checkpoint journal of one output folder (one JSON line per event):
+        {'name': 'Q_12.png', 'q_num': 12, 'geometry': [...], 'file': ..., 'hash': ..., 'params': ..., 'unique_id': 4711}
+        {'id_block': [start, slots]}        # unique_ids start+1 .. start+slots belong to this folder
+    Every line is flushed + fsynced as soon as a question completes, so a crash loses at most
+    the question being written. On open the journal is replayed (last line per name wins;
+    a half-written last line is ignored).
+
+    Usage:
+        manifest = FolderManifest(out_dir)
+        if not manifest.is_done(name, geometry, out_path, params):
+            ...render + save...
+            manifest.record(name, geometry, out_path, params, q_num=12, unique_id=4711)
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()   # record() is called from encoder-pool threads
+        self.entries = {}
+        self.id_block = None
+        os.makedirs(folder, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: entry = json.loads(line)
+                    except ValueError: continue  # Torn write from a crash
+                    self._apply(entry)
+
+    def _apply(self, entry):
+        if 'id_block' in entry:
+            self.id_block = tuple(entry['id_block'])
+        elif 'name' in entry:
+            merged = dict(self.entries.get(entry['name'], {}))
+            merged.update(entry)
+            self.entries[entry['name']] = merged
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    # --- Questions ---
+
+    def is_done(self, name, geometry, output_path, params=None):
+        """True if `name` was saved from the same geometry + params and the file is unchanged on disk."""
+        entry = self.entries.get(name)
+        return (entry is not None and 'hash' in entry
+                and entry.get('geometry') == round_geometry(geometry)
+                and entry.get('params') == make_key(params)
+                and os.path.exists(output_path) and file_hash(output_path) == entry['hash'])
+
+    def record(self, name, geometry, output_path, params=None, **fields):
+        entry = {'name': name, 'geometry': round_geometry(geometry), 'file': os.path.basename(output_path),
+                 'hash': file_hash(output_path), 'params': make_key(params)}
+        entry.update(fields)
+        self._append(entry)
+
+    def unique_id(self, name):
+        entry = self.entries.get(name)
+        return None if entry is None else entry.get('unique_id')
+
+    def assign_id(self, name, unique_id):
+        self._append({'name': name, 'unique_id': int(unique_id)})
+
+    def max_id(self):
+        ids = [e['unique_id'] for e in self.entries.values() if e.get('unique_id') is not None]
+        if self.id_block: ids.append(self.id_block[0] + self.id_block[1])
+        return max(ids) if ids else 0
+
+    # --- ID block ---
+
+    def set_id_block(self, id_start, id_slots):
+        self._append({'id_block': [int(id_start), int(id_slots)]})
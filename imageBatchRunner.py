@@ -0,0 +1,140 @@
+import os
+import csv
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+
+# --- CONFIGURATION ---
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Leave one core for the OS / tqdm
+CHUNKS_PER_WORKER = 4   # More chunks than workers so a slow folder doesn't leave cores idle
+MAX_CHUNK_SIZE = 64
+
+
+def discover_files(root_dir, extensions=('.png',), folder_filter=None, file_filter=None):
+    """
+    Recursive walk of root_dir. Returns a sorted list of file paths whose extension is in
+    `extensions`, optionally filtered by folder_filter(folder_name) and file_filter(filename).
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    found = []
+    for root, _, files in os.walk(root_dir):
+        if folder_filter is not None and not folder_filter(os.path.basename(root)): continue
+        for f in files:
+            if f.lower().endswith(extensions) and (file_filter is None or file_filter(f)):
+                found.append(os.path.join(root, f))
+    return sorted(found)
+
+
+def _normalize(result):
+    if result is None: return {'status': 'Done'}
+    if isinstance(result, str): return {'status': result}
+    result = dict(result)
+    result.setdefault('status', 'Done')
+    return result
+
+
+def _process_chunk(worker, paths, dry_run, worker_kwargs):
+    """Runs in a pool process. One bad file never takes its chunk down."""
+    results = []
+    for path in paths:
+        try:
+            result = _normalize(worker(path, dry_run=dry_run, **worker_kwargs))
+        except Exception as e:
+            result = {'status': 'Error', 'error': str(e)}
+        results.append((path, result))
+    return results
+
+
+class BatchReport:
+    """
+    Results of one batch, in input order.
+        report.counts            Counter of statuses ('Error: ...' statuses count as 'Error')
+        report.rows(status)      result dicts (with 'path'), optionally of one status
+        report.errors            [(path, message)]
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.results = []
+        self.counts = Counter()
+        self.errors = []
+
+    def add(self, path, result):
+        status = result['status']
+        if status.startswith('Error'):
+            self.counts['Error'] += 1
+            self.errors.append((path, result.get('error', status)))
+        else:
+            self.counts[status] += 1
+        self.results.append((path, result))
+
+    def rows(self, status=None):
+        return [dict(result, path=path) for path, result in self.results
+                if status is None or result['status'] == status]
+
+    def total(self, field):
+        return sum(result.get(field) or 0 for _, result in self.results)
+
+    def write_errors(self, csv_path):
+        """Writes processing_errors.csv-style logs. Returns False (and writes nothing) if there were no errors."""
+        if not self.errors: return False
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["File Path", "Error Message"])
+            writer.writerows(self.errors)
+        return True
+
+    def write_rows(self, csv_path, fieldnames, status=None, rows=None):
+        """Writes result rows (or pre-built `rows`) as a stats CSV. Returns the row count."""
+        if rows is None: rows = self.rows(status)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+
+def run_batch(files, worker, workers=None, chunk_size=None, dry_run=False, desc="Processing", unit="img",
+              **worker_kwargs):
+    """
+    Shards `files` across a process pool in chunks and aggregates the results.
+
+    worker(path, dry_run=False, **worker_kwargs) must be a module-level function (it is pickled)
+    and returns a status string or a dict with 'status' plus any stats fields. With dry_run=True
+    it must compute its result without writing any file. Exceptions become 'Error' results.
+
+    workers=1 runs in-process (no pool), which is easiest to debug.
+    Scripts calling this must guard their entry point with `if __name__ == "__main__":`
+    (Windows starts pool workers by re-importing the script).
+    """
+    workers = int(workers or DEFAULT_WORKERS)
+    report = BatchReport(dry_run)
+    if not files: return report
+    if chunk_size is None:
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, len(files) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    if dry_run: desc = f"{desc} (dry run)"
+
+    chunk_results = [None] * len(chunks)
+    with tqdm(total=len(files), desc=desc, unit=unit) as pbar:
+        if workers == 1:
+            for i, chunk in enumerate(chunks):
+                chunk_results[i] = _process_chunk(worker, chunk, dry_run, worker_kwargs)
+                pbar.update(len(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_process_chunk, worker, chunk, dry_run, worker_kwargs): i
+                           for i, chunk in enumerate(chunks)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        chunk_results[i] = future.result()
+                    except Exception as e:  # Worker process died (e.g. out of memory)
+                        chunk_results[i] = [(path, {'status': 'Error', 'error': f"Worker failed: {e}"})
+                                            for path in chunks[i]]
+                    pbar.update(len(chunks[i]))
+
+    for results in chunk_results:
+        for path, result in results:
+            report.add(path, result)
+    return report
@@ -1,7 +1,18 @@
 import os
-import csv
+import io
+import json
+from collections import defaultdict
 from PIL import Image
-from tqdm import tqdm
+from imageBatchRunner import run_batch
+from extractionCache import file_hash
+from imageThresholds import threshold_for, whiten_above
+
+# --- CONFIGURATION ---
+WORKERS = None     # None = all cores but one; 1 = single process
+DRY_RUN = False    # True: measure the savings in memory without writing Compressed/
+STATS_FIELDS = ['folder', 'filename', 'orig_kb', 'new_kb', 'savings_pct']
+MANIFEST_NAME = '_compression_manifest.json'   # Lives in Compressed/
+PIPELINE_VERSION = 'gray-threshold-v1'         # Bump after changing compress_image() to recompress everything
 
 def get_all_folders(base_dir, exclude_folder="Compressed"):
     """
@@ -23,7 +34,84 @@ def get_all_folders(base_dir, exclude_folder="Compressed"):
             
     return folders
 
-def clean_and_compress_all(noise_threshold=170):
+# --- MANIFEST ---
+# {'params': {...}, 'files': {'<folder>/<file>': {'size', 'mtime_ns', 'hash', 'out_size', 'out_hash'}}}
+# A source is re-compressed only if its stat changed AND its content hash changed (a re-saved
+# Review & QC crop changes both), if the params changed, or if its output went missing.
+
+def load_manifest(manifest_path, params):
+    """Returns the manifest's file entries, or {} if there is none or it was built with other params."""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('params') == params else {}
+
+def save_manifest(manifest_path, params, entries):
+    """Atomic write (temp file + rename), same as ExtractionCache.save()."""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'params': params, 'files': entries}, f)
+    os.replace(tmp_path, manifest_path)
+
+def is_up_to_date(entry, file_path, save_path):
+    """
+    Cheap check first (size + mtime of source, size of output); hashes the source only
+    when its stat changed. Returns (up_to_date, refreshed_entry_or_None).
+    """
+    if entry is None or not os.path.exists(save_path): return False, None
+    if os.path.getsize(save_path) != entry.get('out_size'): return False, None
+    st = os.stat(file_path)
+    if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']: return True, None
+    if st.st_size == entry['size'] and file_hash(file_path) == entry['hash']:
+        # Touched / copied but identical content: just refresh the stat
+        return True, dict(entry, mtime_ns=st.st_mtime_ns)
+    return False, None
+
+def compress_image(file_path, dry_run=False, output_dir=None, noise_threshold=None):
+    """Worker: smart-grayscale compression of one PNG into output_dir/<folder>/<filename>."""
+    folder_name = os.path.basename(os.path.dirname(file_path))
+    filename = os.path.basename(file_path)
+    save_path = os.path.join(output_dir, folder_name, filename)
+
+    # 1. Capture Original Size (stat before reading, so a crop re-saved mid-run is picked up next run)
+    st = os.stat(file_path)
+    orig_size = st.st_size
+    src_hash = file_hash(file_path)
+
+    # 2. Compress (Smart Grayscale)
+    with Image.open(file_path) as img:
+        # Smart Thresholding (precomputed lookup table)
+        cleaned = whiten_above(img, noise_threshold)
+        if dry_run:
+            buffer = io.BytesIO()
+            cleaned.save(buffer, "PNG", optimize=True)
+            new_size = buffer.tell()
+        else:
+            cleaned.save(save_path, "PNG", optimize=True)
+
+    # 3. Capture New Size
+    if not dry_run: new_size = os.path.getsize(save_path)
+    out_hash = None if dry_run else file_hash(save_path)
+
+    # 4. Log Data
+    savings_pct = ((orig_size - new_size) / orig_size) * 100 if orig_size > 0 else 0
+    return {
+        'status': 'Compressed',
+        'folder': folder_name,
+        'filename': filename,
+        'orig_bytes': orig_size,
+        'new_bytes': new_size,
+        'orig_kb': round(orig_size / 1024, 2),
+        'new_kb': round(new_size / 1024, 2),
+        'savings_pct': round(savings_pct, 2),
+        'manifest_entry': {'size': orig_size, 'mtime_ns': st.st_mtime_ns, 'hash': src_hash,
+                           'out_size': new_size, 'out_hash': out_hash},
+    }
+
+def clean_and_compress_all(noise_threshold=None, workers=WORKERS, dry_run=DRY_RUN):
+    noise_threshold = threshold_for(noise_threshold)   # Profile name, number, or None = default (170)
     # --- SETUP ---
     base_dir = "Processed_Database"
     compressed_base_dir = os.path.join(base_dir, "Compressed")
@@ -36,87 +124,89 @@ def clean_and_compress_all(noise_threshold=170):
         print(f"No folders found in {base_dir} to process!")
         return
 
-    # Data collection for stats
-    stats_data = []
-    grand_total_orig_bytes = 0
-    grand_total_new_bytes = 0
-
     print(f"Found {len(folders_to_process)} folders to process.")
     print(f"Report will be saved to: {csv_report_path}\n")
 
-    # --- OUTER LOOP: FOLDERS ---
-    for folder_name in tqdm(folders_to_process, desc="Overall Progress", unit="folder", position=0, leave=True):
-        input_dir = os.path.join(base_dir, folder_name)
-        output_dir = os.path.join(compressed_base_dir, folder_name)
-
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    # 2. Collect every image of every folder, so the pool is sharded over files rather than folders
+    manifest_path = os.path.join(compressed_base_dir, MANIFEST_NAME)
+    params = {'noise_threshold': noise_threshold, 'pipeline': PIPELINE_VERSION}
+    manifest = load_manifest(manifest_path, params)
+    print(f"Manifest: {len(manifest)} images recorded in {manifest_path}")
 
-        files = [f for f in os.listdir(input_dir) if f.lower().endswith('.png')]
-        
-        if not files:
-            continue
-
-        folder_orig_bytes = 0
-        folder_new_bytes = 0
-
-        # --- INNER LOOP: FILES ---
-        for filename in tqdm(files, desc=f"  Processing {folder_name}", leave=True, unit="img", position=1):
+    files = []
+    seen = set()
+    unchanged = 0
+    for folder_name in folders_to_process:
+        input_dir = os.path.join(base_dir, folder_name)
+        folder_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.png')]
+        if folder_files and not dry_run:
+            os.makedirs(os.path.join(compressed_base_dir, folder_name), exist_ok=True)
+        for filename in sorted(folder_files):
+            rel = f"{folder_name}/{filename}"
+            seen.add(rel)
             file_path = os.path.join(input_dir, filename)
-            save_path = os.path.join(output_dir, filename)
-
-            try:
-                # 1. Capture Original Size
-                orig_size = os.path.getsize(file_path)
-                folder_orig_bytes += orig_size
-
-                # 2. Compress (Smart Grayscale)
-                with Image.open(file_path) as img:
-                    gray = img.convert('L')
-                    # Smart Thresholding
-                    cleaned = gray.point(lambda p: 255 if p > noise_threshold else p)
-                    cleaned.save(save_path, "PNG", optimize=True)
-
-                # 3. Capture New Size
-                new_size = os.path.getsize(save_path)
-                folder_new_bytes += new_size
-
-                # 4. Log Data
-                savings_pct = ((orig_size - new_size) / orig_size) * 100 if orig_size > 0 else 0
-                stats_data.append([
-                    folder_name,
-                    filename,
-                    round(orig_size / 1024, 2),  # KB
-                    round(new_size / 1024, 2),   # KB
-                    round(savings_pct, 2)
-                ])
-
-            except Exception as e:
-                tqdm.write(f"❌ Error on {filename}: {e}")
-
-        # Update Grand Totals
-        grand_total_orig_bytes += folder_orig_bytes
-        grand_total_new_bytes += folder_new_bytes
-
-        # Print Folder Summary
+            save_path = os.path.join(compressed_base_dir, folder_name, filename)
+            up_to_date, refreshed = is_up_to_date(manifest.get(rel), file_path, save_path)
+            if up_to_date:
+                unchanged += 1
+                if refreshed is not None: manifest[rel] = refreshed
+            else:
+                files.append(file_path)
+
+    # 3. Orphans: outputs we wrote whose source image no longer exists
+    orphans = sorted(set(manifest) - seen)
+    for rel in orphans:
+        if dry_run: continue
+        out_path = os.path.join(compressed_base_dir, *rel.split('/'))
+        if os.path.exists(out_path): os.remove(out_path)
+        del manifest[rel]
+
+    print(f"🔁 {len(files)} new/modified | ⏭️ {unchanged} unchanged | 🗑️ {len(orphans)} orphaned outputs"
+          + (" (would be deleted)" if dry_run else " deleted"))
+
+    report = run_batch(files, compress_image, workers=workers, dry_run=dry_run, desc="Compressing",
+                       output_dir=compressed_base_dir, noise_threshold=noise_threshold)
+
+    if not dry_run:
+        for row in report.rows('Compressed'):
+            manifest[f"{row['folder']}/{row['filename']}"] = row['manifest_entry']
+        for path, _ in report.errors:
+            manifest.pop(f"{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}", None)
+        if os.path.isdir(compressed_base_dir): save_manifest(manifest_path, params, manifest)
+
+    for path, message in report.errors:
+        print(f"❌ Error on {os.path.basename(path)}: {message}")
+
+    # --- FOLDER SUMMARIES ---
+    folder_bytes = defaultdict(lambda: [0, 0])
+    for row in report.rows('Compressed'):
+        folder_bytes[row['folder']][0] += row['orig_bytes']
+        folder_bytes[row['folder']][1] += row['new_bytes']
+
+    for folder_name in folders_to_process:
+        folder_orig_bytes, folder_new_bytes = folder_bytes.get(folder_name, (0, 0))
         if folder_orig_bytes > 0:
             folder_savings_pct = ((folder_orig_bytes - folder_new_bytes) / folder_orig_bytes) * 100
-            tqdm.write(
+            print(
                 f"✅ {folder_name}: "
                 f"Saved {folder_savings_pct:.1f}% "
                 f"({folder_orig_bytes/1024/1024:.2f}MB ➝ {folder_new_bytes/1024/1024:.2f}MB)"
             )
-        
-        tqdm.write("\n") # Spacer
 
     # --- FINAL REPORT ---
+    report.write_rows(csv_report_path, STATS_FIELDS, status='Compressed')
+    grand_total_orig_bytes = report.total('orig_bytes')
+    grand_total_new_bytes = report.total('new_bytes')
     total_savings_bytes = grand_total_orig_bytes - grand_total_new_bytes
     total_savings_pct = (total_savings_bytes / grand_total_orig_bytes * 100) if grand_total_orig_bytes > 0 else 0
 
     print("\n" + "="*45)
-    print(f"       FINAL COMPRESSION REPORT")
+    print(f"       FINAL COMPRESSION REPORT" + (" (DRY RUN)" if dry_run else ""))
     print("="*45)
-    print(f"• Total Images:    {len(stats_data)}")
+    print(f"• Compressed:      {report.counts['Compressed']}")
+    print(f"• Unchanged:       {unchanged}")
+    print(f"• Orphans Removed: {0 if dry_run else len(orphans)}")
+    print(f"• Errors:          {report.counts['Error']}")
     print(f"• Original Size:   {grand_total_orig_bytes / 1024 / 1024:.2f} MB")
     print(f"• New Size:        {grand_total_new_bytes / 1024 / 1024:.2f} MB")
     print(f"• Space Saved:     {total_savings_bytes / 1024 / 1024:.2f} MB ({total_savings_pct:.2f}%)")
@@ -124,4 +214,5 @@ def clean_and_compress_all(noise_threshold=170):
     print("="*45)
 
 
-clean_and_compress_all()
\ No newline at end of file
+if __name__ == "__main__":
+    clean_and_compress_all()
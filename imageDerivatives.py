@@ -0,0 +1,147 @@
+import os
+import io
+import time
+from collections import defaultdict
+import numpy as np
+from PIL import Image
+from imageBatchRunner import run_batch
+
+# --- CONFIGURATION ---
+BASE_DIR = r"D:\Main\3. Work - Teaching\Projects\Question extractor\Processed_Database"
+DERIVATIVES_DIR = os.path.join(BASE_DIR, 'Derivatives')
+REPORT_CSV = os.path.join(DERIVATIVES_DIR, 'derivatives_report.csv')
+SKIP_FOLDERS = {'Compressed', 'Derivatives'}
+
+PALETTE_COLORS = 16    # Thresholded crops have only a handful of gray levels
+DISPLAY_WIDTH = 720    # Student app / Streamlit column width in px (never upscaled)
+DECODE_REPEATS = 3     # Decode time = best of N
+WORKERS = None         # None = all cores but one; 1 = single process
+DRY_RUN = False        # True: encode + measure in memory only
+
+VARIANTS = ('source', 'palette', 'webp', 'display')
+REPORT_FIELDS = ['folder', 'filename', 'variant', 'width', 'height', 'colors', 'bytes', 'ratio', 'decode_ms', 'exact']
+
+# --- ENCODERS (each returns (encoded bytes, colors)) ---
+
+def palette_bits(colors):
+    """Smallest PNG bit depth (1, 2, 4, 8) that holds `colors` palette entries."""
+    for bits in (1, 2, 4):
+        if colors <= 1 << bits: return bits
+    return 8
+
+def encode_palette_png(gray):
+    """Low-bit palette PNG: quantize to at most PALETTE_COLORS levels (1-bit when the crop is bilevel)."""
+    levels = len(np.unique(np.asarray(gray)))
+    colors = min(PALETTE_COLORS, levels)
+    paletted = gray.quantize(colors=colors, method=2, dither=Image.NONE)
+    buffer = io.BytesIO()
+    paletted.save(buffer, "PNG", optimize=True, bits=palette_bits(colors))
+    return buffer.getvalue(), colors
+
+def encode_lossless_webp(gray):
+    buffer = io.BytesIO()
+    gray.save(buffer, "WEBP", lossless=True, quality=100, method=6)
+    return buffer.getvalue(), None
+
+def encode_display(gray):
+    """Display-width variant: LANCZOS downscale, then the same palette encoding."""
+    if gray.width > DISPLAY_WIDTH:
+        height = max(1, round(gray.height * DISPLAY_WIDTH / gray.width))
+        gray = gray.resize((DISPLAY_WIDTH, height), Image.LANCZOS)
+    return encode_palette_png(gray)
+
+ENCODERS = {'palette': (encode_palette_png, '.png'),
+            'webp': (encode_lossless_webp, '.webp'),
+            'display': (encode_display, '.png')}
+
+def decode_ms(data):
+    """Best-of-N full decode time of an encoded image, in ms. Returns (ms, decoded grayscale image)."""
+    best = float('inf')
+    for _ in range(DECODE_REPEATS):
+        t0 = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            decoded = img
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 3), decoded.convert('L')
+
+# --- WORKER ---
+
+def make_derivatives(file_path, dry_run=False, output_dir=None):
+    """Batch worker: writes every variant of one crop to output_dir/<variant>/<folder>/ and measures it."""
+    folder_name = os.path.basename(os.path.dirname(file_path))
+    filename = os.path.basename(file_path)
+    stem = os.path.splitext(filename)[0]
+
+    with open(file_path, 'rb') as f:
+        source_bytes = f.read()
+    source_ms, gray = decode_ms(source_bytes)
+    source_pixels = np.asarray(gray)
+
+    rows = [{'variant': 'source', 'width': gray.width, 'height': gray.height, 'colors': None,
+             'bytes': len(source_bytes), 'decode_ms': source_ms, 'exact': True}]
+    for variant, (encode, ext) in ENCODERS.items():
+        data, colors = encode(gray)
+        ms, decoded = decode_ms(data)
+        # exact: the variant decodes to the same gray levels as the source (not meaningful after a resize)
+        exact = None if decoded.size != gray.size else bool(np.array_equal(np.asarray(decoded), source_pixels))
+        rows.append({'variant': variant, 'width': decoded.width, 'height': decoded.height, 'colors': colors,
+                     'bytes': len(data), 'decode_ms': ms, 'exact': exact})
+        if not dry_run:
+            variant_dir = os.path.join(output_dir, variant, folder_name)
+            os.makedirs(variant_dir, exist_ok=True)
+            with open(os.path.join(variant_dir, stem + ext), 'wb') as f:
+                f.write(data)
+
+    for row in rows:
+        row.update(folder=folder_name, filename=filename, ratio=round(row['bytes'] / max(1, len(source_bytes)), 4))
+    return {'status': 'Done', 'variants': rows}
+
+# --- MAIN ---
+
+def generate_derivatives(base_dir=BASE_DIR, output_dir=DERIVATIVES_DIR, workers=WORKERS, dry_run=DRY_RUN):
+    folders = sorted(f for f in os.listdir(base_dir)
+                     if os.path.isdir(os.path.join(base_dir, f)) and f not in SKIP_FOLDERS)
+    files = []
+    for folder_name in folders:
+        folder_dir = os.path.join(base_dir, folder_name)
+        files.extend(os.path.join(folder_dir, f) for f in sorted(os.listdir(folder_dir)) if f.lower().endswith('.png'))
+    print(f"🖼️  {len(files)} images in {len(folders)} folders -> {output_dir}")
+
+    report = run_batch(files, make_derivatives, workers=workers, dry_run=dry_run, desc="Derivatives",
+                       output_dir=output_dir)
+    for path, message in report.errors:
+        print(f"❌ {path}: {message}")
+
+    variant_rows = [v for row in report.rows('Done') for v in row['variants']]
+    if not variant_rows:
+        print("Nothing to report.")
+        return
+
+    os.makedirs(os.path.dirname(REPORT_CSV), exist_ok=True)
+    report.write_rows(REPORT_CSV, REPORT_FIELDS, rows=variant_rows)
+
+    # --- SUMMARY ---
+    totals = defaultdict(lambda: [0, 0.0, 0])
+    for v in variant_rows:
+        totals[v['variant']][0] += v['bytes']
+        totals[v['variant']][1] += v['decode_ms']
+        totals[v['variant']][2] += 1
+    source_bytes = totals['source'][0] or 1
+
+    print("\n" + "="*60)
+    print("       DERIVATIVES REPORT" + (" (DRY RUN)" if dry_run else ""))
+    print("="*60)
+    print(f"{'Variant':<10}{'Total MB':>12}{'vs source':>12}{'Avg KB':>10}{'Decode ms':>12}")
+    for variant in VARIANTS:
+        total_bytes, total_ms, count = totals[variant]
+        if count == 0: continue
+        print(f"{variant:<10}{total_bytes / 1024 / 1024:>12.2f}{total_bytes / source_bytes:>11.1%}"
+              f"{total_bytes / count / 1024:>10.1f}{total_ms / count:>12.2f}")
+    print(f"• Errors:     {report.counts['Error']}")
+    print(f"• CSV Report: {REPORT_CSV}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    generate_derivatives()
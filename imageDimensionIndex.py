@@ -0,0 +1,111 @@
+import os
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURATION ---
+INDEX_NAME = '_image_index.json'   # Sidecar in the indexed root (e.g. Processed_Database)
+INDEX_VERSION = 1
+IO_WORKERS = 16                    # Threads: the work is stat() + one 24-byte read, all I/O
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Same status vocabulary as autoQC
+FOUND = "Found"
+MISSING = "Missing File"
+EMPTY = "Corrupt (0 KB)"
+READ_ERROR = "Read Error"
+
+
+def png_dimensions(path):
+    """
+    (width, height) from the IHDR chunk, which a valid PNG must start with:
+    8-byte signature, 4-byte length, b'IHDR', then big-endian width and height.
+    Reads 24 bytes instead of decoding the image. Raises ValueError on anything else.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b'IHDR':
+        raise ValueError("Not a PNG (no IHDR header)")
+    return struct.unpack('>II', head[16:24])
+
+
+def _probe(path, cached):
+    """Worker: stat + (if changed) header read. Returns the index entry [size, mtime_ns, w, h, status]."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached
+    if st.st_size == 0:
+        return [0, st.st_mtime_ns, None, None, EMPTY]
+    try:
+        width, height = png_dimensions(path)
+        return [st.st_size, st.st_mtime_ns, width, height, FOUND]
+    except Exception:
+        return [st.st_size, st.st_mtime_ns, None, None, READ_ERROR]
+
+
+class ImageDimensionIndex:
+    """
+    Width / height of every image under `root_dir`, from PNG headers, cached in a sidecar
+    keyed by (relative path, size, mtime). A lookup stats each file (in parallel) and only
+    re-reads the header of files whose size or mtime changed, e.g. crops re-saved in Review & QC.
+
+    Usage:
+        index = ImageDimensionIndex(IMG_DIR)
+        dims = index.lookup([IMG_DIR / 'Folder' / 'Q_1.png', ...])   # [(w, h, status), ...]
+        index.save()
+    """
+
+    def __init__(self, root_dir, index_path=None):
+        self.root_dir = os.path.abspath(str(root_dir))
+        self.index_path = str(index_path) if index_path else os.path.join(self.root_dir, INDEX_NAME)
+        self.entries = {}
+        self.reads = 0    # Headers actually read in this session
+        self._dirty = False
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION: self.entries = data.get('files', {})
+            except Exception:
+                pass  # Corrupt sidecar: rebuild
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(str(path)), self.root_dir).replace(os.sep, '/')
+
+    def lookup(self, paths):
+        """Returns [(width, height, status)] aligned with `paths` (None entries give MISSING)."""
+        keys = [None if p is None else self._key(p) for p in paths]
+        unique = {k: p for k, p in zip(keys, paths) if k is not None}
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as pool:
+            probed = dict(zip(unique, pool.map(lambda k: _probe(unique[k], self.entries.get(k)), unique)))
+
+        for key, entry in probed.items():
+            cached = self.entries.get(key)
+            if entry is cached: continue
+            self._dirty = True
+            if entry is None:
+                self.entries.pop(key, None)
+            else:
+                self.entries[key] = entry
+                self.reads += entry[4] != EMPTY
+
+        results = []
+        for key in keys:
+            entry = probed.get(key) if key is not None else None
+            results.append((None, None, MISSING) if entry is None else (entry[2], entry[3], entry[4]))
+        return results
+
+    def save(self):
+        """Atomic write (temp file + rename), only if something changed."""
+        if not self._dirty: return
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'files': self.entries}, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def summary(self):
+        return f"image index: {len(self.entries)} files, {self.reads} headers read"
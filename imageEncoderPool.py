@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURATION ---
+DEFAULT_WORKERS = max(2, min(8, os.cpu_count() or 2))
+PENDING_PER_WORKER = 2  # Rendered crops allowed to wait in the queue per worker
+
+
+def _process_and_save(img, path, process, on_saved, save_kwargs):
+    if process is not None: img = process(img)
+    if img is None: return None
+    img.save(path, **save_kwargs)
+    size = img.size
+    if on_saved is not None: on_saved(size)
+    return size
+
+
+def map_crops(fn, images, workers=None):
+    """
+    fn over a list of crops on threads (NumPy / OpenCV reductions release the GIL).
+    Returns the results in input order.
+    """
+    if len(images) <= 1: return [fn(img) for img in images]
+    with ThreadPoolExecutor(max_workers=min(len(images), int(workers or DEFAULT_WORKERS))) as pool:
+        return list(pool.map(fn, images))
+
+
+class EncoderPool:
+    """
+    Bounded background pool for the CPU-heavy tail of every crop (trim / clean / PNG encode).
+    PIL's zlib encoder and OpenCV release the GIL, so threads overlap with the main loop's
+    parsing and rendering without pickling bitmaps to other processes.
+
+    Backpressure: save() blocks once max_pending crops are in flight, so at most
+    max_pending rendered bitmaps are held in memory at any time.
+    Barrier: wait() / close() return only when every submitted crop is on disk.
+    Call it before writing CSV rows that depend on the files.
+
+    Usage:
+        encoder = EncoderPool()
+        for ...:
+            encoder.save(img, out_path, process=trim_whitespace, optimize=True)
+        for path, exc in encoder.close(): print(f"❌ {path}: {exc}")
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = int(workers or DEFAULT_WORKERS)
+        self.max_pending = int(max_pending or self.workers * PENDING_PER_WORKER)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='png-encoder')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = []
+
+    def save(self, img, path, process=None, on_saved=None, **save_kwargs):
+        """
+        Runs process(img) -> img (if given) and img.save(path, **save_kwargs) in a worker.
+        on_saved(size) runs in the worker right after the file is written.
+        Returns a Future whose result is the saved (width, height), or None if process() returned None.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_process_and_save, img, path, process, on_saved, save_kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append((path, future))
+        return future
+
+    def wait(self):
+        """Barrier. Returns [(path, exception)] for every crop that failed since the last wait()."""
+        pending, self._pending = self._pending, []
+        errors = []
+        for path, future in pending:
+            exc = future.exception()
+            if exc is not None: errors.append((path, exc))
+        return errors
+
+    def close(self):
+        errors = self.wait()
+        self._executor.shutdown(wait=True)
+        return errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
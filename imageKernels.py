@@ -0,0 +1,189 @@
+import numpy as np
+try:
+    import cv2  # Optional: faster range masks in whiten_range
+except ImportError:
+    cv2 = None
+
+# Pure NumPy kernels for projection-profile trimming. Every function takes arrays
+# (grayscale uint8: 0 = black ink, 255 = paper) and returns indices, never images,
+# so extractors and post-processors share one implementation without Python pixel loops.
+
+
+# --- 1. PROFILES & MASKS ---
+
+def to_gray(img):
+    """PIL image -> 2D uint8 array (0 = ink)."""
+    return np.asarray(img.convert('L'))
+
+def ink_mask(gray, threshold):
+    """True where a pixel is ink: gray <= threshold (same as point(lambda p: 0 if p > threshold else 1))."""
+    return gray <= threshold
+
+def column_profile(gray):
+    """Ink weight of every column: sum of the inverted image (ImageOps.invert + np.sum(axis=0))."""
+    return (255 - gray.astype(np.int64)).sum(axis=0)
+
+def row_profile(gray):
+    """Ink weight of every row: sum of the inverted image (ImageOps.invert + np.sum(axis=1))."""
+    return (255 - gray.astype(np.int64)).sum(axis=1)
+
+
+# --- 2. RUNS & GAPS ---
+
+def runs(mask):
+    """(starts, ends) of every run of True in a 1D mask; ends are exclusive."""
+    mask = np.asarray(mask, dtype=np.int8)
+    edges = np.diff(np.concatenate(([0], mask, [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def first_gap_after_ink(has_ink, min_gap, start=0):
+    """
+    Index of the first non-ink position of the first gap (>= min_gap long) that follows ink,
+    scanning from `start`. Returns -1 if there is no such gap.
+    """
+    has_ink = np.asarray(has_ink[start:], dtype=bool)
+    ink = np.flatnonzero(has_ink)
+    if len(ink) == 0: return -1
+    gap_starts, gap_ends = runs(~has_ink[ink[0]:])
+    long_gaps = np.flatnonzero(gap_ends - gap_starts >= min_gap)
+    if len(long_gaps) == 0: return -1
+    return start + ink[0] + gap_starts[long_gaps[0]]
+
+def merged_blocks(has_ink, merge_gap, min_width=3):
+    """
+    Ink blocks of a 1D mask, joining blocks separated by gaps shorter than merge_gap
+    and dropping blocks of width <= min_width. Returns (starts, ends), ends exclusive.
+    """
+    starts, ends = runs(has_ink)
+    if len(starts) == 0: return starts, ends
+    keep_gap = (starts[1:] - ends[:-1]) >= merge_gap
+    block_starts = np.concatenate(([starts[0]], starts[1:][keep_gap]))
+    block_ends = np.concatenate((ends[:-1][keep_gap], [ends[-1]]))
+    wide = (block_ends - block_starts) > min_width
+    return block_starts[wide], block_ends[wide]
+
+def leading_count(mask):
+    """Number of leading True values."""
+    mask = np.asarray(mask, dtype=bool)
+    false_idx = np.flatnonzero(~mask)
+    return int(false_idx[0]) if len(false_idx) else len(mask)
+
+
+# --- 3. TRIMS (return crop coordinates) ---
+
+def gap_cut(profile, ink_threshold=500, min_gap=15, start=5, offset=2,
+            max_ratio=None, fallback_ratio=None):
+    """
+    Cut position just past the first block of ink (question number "12." / "Sol." header):
+    the first gap of >= min_gap positions after ink, shifted by `offset - 1` pixels.
+    If nothing is found (or the cut is past max_ratio of the length) returns
+    int(length * fallback_ratio), or 0 when fallback_ratio is None.
+    Works on column profiles (left trims) and row profiles (top trims).
+    """
+    length = len(profile)
+    gap = first_gap_after_ink(np.asarray(profile) > ink_threshold, min_gap, start)
+    cut = gap - 1 + offset if gap >= 0 else 0
+    if cut == 0 or (max_ratio is not None and cut > length * max_ratio):
+        cut = int(length * fallback_ratio) if fallback_ratio is not None else 0
+    return cut
+
+def number_block_cut(binary_ink, scan_ratio=0.30, ink_threshold=2, merge_gap=15, padding=10, min_width=3):
+    """
+    Question-number cut from the block structure of the left scan_ratio of the image:
+    with >= 2 ink blocks (number, text) cuts at max(text_start - padding, number_end + 1).
+    binary_ink: 2D bool / 0-255 array (non-zero = ink). Returns 0 for "no cut".
+    """
+    width = binary_ink.shape[1]
+    scan = np.asarray(binary_ink[:, :int(width * scan_ratio)]) != 0
+    starts, ends = merged_blocks(np.count_nonzero(scan, axis=0) > ink_threshold, merge_gap, min_width)
+    if len(starts) < 2: return 0
+    return max(int(starts[1]) - padding, int(ends[0]) + 1)
+
+def footer_cut(ink, x0=0, x1=None, min_density=0.0):
+    """
+    Bottom-up footer trim: rows whose ink density in columns [x0:x1] is below min_density
+    (or that have no ink at all) are dropped up to the last content row.
+    Returns the new height (0 if no row has content).
+    """
+    region = ink[:, x0:x1]
+    counts = np.count_nonzero(region, axis=1)
+    content = (counts > 0) & (counts >= min_density * region.shape[1])
+    rows = np.flatnonzero(content)
+    return int(rows[-1]) + 1 if len(rows) else 0
+
+def blank_left_columns(ink, y0=0, y1=None, max_density=0.05, limit=None):
+    """Number of leading columns (up to `limit`) whose ink density in rows [y0:y1] is below max_density."""
+    region = ink[y0:y1, :limit]
+    if region.shape[0] == 0: return region.shape[1]
+    density = np.count_nonzero(region, axis=0) / region.shape[0]
+    return leading_count(density < max_density)
+
+def sol_header_cut(gray, ink_level=128, quiet_sum=500, min_gap=10, wide_ratio=0.3, start=5):
+    """
+    Top cut below a "Sol." header: from the first inked row, stop at the first row with ink past
+    wide_ratio of the width (body text) or once min_gap quiet rows have accumulated.
+    Returns the cut row, or 0 if the header never ends.
+    """
+    height, width = gray.shape
+    inverted = 255 - gray[start:].astype(np.int64)
+    ink = inverted > ink_level
+    any_ink = ink.any(axis=1)
+    wide = ink[:, np.arange(width) > width * wide_ratio].any(axis=1)
+    quiet = ~wide & (inverted.sum(axis=1) < quiet_sum)
+
+    first = np.flatnonzero(any_ink)
+    if len(first) == 0: return 0
+    first = first[0]
+    gaps = np.cumsum(quiet[first:])
+    stop = np.flatnonzero((gaps >= min_gap) | wide[first:])
+    if len(stop) == 0: return 0
+    i = stop[0]
+    return int(start + first + i - gaps[i] + 2)
+
+
+# --- 4. CLEANING & FOOTER CUTS (array pipelines) ---
+
+def whiten_range(pixels, lo, hi):
+    """
+    In place: uint8 pixels whose every channel is within [lo, hi] become white
+    (cv2.inRange(img, (lo,)*3, (hi,)*3) + assignment, or a gray range for 2D arrays).
+    With OpenCV available the mask is applied as a masked OR with white (x | 255 == 255),
+    which avoids NumPy's boolean gather / scatter over the whole image.
+    """
+    if cv2 is not None:
+        channels = pixels.shape[2] if pixels.ndim == 3 else 1
+        mask = cv2.inRange(pixels, (int(lo),) * channels, (int(hi),) * channels)
+        cv2.bitwise_or(pixels, (255,) * channels + (0,) * (4 - channels), dst=pixels, mask=mask)
+        return pixels
+    in_range = (pixels >= lo) & (pixels <= hi)
+    if pixels.ndim == 3: in_range = in_range.all(axis=2)
+    pixels[in_range] = 255
+    return pixels
+
+def gap_confirmed_footer_cut(ink, scan_limit, density=0.05, confirm_rows=5):
+    """
+    Bottom-up footer cut inside the last scan_limit rows: leading blank rows are skipped, then rows
+    are cut up to the first blank row (density <= `density`) followed by confirm_rows blank rows above.
+    Returns the new height.
+    """
+    height, width = ink.shape
+    lo = height - scan_limit + 1          # Lowest (topmost) row the scan reaches
+    if lo > height - 1: return height
+    dense = np.count_nonzero(ink, axis=1) > density * width
+    dense_rows = np.flatnonzero(dense[max(lo, 0):]) + max(lo, 0)
+    if len(dense_rows) == 0: return height
+    first_dense = dense_rows[-1]
+    ys = np.arange(max(lo, 0), first_dense)
+    if len(ys) == 0: return int(first_dense)
+    dense_before = np.concatenate(([0], np.cumsum(dense)))
+    quiet = (dense_before[ys + 1] - dense_before[np.maximum(0, ys - confirm_rows)]) == 0
+    stops = np.flatnonzero(quiet)
+    return int(ys[stops[-1]] + 1) if len(stops) else int(ys[0])
+
+def bar_footer_cut(ink, scan_limit, density=0.50):
+    """Bottom-up cut of solid bars only: consecutive rows with density > `density` within the last scan_limit rows."""
+    height, width = ink.shape
+    lo = height - scan_limit + 1
+    if lo > height - 1: return height
+    dense = np.count_nonzero(ink[max(lo, 0):], axis=1) > density * width
+    return height - leading_count(dense[::-1])
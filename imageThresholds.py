@@ -0,0 +1,63 @@
+import numpy as np
+from functools import lru_cache
+
+# The grayscale noise cleaning every crop pipeline ends with ("lighter than T -> white"),
+# in one place: precomputed 256-entry lookup tables for PIL, in-place masks for NumPy arrays,
+# and the threshold each source uses.
+
+# --- CONFIGURATION ---
+# Gray levels above the threshold are paper, scan noise or watermark and become white.
+THRESHOLD_PROFILES = {
+    'default': 170,     # imageCompression, trimQNoFromImages(V2), duplicate hashing
+    'allen': 190,       # Allen modules: ~231 grey watermark
+    'unique': 190,      # extractQuestionsUnique
+    'allen_jee': 150,   # Allen JEE: darker (~70) watermark is removed separately, keep text crisp
+}
+DEFAULT_PROFILE = 'default'
+
+
+def threshold_for(source=None):
+    """Threshold of a profile name (None = default). Plain numbers pass through."""
+    if source is None: source = DEFAULT_PROFILE
+    if isinstance(source, str): return THRESHOLD_PROFILES[source]
+    return int(source)
+
+
+# --- 1. LOOKUP TABLES (PIL point) ---
+
+@lru_cache(maxsize=None)
+def whiten_lut(threshold):
+    """256-entry table for img.point(): p > threshold -> 255, else p."""
+    return tuple(255 if p > threshold else p for p in range(256))
+
+@lru_cache(maxsize=None)
+def binarize_lut(threshold):
+    """256-entry table for img.point(): p < threshold -> 0 (ink), else 255."""
+    return tuple(0 if p < threshold else 255 for p in range(256))
+
+def to_l(img):
+    """Grayscale ('L') image, without a copy when it already is one."""
+    return img if img.mode == 'L' else img.convert('L')
+
+def whiten_above(img, source=None):
+    """PIL image -> 'L' image with light noise removed (replaces point(lambda p: 255 if p > T else p))."""
+    return to_l(img).point(whiten_lut(threshold_for(source)))
+
+def binarize(img, source=None):
+    """PIL image -> black / white 'L' image (replaces point(lambda p: 0 if p < T else 255))."""
+    return to_l(img).point(binarize_lut(threshold_for(source)))
+
+
+# --- 2. ARRAYS (in place) ---
+
+def whiten_above_array(gray, source=None):
+    """
+    In place on a uint8 array: values above the threshold become 255. Returns gray.
+    The mask is scaled to 0 / 255 in its own buffer and max(p, mask) is written into gray,
+    so the mask is the only allocation; np.where(gray > T, 255, gray).astype(np.uint8)
+    builds two full-size copies.
+    """
+    mask = (gray > threshold_for(source)).view(np.uint8)
+    np.multiply(mask, np.uint8(255), out=mask)
+    np.maximum(gray, mask, out=gray)
+    return gray
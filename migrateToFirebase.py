@@ -34,7 +34,8 @@ TEXT_COLUMNS_TO_FIX = [
     "Q_Image_Path", "Sol_Image_Path", "PYQ", "Chapter", "Question type", 
     "Subject", "OCR_Text", "Labelled by AI", "Topic_L2", "Topic", 
     "image_url", "question_id", "Exam", "Difficulty_tag", "Folder", 
-    "Correct Answer", "QC_Status", "AI_Tag_Accepted", "PYQ_Year_Detailed"
+    "Correct Answer", "QC_Status", "AI_Tag_Accepted", "PYQ_Year_Detailed",
+    "duplicate_group"
 ]
 
 INT_COLUMNS_TO_FIX = [
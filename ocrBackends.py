@@ -0,0 +1,164 @@
+import os
+import inspect
+import numpy as np
+from ocrTextBands import text_bands
+
+# OCR engines behind one interface, so OCR_SmartBatch and the benchmark can switch per run.
+# Engine packages are optional: a backend whose package is missing reports available() = False.
+try:
+    import easyocr
+except ImportError:
+    easyocr = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+
+def pad_batch(images):
+    """White-pads every image to the batch's largest size, so readtext_batched needs no resizing."""
+    height = max(img.shape[0] for img in images)
+    width = max(img.shape[1] for img in images)
+    padded = []
+    for img in images:
+        canvas = np.full((height, width), 255, dtype=np.uint8)
+        canvas[:img.shape[0], :img.shape[1]] = img
+        padded.append(canvas)
+    return padded
+
+
+class OCRBackend:
+    """
+    One OCR engine working on prepared grayscale crops (uint8 arrays).
+    The instance is pickled into each worker process, where load() runs once before any read.
+    """
+    name = None
+    supports_gpu = False
+    needs_image = True   # False: the backend never reads pixels (rows are served from PDF text)
+
+    def __init__(self, **options):
+        self.options = options
+
+    def available(self):
+        return True
+
+    def version(self):
+        """Engine version + options: part of the OCR cache key."""
+        return 'unknown'
+
+    def load(self, gpu=False, threads=None):
+        pass
+
+    def read(self, img):
+        raise NotImplementedError
+
+    def read_batch(self, images):
+        """[(text, None) or (None, error)] per image. Default: one read() each."""
+        out = []
+        for img in images:
+            try: out.append((self.read(img), None))
+            except Exception as e: out.append((None, str(e)))
+        return out
+
+
+class EasyOCRBackend(OCRBackend):
+    """EasyOCR (CRAFT detection + CRNN recognition). With text_bands, crops with detectable
+    text lines skip detection and only their bands are recognized."""
+    name = 'easyocr'
+    supports_gpu = True
+
+    def __init__(self, model_dir='models', text_bands=True, batch_size=8):
+        super().__init__(model_dir=model_dir, text_bands=text_bands, batch_size=batch_size)
+        self.reader = None
+
+    def available(self):
+        return easyocr is not None
+
+    def version(self):
+        return f"{getattr(easyocr, '__version__', 'unknown')}" + ("|bands" if self.options['text_bands'] else "")
+
+    def load(self, gpu=False, threads=None):
+        if threads:
+            import torch
+            torch.set_num_threads(threads)  # Workers x threads ~ cores, no oversubscription
+        self.reader = easyocr.Reader(['en'], model_storage_directory=self.options['model_dir'], gpu=gpu,
+                                     verbose=False)
+
+    def read(self, img):
+        return " ".join(self.reader.readtext(img, detail=0))
+
+    def read_bands(self, img, bands):
+        """Recognizer only, on the given text-line boxes (no CRAFT detection pass)."""
+        return " ".join(self.reader.recognize(img, horizontal_list=bands, free_list=[], detail=0,
+                                              batch_size=self.options['batch_size']))
+
+    def read_batch(self, images):
+        out = [None] * len(images)
+        full = []
+        for i, img in enumerate(images):
+            bands = text_bands(img) if self.options['text_bands'] else []
+            if not bands:
+                full.append(i)
+                continue
+            try: out[i] = (self.read_bands(img, bands), None)
+            except Exception as e: out[i] = (None, str(e))
+
+        # Crops without bands: one readtext_batched call, retried image by image if it fails
+        if full:
+            try:
+                texts = self.reader.readtext_batched(pad_batch([images[i] for i in full]), detail=0,
+                                                     batch_size=self.options['batch_size'])
+                for i, text in zip(full, texts): out[i] = (" ".join(text), None)
+            except Exception:
+                for i, result in zip(full, super().read_batch([images[i] for i in full])): out[i] = result
+        return out
+
+
+class TesseractBackend(OCRBackend):
+    """Tesseract through pytesseract: CPU only, no model in Python memory, one engine call per crop."""
+    name = 'tesseract'
+
+    def __init__(self, lang='eng', config='--oem 1 --psm 6'):
+        super().__init__(lang=lang, config=config)
+
+    def available(self):
+        if pytesseract is None: return False
+        try:
+            pytesseract.get_tesseract_version()
+            return True
+        except Exception:
+            return False  # Package present, tesseract binary missing
+
+    def version(self):
+        return f"{pytesseract.get_tesseract_version()}|{self.options['lang']}|{self.options['config']}"
+
+    def load(self, gpu=False, threads=None):
+        os.environ['OMP_THREAD_LIMIT'] = str(threads or 1)  # Inherited by every tesseract call
+
+    def read(self, img):
+        text = pytesseract.image_to_string(img, lang=self.options['lang'], config=self.options['config'])
+        return " ".join(text.split())
+
+
+class PdfTextBackend(OCRBackend):
+    """No-op: trusts pdf_Text. Rows without usable PDF text are left for an OCR backend."""
+    name = 'pdf_text'
+    needs_image = False
+
+    def version(self):
+        return '1'
+
+    def read(self, img):
+        return ""
+
+
+BACKENDS = {cls.name: cls for cls in (EasyOCRBackend, TesseractBackend, PdfTextBackend)}
+
+def make_backend(name, **options):
+    """Backend by name; options the backend does not take are ignored."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    cls = BACKENDS[name]
+    accepted = inspect.signature(cls.__init__).parameters
+    return cls(**{k: v for k, v in options.items() if k in accepted and k != 'self'})
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+from datetime import datetime
+from extractionCache import file_hash
+
+# --- CONFIGURATION ---
+CACHE_NAME = 'ocr_cache.sqlite'   # Lives in BASE_PATH
+COMMIT_EVERY = 200                # Writes per transaction
+
+
+class OCRCache:
+    """
+    OCR text keyed by (image content hash, engine, engine version) in a local SQLite file.
+
+      ocr_results: (content_hash, engine, version) -> text     primary-key lookup, microseconds
+      file_hashes: path -> (size, mtime_ns, content_hash)      so unchanged files are never re-hashed
+
+    A re-cropped image has a new hash, so its old text simply stops matching; the same image
+    saved in two folders has one hash, so it is OCR'd once. Changing the engine, its version
+    or the preprocessing (part of `version`) starts a fresh set of entries.
+
+    Usage:
+        with OCRCache(os.path.join(BASE_PATH, CACHE_NAME)) as cache:
+            h = cache.hash_file(img_path)
+            text = cache.get(h, 'easyocr', version)
+            if text is None:
+                text = ...OCR...; cache.put(h, 'easyocr', version, text)
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")      # Readers never block the writer
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                content_hash TEXT NOT NULL, engine TEXT NOT NULL, version TEXT NOT NULL,
+                text TEXT NOT NULL, created TEXT NOT NULL,
+                PRIMARY KEY (content_hash, engine, version)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL) WITHOUT ROWID;
+        """)
+        self.hits = self.misses = self.hashed = 0
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _wrote(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY: self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    # --- Content hashes (stat-cached) ---
+
+    def hash_file(self, path):
+        """SHA-256 of the file, re-read only if its size or mtime changed. None if the file is missing."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+        row = self.conn.execute("SELECT size, mtime_ns, content_hash FROM file_hashes WHERE path = ?",
+                                (key,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns: return row[2]
+        content_hash = file_hash(path)
+        self.hashed += 1
+        self.conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                          (key, st.st_size, st.st_mtime_ns, content_hash))
+        self._wrote()
+        return content_hash
+
+    # --- OCR results ---
+
+    def get(self, content_hash, engine, version):
+        row = self.conn.execute("SELECT text FROM ocr_results WHERE content_hash = ? AND engine = ? AND version = ?",
+                                (content_hash, engine, version)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, content_hash, engine, version, text):
+        self.conn.execute("INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?)",
+                          (content_hash, engine, version, text, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        self._wrote()
+
+    def summary(self):
+        return f"OCR cache: {self.hits} hits, {self.misses} misses, {self.hashed} files hashed"
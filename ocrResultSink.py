@@ -0,0 +1,93 @@
+import os
+import io
+import csv
+import json
+import time
+
+# --- CONFIGURATION ---
+RESULT_COLUMNS = ['unique_id', 'OCR_Text', 'source', 'engine', 'last_updated', 'image_hash']
+FLUSH_ROWS = 50        # Flush after this many buffered rows...
+FLUSH_SECONDS = 10.0   # ...or when the oldest buffered row is this old (checked on add)
+
+
+def _fsync_write(path, mode, data):
+    with open(path, mode, encoding='utf-8', newline='') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class OCRResultSink:
+    """
+    Buffered, crash-safe appender for the narrow OCR results table (RESULT_COLUMNS).
+
+    Rows are buffered and written in one append per flush (every FLUSH_ROWS rows or
+    FLUSH_SECONDS). Each flush is journaled: the serialized rows and the file size before
+    the append go to `<csv>.journal` (fsync'd) first, then the CSV append is fsync'd and the
+    journal removed. If a run dies mid-flush, the next sink truncates the half-written tail
+    and replays the journal, so a killed run loses at most the rows still in the buffer.
+
+    Usage:
+        with OCRResultSink(OUTPUT_DB_PATH) as sink:
+            sink.add({'unique_id': ..., 'OCR_Text': ..., 'source': 'OCR_CPU', 'engine': 'easyocr', ...})
+    """
+
+    def __init__(self, csv_path, columns=RESULT_COLUMNS, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.csv_path = str(csv_path)
+        self.journal_path = self.csv_path + '.journal'
+        self.columns = list(columns)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.first_buffered = None
+        self.written = 0
+        self.recovered = self.recover()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def recover(self):
+        """Completes a flush interrupted by a crash. Returns the number of rows replayed."""
+        if not os.path.exists(self.journal_path): return 0
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            os.remove(self.journal_path)  # Journal itself incomplete: the CSV was never touched
+            return 0
+        if os.path.exists(self.csv_path):
+            with open(self.csv_path, 'r+b') as f:
+                f.truncate(journal['offset'])
+        _fsync_write(self.csv_path, 'a', journal['data'])
+        os.remove(self.journal_path)
+        return journal['rows']
+
+    def add(self, row):
+        if not self.buffer: self.first_buffered = time.monotonic()
+        self.buffer.append(row)
+        if len(self.buffer) >= self.flush_rows or time.monotonic() - self.first_buffered >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer: return
+        offset = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=self.columns, extrasaction='ignore')
+        if offset == 0: writer.writeheader()
+        writer.writerows(self.buffer)
+        data = out.getvalue()
+
+        tmp_path = self.journal_path + '.tmp'
+        _fsync_write(tmp_path, 'w', json.dumps({'offset': offset, 'rows': len(self.buffer), 'data': data}))
+        os.replace(tmp_path, self.journal_path)
+        _fsync_write(self.csv_path, 'a', data)
+        os.remove(self.journal_path)
+
+        self.written += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
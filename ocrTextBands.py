@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+from imageKernels import runs
+
+# Cheap text-line finder for question crops. Connected components of the thresholded crop are
+# split into "glyph-like" (character-sized, not too sparse) and the rest (diagram strokes, rules,
+# specks); a horizontal projection of the glyph-like components gives the text-line bands.
+# Boxes are EasyOCR horizontal_list entries, so the recognizer can skip CRAFT detection.
+
+# --- CONFIGURATION ---
+INK_LEVEL = 128          # Gray <= this is ink
+MIN_GLYPH_HEIGHT = 4     # px: smaller components are specks / dots
+MAX_GLYPH_RATIO = 3.0    # Components taller than this x median glyph height are diagram parts
+MAX_GLYPH_ASPECT = 8.0   # Wider than this x its height: rule, fraction bar or wire
+MIN_FILL = 0.08          # area / bbox area below this: hollow stroke (circles, boxes, rays)
+MERGE_GAP_RATIO = 0.35   # Rows gaps shorter than this x glyph height join one band (sub/superscripts)
+MIN_GLYPHS = 2           # Bands with fewer glyph-like components are dropped
+PAD = 3                  # px added around every box
+
+
+def glyph_components(gray):
+    """Bounding boxes (x, y, w, h) of the glyph-like connected components, and their median height."""
+    ink = (gray <= INK_LEVEL).view(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    stats = stats[1:]  # Drop the background
+    if count <= 1: return stats[:0, :4], 0
+    x, y, w, h, area = stats.T
+    sized = h >= MIN_GLYPH_HEIGHT
+    if not sized.any(): return stats[:0, :4], 0
+    median_h = float(np.median(h[sized]))
+    glyph = (sized & (h <= MAX_GLYPH_RATIO * median_h) & (w <= MAX_GLYPH_ASPECT * np.maximum(h, median_h))
+             & (area >= MIN_FILL * w * h))
+    return stats[glyph, :4], median_h
+
+def text_bands(gray):
+    """
+    Text-line boxes [x_min, x_max, y_min, y_max] (EasyOCR horizontal_list format), top to bottom.
+    Empty list = no text found (callers fall back to full-image detection).
+    """
+    boxes, median_h = glyph_components(gray)
+    if len(boxes) == 0: return []
+    height, width = gray.shape
+    x, y, w, h = boxes.T
+
+    # Horizontal projection of glyph boxes only (diagram components never reach the profile)
+    cover = np.zeros(height + 1, dtype=np.int32)
+    np.add.at(cover, y, 1)
+    np.add.at(cover, y + h, -1)
+    starts, ends = runs(np.cumsum(cover[:-1]) > 0)
+
+    # Join lines split by sub/superscripts or i-dots
+    gap = MERGE_GAP_RATIO * median_h
+    keep = np.concatenate(([True], (starts[1:] - ends[:-1]) > gap))
+    starts, ends = starts[keep], np.concatenate((ends[np.flatnonzero(keep)[1:] - 1], [ends[-1]]))
+
+    bands = []
+    centre = y + h / 2
+    for y0, y1 in zip(starts, ends):
+        inside = (centre >= y0) & (centre < y1)
+        if np.count_nonzero(inside) < MIN_GLYPHS: continue
+        x0, x1 = int(x[inside].min()), int((x[inside] + w[inside]).max())
+        bands.append([max(0, x0 - PAD), min(width, x1 + PAD), max(0, int(y0) - PAD), min(height, int(y1) + PAD)])
+    return bands
+
+def band_coverage(gray, bands):
+    """Fraction of the crop's area the recognizer will see."""
+    if not bands or gray.size == 0: return 0.0
+    return sum((x1 - x0) * (y1 - y0) for x0, x1, y0, y1 in bands) / gray.size
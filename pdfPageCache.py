@@ -0,0 +1,80 @@
+import re
+from collections import OrderedDict
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+# --- CONFIGURATION ---
+DEFAULT_DPI = 300
+DEFAULT_MAX_PAGES = 4   # Two-column questions rarely span more than 2-3 pages
+
+
+class LazyPageImages:
+    """
+    Drop-in replacement for the list returned by convert_from_path().
+    Pages are rasterized one at a time on first access and kept in a small
+    LRU cache, so peak memory depends on max_cached_pages, not on PDF length.
+
+    Usage:
+        pdf_images = LazyPageImages(pdf_path, dpi=300)
+        pdf_images[3].crop(...)
+    """
+
+    def __init__(self, pdf_path, dpi=DEFAULT_DPI, max_cached_pages=DEFAULT_MAX_PAGES):
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.max_cached_pages = max(1, int(max_cached_pages))
+        self._cache = OrderedDict()
+        self._info = pdfinfo_from_path(pdf_path)
+        self.page_count = int(self._info.get('Pages', 0))
+        self.pages_rendered = 0
+
+    def __len__(self):
+        return self.page_count
+
+    def __bool__(self):
+        return self.page_count > 0
+
+    def __getitem__(self, page_idx):
+        if page_idx < 0: page_idx += self.page_count
+        if not (0 <= page_idx < self.page_count):
+            raise IndexError(f"Page {page_idx} out of range (0-{self.page_count - 1})")
+
+        if page_idx in self._cache:
+            self._cache.move_to_end(page_idx)
+            return self._cache[page_idx]
+
+        # pdf2image page numbers are 1-based and inclusive
+        images = convert_from_path(self.pdf_path, dpi=self.dpi,
+                                   first_page=page_idx + 1, last_page=page_idx + 1)
+        if not images:
+            raise IndexError(f"Could not render page {page_idx + 1} of {self.pdf_path}")
+
+        self._cache[page_idx] = images[0]
+        self.pages_rendered += 1
+        while len(self._cache) > self.max_cached_pages:
+            _, evicted = self._cache.popitem(last=False)
+            evicted.close()
+        return images[0]
+
+    @property
+    def size(self):
+        """
+        (width, height) in pixels at the configured DPI, read from pdfinfo
+        so the page geometry is known without rendering anything.
+        Falls back to rendering page 0 if pdfinfo gives no usable size.
+        """
+        match = re.match(r'([\d.]+)\s*x\s*([\d.]+)', str(self._info.get('Page size', '')))
+        if match:
+            scale = self.dpi / 72
+            return int(round(float(match.group(1)) * scale)), int(round(float(match.group(2)) * scale))
+        return self[0].size
+
+    def close(self):
+        for img in self._cache.values():
+            img.close()
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
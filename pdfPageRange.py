@@ -0,0 +1,126 @@
+import os
+import fitz  # PyMuPDF
+import pdfplumber
+from pdfWordIndex import ParsedPdf
+from extractionCache import file_hash
+
+
+class PageRange:
+    """
+    Zero-copy view of pages first_page..last_page (1-based, inclusive, as in the Inputs CSVs)
+    of an already open document. Works over anything indexable by page: fitz.Document,
+    ParsedPdf or pdfplumber's pdf.pages. Index 0 of the view is first_page of the book,
+    so code written for a trimmed PDF runs unchanged.
+    The range is clamped to the book length (same as the old PdfWriter trimming).
+    """
+
+    def __init__(self, pages, first_page, last_page):
+        self._pages = pages
+        self.offset = max(0, int(first_page) - 1)
+        self.stop = min(len(pages), int(last_page))
+        self.first_page = first_page
+        self.last_page = last_page
+
+    def __len__(self):
+        return max(0, self.stop - self.offset)
+
+    def __getitem__(self, idx):
+        if idx < 0: idx += len(self)
+        if not (0 <= idx < len(self)):
+            raise IndexError(f"Page {idx} outside range p{self.first_page}-p{self.last_page}")
+        return self._pages[self.offset + idx]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def page(self, idx):
+        return self[idx]
+
+    @property
+    def pages(self):
+        return self
+
+    def book_index(self, idx):
+        """0-based page index in the source book."""
+        return self.offset + idx
+
+    def close(self):
+        """The book stays open (it is shared); only per-page caches of this range are released."""
+        if hasattr(self._pages, 'evict'):
+            self._pages.evict(range(self.offset, self.stop))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SourceBook:
+    """
+    One source PDF kept open for a whole run. Each backend is opened on first use:
+        .doc      fitz.Document   (rendering)
+        .words    ParsedPdf       (word index / anchors)
+        .plumber  pdfplumber PDF  (scripts still on raw pdfplumber)
+
+    Usage:
+        book = open_book(master_path)
+        doc = book.chapter(76, 96)                 # fitz pages 76-96 as doc[0..20]
+        pdf = book.chapter(76, 96, source='words')
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self._doc = None
+        self._words = None
+        self._plumber = None
+        self._hash = None
+
+    @property
+    def doc(self):
+        if self._doc is None: self._doc = fitz.open(self.pdf_path)
+        return self._doc
+
+    @property
+    def words(self):
+        if self._words is None: self._words = ParsedPdf(self.pdf_path)
+        return self._words
+
+    @property
+    def plumber(self):
+        if self._plumber is None: self._plumber = pdfplumber.open(self.pdf_path)
+        return self._plumber
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the book, computed once per run (for ExtractionCache)."""
+        if self._hash is None: self._hash = file_hash(self.pdf_path)
+        return self._hash
+
+    def chapter(self, first_page, last_page, source='doc'):
+        if source == 'doc': pages = self.doc
+        elif source == 'words': pages = self.words
+        elif source == 'plumber': pages = self.plumber.pages
+        else: raise ValueError(f"Unknown source '{source}'. Use 'doc', 'words' or 'plumber'.")
+        return PageRange(pages, first_page, last_page)
+
+    def close(self):
+        for handle in (self._doc, self._words, self._plumber):
+            if handle is not None: handle.close()
+        self._doc = self._words = self._plumber = None
+
+
+_OPEN_BOOKS = {}
+
+def open_book(pdf_path):
+    """Returns the run-wide SourceBook for pdf_path (opened once, however many chapters use it)."""
+    key = os.path.abspath(pdf_path)
+    if key not in _OPEN_BOOKS:
+        _OPEN_BOOKS[key] = SourceBook(pdf_path)
+    return _OPEN_BOOKS[key]
+
+def close_books():
+    for book in _OPEN_BOOKS.values():
+        book.close()
+    _OPEN_BOOKS.clear()
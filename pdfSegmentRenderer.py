@@ -0,0 +1,94 @@
+import fitz  # PyMuPDF
+from PIL import Image
+
+# --- CONFIGURATION ---
+DEFAULT_DPI = 300
+FOOTER_RATIO = 0.92     # Bottom 8% of the page is footer (page numbers, codes)
+TOP_MARGIN_PTS = 50     # Header band skipped when a question continues in a new column
+
+
+def column_bounds(col, page_width, is_two_column=True):
+    """Returns (x0, x1) in PDF points for a column index."""
+    if not is_two_column:
+        return 0, page_width
+    midpoint = page_width / 2
+    return (0, midpoint) if col == 0 else (midpoint, page_width)
+
+
+def plan_question_segments(start, end, page_width, page_height, is_two_column=True,
+                           footer_pts=None, top_margin_pts=TOP_MARGIN_PTS,
+                           padding_pts=0, min_height_pts=2.4):
+    """
+    Converts a pair of anchors into the list of rectangles that make up one question.
+    Anchors are dicts with 'page_idx', 'col' and 'top' (PDF points).
+
+    Layout:
+      1. Start column:       anchor top -> footer (or -> next anchor if same column)
+      2. Middle pages:       full start column, top margin -> footer
+      3. Next anchor column: top margin -> next anchor
+
+    Returns: [(page_idx, (x0, y0, x1, y1)), ...] in PDF points.
+    """
+    if footer_pts is None: footer_pts = page_height * FOOTER_RATIO
+
+    start_top = max(0, start['top'] - padding_pts)
+    end_top = end['top'] - padding_pts
+    start_left, start_right = column_bounds(start['col'], page_width, is_two_column)
+    end_left, end_right = column_bounds(end['col'], page_width, is_two_column)
+
+    segments = []
+    if start['page_idx'] == end['page_idx']:
+        if start['col'] == end['col']:
+            bottom = min(end_top, footer_pts)
+            if bottom <= start_top: bottom = start_top + min_height_pts
+            segments.append((start['page_idx'], (start_left, start_top, start_right, bottom)))
+        else:
+            if footer_pts > start_top:
+                segments.append((start['page_idx'], (start_left, start_top, start_right, footer_pts)))
+            if end_top > top_margin_pts:
+                segments.append((end['page_idx'], (end_left, top_margin_pts, end_right, end_top)))
+    else:
+        if footer_pts > start_top:
+            segments.append((start['page_idx'], (start_left, start_top, start_right, footer_pts)))
+        for mid_idx in range(start['page_idx'] + 1, end['page_idx']):
+            if footer_pts > top_margin_pts:
+                segments.append((mid_idx, (start_left, top_margin_pts, start_right, footer_pts)))
+        if end_top > top_margin_pts:
+            segments.append((end['page_idx'], (end_left, top_margin_pts, end_right, end_top)))
+    return segments
+
+
+def render_clip(doc, page_idx, rect, dpi=DEFAULT_DPI):
+    """
+    Rasterizes only the clip rectangle of one page (no full-page bitmap).
+    Returns a PIL RGB image, or None if the rectangle is empty.
+    """
+    x0, y0, x1, y1 = rect
+    if x1 <= x0 or y1 <= y0: return None
+
+    zoom = dpi / 72
+    page = doc[page_idx]
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(x0, y0, x1, y1), alpha=False)
+    if pix.width == 0 or pix.height == 0: return None
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def stitch_vertical(images, mode='RGB', background=(255, 255, 255)):
+    """Stacks images top-to-bottom, left aligned, on a white canvas."""
+    images = [img for img in images if img is not None and img.height > 0]
+    if not images: return None
+    if len(images) == 1: return images[0]
+
+    total_height = sum(img.height for img in images)
+    max_width = max(img.width for img in images)
+    canvas = Image.new(mode, (max_width, total_height), background)
+    y_offset = 0
+    for img in images:
+        canvas.paste(img, (0, y_offset))
+        y_offset += img.height
+    return canvas
+
+
+def render_segments(doc, segments, dpi=DEFAULT_DPI):
+    """Renders every (page_idx, rect) segment and stitches them into one image."""
+    return stitch_vertical([render_clip(doc, page_idx, rect, dpi) for page_idx, rect in segments])
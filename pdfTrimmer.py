@@ -1,6 +1,7 @@
 import os
 import json
 from pypdf import PdfReader, PdfWriter
+from pdfPageRange import open_book
 
 # --- 1. CONFIGURATION ---
 # Using BASE_PATH directly as requested [cite: 300, 417]
@@ -19,9 +20,22 @@ OUTPUT_DIR = os.path.join(SOURCE_DIR, 'Trimmed_PDFs')
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+def open_page_range(input_filename, start_page, end_page, source='doc'):
+    """
+    Zero-copy alternative to trim_pdf(): returns a page-range view of the source book
+    (index 0 = start_page) without writing anything. The book is opened once per run,
+    however many chapters are requested. source: 'doc' (PyMuPDF), 'words' (ParsedPdf) or 'plumber'.
+    """
+    input_path = os.path.join(SOURCE_DIR, input_filename)
+    if not os.path.exists(input_path):
+        print(f"❌ Error: Source file not found: {input_path}")
+        return None
+    return open_book(input_path).chapter(start_page, end_page, source=source)
+
 def trim_pdf(input_filename, start_page, end_page, chapter_label):
     """
     Extracts a specific page range and saves it as a new 'Trimmed' file.
+    Only needed when a standalone file is wanted (sharing, viewing); the extractors use open_page_range().
     """
     input_path = os.path.join(SOURCE_DIR, input_filename)
     
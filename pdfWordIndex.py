@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import numpy as np
+import pdfplumber
+import fitz  # PyMuPDF
+
+# --- CONFIGURATION ---
+CONFIG_PATH = 'config.json'
+LINE_Y_TOLERANCE = 3    # Same as pdfplumber's default y_tolerance for extract_text()
+WORD_X_TOLERANCE = 3    # Same as pdfplumber's default x_tolerance for extract_words()
+
+# Switch a whole run with one setting: "text_backend": "pymupdf" in config.json
+TEXT_BACKENDS = ('pdfplumber', 'pymupdf')
+TEXT_BACKEND = 'pdfplumber'
+if os.path.exists(CONFIG_PATH):
+    with open(CONFIG_PATH, 'r') as f:
+        TEXT_BACKEND = json.load(f).get('text_backend', TEXT_BACKEND)
+
+
+def reading_order(tops, x0s, tolerance=LINE_Y_TOLERANCE):
+    """
+    Indices that sort words into lines (tops within tolerance) and each line left-to-right.
+    This is the order pdfplumber's extract_words() produces.
+    Returns a list of lines, each a list of indices.
+    """
+    if len(tops) == 0: return []
+    idx = np.argsort(tops, kind='stable')
+    lines = []
+    current = [idx[0]]
+    line_top = tops[idx[0]]
+    for i in idx[1:]:
+        if abs(tops[i] - line_top) <= tolerance:
+            current.append(i)
+        else:
+            lines.append(current)
+            current = [i]
+            line_top = tops[i]
+    lines.append(current)
+    return [sorted(line, key=lambda i: x0s[i]) for line in lines]
+
+
+class PageWords:
+    """
+    Columnar word table of one page. Every attribute is an array indexed by word:
+        text, fontname (object arrays), x0, x1, top, bottom, size (float arrays).
+    Words are kept in pdfplumber reading order.
+    """
+
+    def __init__(self, width, height, words):
+        self.width = width
+        self.height = height
+        self.text = np.array([w['text'] for w in words], dtype=object)
+        self.fontname = np.array([w.get('fontname', '') for w in words], dtype=object)
+        self.x0 = np.array([w['x0'] for w in words], dtype=np.float64)
+        self.x1 = np.array([w['x1'] for w in words], dtype=np.float64)
+        self.top = np.array([w['top'] for w in words], dtype=np.float64)
+        self.bottom = np.array([w['bottom'] for w in words], dtype=np.float64)
+        self.size = np.array([w.get('size', 0.0) for w in words], dtype=np.float64)
+        self._lines = None
+
+    def __len__(self):
+        return len(self.text)
+
+    def word(self, i):
+        """Returns word i as a pdfplumber-style dict."""
+        return {'text': self.text[i], 'fontname': self.fontname[i], 'size': self.size[i],
+                'x0': self.x0[i], 'x1': self.x1[i], 'top': self.top[i], 'bottom': self.bottom[i]}
+
+    def words(self, mask=None):
+        idx = range(len(self)) if mask is None else np.flatnonzero(mask)
+        return [self.word(i) for i in idx]
+
+    def bbox_mask(self, bbox, mode='center'):
+        """
+        Boolean mask of words inside bbox = (x0, top, x1, bottom).
+        mode='center': word centre inside bbox (each word lands in exactly one column).
+        mode='within': whole word inside bbox (same as page.within_bbox()).
+        """
+        bx0, btop, bx1, bbottom = bbox
+        if mode == 'within':
+            return (self.x0 >= bx0) & (self.x1 <= bx1) & (self.top >= btop) & (self.bottom <= bbottom)
+        cx = (self.x0 + self.x1) / 2
+        cy = (self.top + self.bottom) / 2
+        return (cx >= bx0) & (cx < bx1) & (cy >= btop) & (cy < bbottom)
+
+    def text_from_mask(self, mask=None):
+        """Rebuilds plain text (lines joined by newlines) from the selected words."""
+        idx = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        if len(idx) == 0: return ""
+
+        lines = reading_order(self.top[idx], self.x0[idx])
+        return "\n".join(" ".join(self.text[idx[i]] for i in line) for line in lines)
+
+    def text_in_bbox(self, bbox, mode='center'):
+        return self.text_from_mask(self.bbox_mask(bbox, mode))
+
+    def extract_text(self):
+        return self.text_from_mask()
+
+    def lines(self):
+        """[(line text, [(start, end, word index)])] in reading order: words joined by one space."""
+        if self._lines is None:
+            self._lines = []
+            for line in reading_order(self.top, self.x0):
+                spans, pos = [], 0
+                for i in line:
+                    spans.append((pos, pos + len(self.text[i]), i))
+                    pos += len(self.text[i]) + 1
+                self._lines.append((" ".join(self.text[i] for i in line), spans))
+        return self._lines
+
+    def search(self, pattern, regex=True, case=True):
+        """
+        Like pdfplumber's page.search(): matches pattern anywhere in each line's text, so
+        "Answers" also finds "Answers:" and "ANSWER KEY" finds "ANSWER KEYS".
+        Returns hits [{'text', 'top', 'bottom', 'x0', 'x1'}] (bbox of the words the match
+        touches), in reading order.
+        """
+        if not pattern: return []
+        compiled = re.compile(pattern if regex else re.escape(pattern), 0 if case else re.IGNORECASE)
+        hits = []
+        for line_text, spans in self.lines():
+            for m in compiled.finditer(line_text):
+                if m.end() == m.start(): continue
+                idx = [i for start, end, i in spans if start < m.end() and end > m.start()]
+                hits.append({'text': m.group(0), 'top': self.top[idx].min(), 'bottom': self.bottom[idx].max(),
+                             'x0': self.x0[idx].min(), 'x1': self.x1[idx].max()})
+        return hits
+
+
+# --- TEXT BACKENDS ---
+# Each backend returns pdfplumber-style word dicts: text, x0, x1, top, bottom, fontname, size.
+
+class PdfplumberBackend:
+    name = 'pdfplumber'
+
+    def __init__(self, pdf_path):
+        self._pdf = pdfplumber.open(pdf_path)
+
+    def page_count(self):
+        return len(self._pdf.pages)
+
+    def page_words(self, page_idx):
+        page = self._pdf.pages[page_idx]
+        # return_chars keeps the default word splitting while giving access to font info
+        words = page.extract_words(keep_blank_chars=False, return_chars=True)
+        for w in words:
+            chars = w.pop('chars', None) or [{}]
+            w['fontname'] = chars[0].get('fontname', '')
+            w['size'] = chars[0].get('size', 0.0)
+        width, height = page.width, page.height
+        page.flush_cache()
+        return width, height, words
+
+    def close(self):
+        self._pdf.close()
+
+
+class PyMuPDFBackend:
+    """
+    Builds words from PyMuPDF's per-character output (page.get_text("rawdict")).
+    Words split on whitespace and on horizontal gaps > WORD_X_TOLERANCE, like pdfplumber,
+    and are returned in the same line-by-line reading order.
+    Vertical extents follow pdfplumber too (one font size tall, bottom at baseline + descent)
+    instead of PyMuPDF's ascender/descender boxes, so anchor tops agree between backends.
+    NOTE: font names come without the 6-letter subset prefix ("ABCDEF+").
+    """
+    name = 'pymupdf'
+
+    def __init__(self, pdf_path):
+        self._doc = fitz.open(pdf_path)
+
+    def page_count(self):
+        return len(self._doc)
+
+    def page_words(self, page_idx):
+        page = self._doc[page_idx]
+        raw = page.get_text("rawdict", flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)
+        words = []
+        for block in raw.get('blocks', []):
+            for line in block.get('lines', []):
+                current = None
+                for span in line.get('spans', []):
+                    size = span.get('size', 0.0)
+                    descent = -span.get('descender', 0.0) * size
+                    for ch in span.get('chars', []):
+                        c = ch['c']
+                        x0, _, x1, _ = ch['bbox']
+                        y1 = ch['origin'][1] + descent
+                        y0 = y1 - size
+                        if c.isspace():
+                            current = None
+                            continue
+                        if current is not None and x0 - current['x1'] <= WORD_X_TOLERANCE:
+                            current['text'] += c
+                            current['x1'] = max(current['x1'], x1)
+                            current['top'] = min(current['top'], y0)
+                            current['bottom'] = max(current['bottom'], y1)
+                        else:
+                            current = {'text': c, 'x0': x0, 'x1': x1, 'top': y0, 'bottom': y1,
+                                       'fontname': span.get('font', ''), 'size': size}
+                            words.append(current)
+
+        if words:
+            order = reading_order(np.array([w['top'] for w in words]), np.array([w['x0'] for w in words]))
+            words = [words[i] for line in order for i in line]
+        return page.rect.width, page.rect.height, words
+
+    def close(self):
+        self._doc.close()
+
+
+BACKEND_CLASSES = {'pdfplumber': PdfplumberBackend, 'pymupdf': PyMuPDFBackend}
+
+
+class ParsedPdf:
+    """
+    Parses each page of a PDF at most once and caches its word table.
+    Anchor detection, column text extraction and answer-key parsing all read from
+    the same PageWords instead of re-running pdfplumber layout analysis.
+
+    backend: 'pdfplumber' or 'pymupdf' (default: TEXT_BACKEND from config.json).
+
+    Usage:
+        with ParsedPdf(pdf_path) as doc:
+            page = doc.page(0)
+            page.text_in_bbox((0, 50, page.width / 2, 700))
+    """
+
+    def __init__(self, pdf_path, backend=None):
+        backend = backend or TEXT_BACKEND
+        if backend not in BACKEND_CLASSES:
+            raise ValueError(f"Unknown text backend '{backend}'. Use one of {TEXT_BACKENDS}.")
+        self.pdf_path = pdf_path
+        self.backend = backend
+        self._backend = BACKEND_CLASSES[backend](pdf_path)
+        self._page_count = self._backend.page_count()
+        self._pages = {}
+
+    def __len__(self):
+        return self._page_count
+
+    def page(self, page_idx):
+        if page_idx < 0: page_idx += len(self)
+        if page_idx not in self._pages:
+            width, height, words = self._backend.page_words(page_idx)
+            self._pages[page_idx] = PageWords(width, height, words)
+        return self._pages[page_idx]
+
+    def __getitem__(self, page_idx):
+        return self.page(page_idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.page(i)
+
+    @property
+    def pages(self):
+        """Lazy sequence of PageWords (mirrors pdfplumber's pdf.pages)."""
+        return self
+
+    def evict(self, page_indices):
+        """Drops cached word tables (e.g. once a chapter of a large book is done)."""
+        for idx in page_indices:
+            self._pages.pop(idx, None)
+
+    def close(self):
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,41 @@
+from extractionCache import ExtractionCache
+
+
+def run(tmp_path, footer_ratio, rects):
+    """One extraction pass: re-parses if needed, renders only the cache misses. Returns rendered names."""
+    pdf = tmp_path / 'book.pdf'
+    if not pdf.exists(): pdf.write_bytes(b'%PDF fake')
+    cache = ExtractionCache(tmp_path / 'cache', pdf, 'digvijay', page_range=(3, 9),
+                            parse_params={'parser': 'bold-anchors-v1', 'footer_ratio': footer_ratio},
+                            render_params={'dpi': 300})
+    anchors, _ = cache.load_anchors()
+    if anchors is None: cache.store_anchors(sorted(rects))
+    rendered = []
+    for name, rect in rects.items():
+        out_path = tmp_path / f"{name}.png"
+        if cache.lookup(name, rect, out_path) is None:
+            out_path.write_bytes(repr(rect).encode())
+            cache.record(name, rect, out_path)
+            rendered.append(name)
+    cache.save()
+    return rendered, anchors is None
+
+
+def test_footer_change_rerenders_only_moved_questions(tmp_path):
+    rects = {'Q_1': [0, 0, 500, 300.0], 'Q_2': [0, 300.0, 500, 700.0], 'Q_3': [0, 0, 500, 650.0]}
+    assert run(tmp_path, 0.93, rects) == (['Q_1', 'Q_2', 'Q_3'], True)
+    assert run(tmp_path, 0.93, rects) == ([], False)
+
+    # Lower footer cutoff: only the questions that reached the footer get shorter
+    moved = dict(rects, Q_2=[0, 300.0, 500, 680.0], Q_3=[0, 0, 500, 640.0])
+    assert run(tmp_path, 0.90, moved) == (['Q_2', 'Q_3'], True)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1   # Same cache file, not a new empty one
+
+
+def test_render_params_still_invalidate_items(tmp_path):
+    rects = {'Q_1': [0, 0, 500, 300.0]}
+    run(tmp_path, 0.93, rects)
+    cache = ExtractionCache(tmp_path / 'cache', tmp_path / 'book.pdf', 'digvijay', page_range=(3, 9),
+                            parse_params={'parser': 'bold-anchors-v1', 'footer_ratio': 0.93},
+                            render_params={'dpi': 200})
+    assert cache.lookup('Q_1', rects['Q_1'], tmp_path / 'Q_1.png') is None
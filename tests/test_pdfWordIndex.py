@@ -0,0 +1,28 @@
+from pdfWordIndex import PageWords
+
+
+def page(*lines):
+    """PageWords from lines of text: 10 pt per character, 20 pt per line."""
+    words = []
+    for row, line in enumerate(lines):
+        x = 0.0
+        for token in line.split():
+            words.append({'text': token, 'x0': x, 'x1': x + 10 * len(token), 'top': 20.0 * row, 'bottom': 20.0 * row + 12})
+            x += 10 * (len(token) + 1)
+    return PageWords(600, 800, words)
+
+
+def test_search_matches_punctuated_and_plural_markers():
+    p = page("1. A block slides", "Answers: 1. (a) 2. (c)", "ANSWER KEYS", "Hints & Solutions.")
+    assert [(h['text'], h['top']) for h in p.search("Answers")] == [("Answers", 20.0)]
+    hit, = p.search("ANSWER KEY")
+    assert (hit['top'], hit['x0'], hit['x1']) == (40.0, 0.0, 110.0)   # Bbox of "ANSWER KEYS"
+    hit, = p.search("Hints & Solutions")
+    assert (hit['top'], hit['x0'], hit['x1']) == (60.0, 0.0, 180.0)
+
+
+def test_search_is_line_scoped_and_case_sensitive():
+    p = page("ANSWER", "KEY", "answer key")
+    assert p.search("ANSWER KEY") == []
+    assert [h['top'] for h in p.search("ANSWER KEY", case=False)] == [40.0]
+    assert page().search("Answers") == []
@@ -2,11 +2,12 @@ import os
 import numpy as np
 from PIL import Image, ImageChops, ImageOps
 from tqdm import tqdm
+from imageThresholds import threshold_for, whiten_above
 
 # --- CONFIGURATION ---
 TARGET_DIR = r'D:\Main\3. Work - Teaching\Projects\Question extractor\Processed_Database'
 FOLDER_PREFIX = 'CollegeDoors'
-NOISE_THRESHOLD = 170
+NOISE_THRESHOLD = threshold_for('default')
 
 def trim_whitespace(im):
     try:
@@ -92,7 +93,7 @@ def run_targeted_refinement(root_dir):
                 refined = pixel_sensitive_left_trim(img) if filename.startswith('Q_') else pixel_sensitive_top_trim(img)
 
                 final = trim_whitespace(refined)
-                final.convert('L').point(lambda p: 255 if p > NOISE_THRESHOLD else p).save(img_path, "PNG", optimize=True)
+                whiten_above(final, NOISE_THRESHOLD).save(img_path, "PNG", optimize=True)
         except Exception as e:
             tqdm.write(f"⚠️ Error on {img_path}: {e}")
 
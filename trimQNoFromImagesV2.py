@@ -1,132 +1,149 @@
 import os
+import io
+import time
 import numpy as np
-from PIL import Image, ImageChops, ImageOps
-from tqdm import tqdm
+from PIL import Image
+from imageKernels import column_profile, gap_cut, sol_header_cut
+from imageBatchRunner import discover_files, run_batch
+from imageThresholds import threshold_for, whiten_above_array
 
 # --- CONFIGURATION ---
 TARGET_DIR = r'D:\Main\3. Work - Teaching\Projects\Question extractor\Processed_Database\Compressed\CropTest'
 FOLDER_PREFIX = 'CollegeDoors'
-NOISE_THRESHOLD = 170
+NOISE_THRESHOLD = threshold_for('default')
 MARGIN_CHECK_PERCENT = 0.05  # Check the first 5% of width
 DENSITY_THRESHOLD = 0.01     # If > 1% pixels are black, keep cropping
 MAX_TRIES = 5
+BG_DIFF_THRESHOLD = 100      # Same cut-off as ImageChops.add(diff, diff, 2.0, -100)
+TIMING_CSV = os.path.join(TARGET_DIR, 'refinement_timings.csv')
+WORKERS = None     # None = all cores but one; 1 = single process
+DRY_RUN = False    # True: refine + encode in memory, leave the images untouched
 
-def trim_whitespace(im):
-    try:
-        bg = Image.new(im.mode, im.size, im.getpixel((0,0)))
-        diff = ImageChops.difference(im, bg)
-        diff = ImageChops.add(diff, diff, 2.0, -100)
-        bbox = diff.getbbox()
-        return im.crop(bbox) if bbox else im
-    except: return im
+STAGES = ('decode', 'trim', 'density', 'left_trim', 'top_trim', 'encode')
 
-def get_margin_density(img):
+# Every stage below works on one grayscale uint8 array (0 = ink). Crops are array views,
+# so an image is decoded once, refined without copies and encoded once.
+
+def trim_whitespace(gray):
+    """Crops to the bbox of pixels that differ from the top-left corner colour."""
+    if gray.size == 0: return gray
+    diff = np.abs(gray.astype(np.int16) - int(gray[0, 0])) > BG_DIFF_THRESHOLD
+    rows = np.flatnonzero(diff.any(axis=1))
+    if len(rows) == 0: return gray
+    cols = np.flatnonzero(diff.any(axis=0))
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+def get_margin_density(gray):
     """Calculates the proportion of black pixels in the left margin."""
-    # Convert to grayscale and threshold to binary (Black/White)
-    bw = img.convert('L').point(lambda p: 0 if p < NOISE_THRESHOLD else 255)
-    data = np.array(bw)
-    
-    width = data.shape[1]
-    check_width = int(width * MARGIN_CHECK_PERCENT)
-    
-    # Extract the left strip
-    margin_strip = data[:, :check_width]
-    
-    # Count black pixels (value 0)
-    black_pixels = np.count_nonzero(margin_strip == 0)
-    total_pixels = margin_strip.size
-    
-    return black_pixels / total_pixels
-
-def pixel_sensitive_left_trim(img):
+    check_width = int(gray.shape[1] * MARGIN_CHECK_PERCENT)
+    margin_strip = gray[:, :check_width]
+    if margin_strip.size == 0: return 0.0
+    return np.count_nonzero(margin_strip < NOISE_THRESHOLD) / margin_strip.size
+
+def pixel_sensitive_left_trim(gray):
     """Logic for Q_ images: Removes numbers from the LEFT."""
-    inverted_img = ImageOps.invert(img.convert('L'))
-    data = np.array(inverted_img)
-    horizontal_sum = np.sum(data, axis=0)
-    width = len(horizontal_sum)
-    
-    crop_x, in_num, white_gap = 0, False, 0
-    # Start scanning from pixel 2 to avoid edge noise
-    for x in range(2, width):
-        if horizontal_sum[x] > 500:
-            in_num = True
-            white_gap = 0
-        elif in_num:
-            white_gap += 1
-            if white_gap >= 12: # Slightly tighter gap for iterative pass
-                crop_x = x - white_gap + 2
-                break
-    
-    if crop_x == 0: return img
-    return img.crop((crop_x, 0, width, img.size[1]))
+    # Start scanning from pixel 2 to avoid edge noise; slightly tighter gap (12) for iterative pass
+    crop_x = gap_cut(column_profile(gray), ink_threshold=500, min_gap=12, start=2, offset=2)
+    return gray[:, crop_x:]
 
-def pixel_sensitive_top_trim(img):
+def pixel_sensitive_top_trim(gray):
     """Logic for Sol_ images: Removes the 'Sol.' header from the TOP."""
-    inverted_img = ImageOps.invert(img.convert('L'))
-    data = np.array(inverted_img)
-    vertical_sum = np.sum(data, axis=1)
-    height, width = data.shape
-
-    crop_y, in_header, white_gap = 0, False, 0
-    for y in range(5, height):
-        row_data = data[y, :]
-        ink_positions = np.where(row_data > 128)[0]
-        has_widespread_ink = len(ink_positions) > 0 and np.max(ink_positions) > (width * 0.3)
-        
-        if not in_header and len(ink_positions) > 0:
-            in_header = True
-        
-        if in_header:
-            if not has_widespread_ink and np.sum(row_data) < 500:
-                white_gap += 1
-            if white_gap >= 10 or has_widespread_ink:
-                crop_y = y - white_gap + 2
-                break
+    height = gray.shape[0]
+    crop_y = sol_header_cut(gray, ink_level=128, quiet_sum=500, min_gap=10, wide_ratio=0.3, start=5)
 
     if crop_y == 0 or crop_y > (height * 0.25): crop_y = int(height * 0.05)
-    return img.crop((0, crop_y, width, height))
+    return gray[crop_y:, :]
+
+class StageClock:
+    """Accumulates perf_counter time per stage for one image: `with clock('trim'): ...`"""
+
+    def __init__(self):
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self._stage = None
+
+    def __call__(self, stage):
+        self._stage = stage
+        return self
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.times[self._stage] += time.perf_counter() - self._t0
+
+def refine_image(img_path, clock, dry_run=False):
+    """Decode -> trims / density checks on array views -> encode. Returns the number of left-trim passes."""
+    filename = os.path.basename(img_path)
+    with clock('decode'):
+        with Image.open(img_path) as img:
+            gray = np.array(img.convert('L'))   # Writable: the final cleaning is in place
+    with clock('trim'):
+        gray = trim_whitespace(gray)
 
-def run_targeted_refinement(root_dir):
+    passes = 0
+    if filename.startswith('Q_'):
+        # --- ENHANCED ITERATIVE CROPPING ---
+        for attempt in range(MAX_TRIES):
+            with clock('density'):
+                density = get_margin_density(gray)
+
+            # If the margin is clean enough, stop cropping
+            if density < DENSITY_THRESHOLD:
+                break
+
+            # Apply crop and re-trim whitespace
+            with clock('left_trim'):
+                gray = pixel_sensitive_left_trim(gray)
+            with clock('trim'):
+                gray = trim_whitespace(gray)
+            passes += 1
+
+    else: # Handle Sol_ images normally
+        with clock('top_trim'):
+            gray = pixel_sensitive_top_trim(gray)
+        with clock('trim'):
+            gray = trim_whitespace(gray)
+
+    # Final compression and save (light noise -> white)
+    with clock('encode'):
+        cleaned = whiten_above_array(gray, NOISE_THRESHOLD)
+        Image.fromarray(cleaned, mode='L').save(io.BytesIO() if dry_run else img_path, "PNG", optimize=True)
+    return passes
+
+def refine_file(img_path, dry_run=False):
+    """Batch worker: refines one image and returns its pass count and per-stage timings."""
+    clock = StageClock()
+    passes = refine_image(img_path, clock, dry_run)
+    return {'status': 'Refined', 'passes': passes,
+            **{f"{s}_ms": round(clock.times[s] * 1000, 3) for s in STAGES},
+            'total_ms': round(sum(clock.times.values()) * 1000, 3)}
+
+def run_targeted_refinement(root_dir, workers=WORKERS, dry_run=DRY_RUN):
     print(f"🚀 Iterative Refinement starting for folders: '{FOLDER_PREFIX}'")
-    files_to_process = []
-    
-    for root, _, files in os.walk(root_dir):
-        if os.path.basename(root).startswith(FOLDER_PREFIX):
-            for f in files:
-                if f.lower().endswith('.png') and (f.startswith('Q_') or f.startswith('Sol_')):
-                    files_to_process.append(os.path.join(root, f))
-
-    for img_path in tqdm(files_to_process, desc="Refining"):
-        try:
-            filename = os.path.basename(img_path)
-            with Image.open(img_path) as img:
-                current_img = img.convert('RGB')
-                current_img = trim_whitespace(current_img)
-                
-                if filename.startswith('Q_'):
-                    # --- ENHANCED ITERATIVE CROPPING ---
-                    for attempt in range(MAX_TRIES):
-                        density = get_margin_density(current_img)
-                        
-                        # If the margin is clean enough, stop cropping
-                        if density < DENSITY_THRESHOLD:
-                            break
-                            
-                        # Apply crop and re-trim whitespace
-                        current_img = pixel_sensitive_left_trim(current_img)
-                        current_img = trim_whitespace(current_img)
-                
-                else: # Handle Sol_ images normally
-                    current_img = pixel_sensitive_top_trim(current_img)
-                    current_img = trim_whitespace(current_img)
-
-                # Final compression and save
-                current_img.convert('L').point(lambda p: 255 if p > NOISE_THRESHOLD else p).save(img_path, "PNG", optimize=True)
-                
-        except Exception as e:
-            tqdm.write(f"⚠️ Error on {img_path}: {e}")
-
-    print("\n🏁 Iterative Refinement Complete.")
+    files_to_process = discover_files(root_dir, ('.png',),
+                                      folder_filter=lambda folder: folder.startswith(FOLDER_PREFIX),
+                                      file_filter=lambda f: f.startswith('Q_') or f.startswith('Sol_'))
+
+    report = run_batch(files_to_process, refine_file, workers=workers, dry_run=dry_run, desc="Refining")
+    for img_path, message in report.errors:
+        print(f"⚠️ Error on {img_path}: {message}")
+
+    # --- Timing report ---
+    timing_rows = report.rows('Refined')
+    if timing_rows:
+        for row in timing_rows: row['file'] = os.path.relpath(row['path'], root_dir)
+        fields = ['file', 'passes'] + [f"{s}_ms" for s in STAGES] + ['total_ms']
+        report.write_rows(TIMING_CSV, fields, rows=timing_rows)
+
+        totals = {s: report.total(f"{s}_ms") / 1000 for s in STAGES}
+        grand_total = sum(totals.values()) or 1e-9
+        print(f"\n⏱️  Stage timing over {len(timing_rows)} images (summed over workers):")
+        for stage in STAGES:
+            print(f"   {stage:<10} {totals[stage]:8.2f}s  {totals[stage] / grand_total:6.1%}  "
+                  f"{totals[stage] / len(timing_rows) * 1000:8.2f} ms/img")
+        print(f"   Per-image breakdown: {TIMING_CSV}")
+
+    print("\n🏁 Iterative Refinement Complete." + (" (DRY RUN - no image was overwritten)" if dry_run else ""))
 
 if __name__ == "__main__":
-    run_targeted_refinement(TARGET_DIR)
\ No newline at end of file
+    run_targeted_refinement(TARGET_DIR)
@@ -2,21 +2,23 @@ import os
 import numpy as np
 from PIL import Image
 import pandas as pd
-from tqdm import tqdm
+from imageBatchRunner import run_batch
+from imageThresholds import threshold_for, binarize
 
 # --- CONFIGURATION ---
 # Put your "perfectly cropped" samples here
 SAMPLE_DIR = r'D:\Main\3. Work - Teaching\Projects\Question extractor\Processed_Database\Compressed\CropTest'
 OUTPUT_CSV = 'margin_density_report.csv'
 MARGIN_CHECK_PERCENT = 0.05
-NOISE_THRESHOLD = 170
+NOISE_THRESHOLD = threshold_for('default')
+WORKERS = None     # None = all cores but one; 1 = single process
 
 def get_margin_density(img_path):
     """Calculates black pixel proportion in the left 5% of the image."""
     try:
         with Image.open(img_path) as img:
-            # Standardize to RGB then Grayscale
-            bw = img.convert('RGB').convert('L').point(lambda p: 0 if p < NOISE_THRESHOLD else 255)
+            # Grayscale + binarize (lookup table; RGB -> L gives the same levels as the old RGB round trip)
+            bw = binarize(img, NOISE_THRESHOLD)
             data = np.array(bw)
             
             height, width = data.shape
@@ -33,22 +35,25 @@ def get_margin_density(img_path):
     except Exception as e:
         return None
 
+def measure_file(img_path, dry_run=False):
+    """Batch worker (read-only, so dry_run changes nothing)."""
+    density = get_margin_density(img_path)
+    if density is None: return {'status': 'Error', 'error': 'Read failed'}
+    return {
+        'status': 'Measured',
+        'filename': os.path.basename(img_path),
+        'black_pixel_percentage': round(density * 100, 4), # Percentage for readability
+        'raw_density': density
+    }
+
 def run_calibration():
     print(f"🔍 Analyzing images in {SAMPLE_DIR}...")
     
-    results = []
-    files = [f for f in os.listdir(SAMPLE_DIR) if f.lower().endswith('.png')]
+    files = [os.path.join(SAMPLE_DIR, f) for f in os.listdir(SAMPLE_DIR) if f.lower().endswith('.png')]
     
-    for filename in tqdm(files, desc="Calculating Densities"):
-        file_path = os.path.join(SAMPLE_DIR, filename)
-        density = get_margin_density(file_path)
-        
-        if density is not None:
-            results.append({
-                'filename': filename,
-                'black_pixel_percentage': round(density * 100, 4), # Percentage for readability
-                'raw_density': density
-            })
+    report = run_batch(files, measure_file, workers=WORKERS, desc="Calculating Densities")
+    results = [{k: row[k] for k in ('filename', 'black_pixel_percentage', 'raw_density')}
+               for row in report.rows('Measured')]
 
     # Save to CSV
     df = pd.DataFrame(results)